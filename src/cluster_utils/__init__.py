@@ -10,6 +10,7 @@ from .client import (
     initialize_job,
     read_params_from_cmdline,
     save_metrics_params,
+    set_progress_report_interval,
 )
 
 # The version is set based on git at install time, so we get it from the metadata of the
@@ -27,4 +28,5 @@ __all__ = [
     "initialize_job",
     "save_metrics_params",
     "read_params_from_cmdline",
+    "set_progress_report_interval",
 ]
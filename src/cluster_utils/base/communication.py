@@ -1,4 +1,26 @@
+"""Message types and wire format for the communication between jobs and server.
+
+Messages are sent as single UDP datagrams, consisting of a fixed-size binary header
+followed by a JSON-encoded payload::
+
+    | magic (2) | version (1) | type (1) | flags (1) | job id (4) | seq (4) | payload
+
+All header fields are in network byte order.  The payload is a JSON list with the
+message-specific arguments (i.e. everything except the job id).
+
+If a message has the :data:`FLAG_ACK_REQUESTED` flag set, the server responds with an
+:attr:`MessageTypes.ACK` message with the same job id and sequence number once the
+message is processed.  The sender can use this to retransmit messages that got lost.
+
+NOTE: This module is used by the client, so only use the standard library here.
+"""
+
+from __future__ import annotations
+
 import enum
+import json
+import struct
+from typing import Any, NamedTuple, Sequence
 
 
 class MessageTypes(enum.IntEnum):
@@ -9,3 +31,117 @@ class MessageTypes(enum.IntEnum):
     EXIT_FOR_RESUME = 4
     JOB_PROGRESS_PERCENTAGE = 5
     METRIC_EARLY_REPORT = 6
+    ACK = 7
+    METRIC_EARLY_REPORT_BATCH = 8
+
+
+#: Marks the start of a message in the cluster_utils wire format.
+MESSAGE_MAGIC = b"CU"
+#: Version of the wire format.  Needs to be increased on incompatible changes.
+MESSAGE_FORMAT_VERSION = 1
+
+#: Flag indicating that the sender wants to get an acknowledgement for the message.
+FLAG_ACK_REQUESTED = 0x01
+
+# magic, version, message type, flags, job id, sequence number
+_HEADER = struct.Struct("!2sBBBiI")
+
+
+class MessageDecodeError(ValueError):
+    """Raised if received data is not a valid message."""
+
+
+class Message(NamedTuple):
+    """A decoded message."""
+
+    message_type: MessageTypes
+    job_id: int
+    payload: list[Any]
+    flags: int = 0
+    seq: int = 0
+
+    @property
+    def arguments(self) -> tuple[Any, ...]:
+        """Job id and payload as one tuple (the form expected by the handlers)."""
+        return (self.job_id, *self.payload)
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy/torch scalars and arrays
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "item"):
+        return obj.item()
+
+    raise TypeError(
+        f"Object of type {type(obj).__name__} can not be sent to the cluster_utils"
+        " server."
+    )
+
+
+def encode_message(
+    message_type: MessageTypes,
+    job_id: int,
+    payload: Sequence[Any],
+    flags: int = 0,
+    seq: int = 0,
+) -> bytes:
+    """Encode a message in the cluster_utils wire format.
+
+    Args:
+        message_type: The message type.
+        job_id: ID of the job sending the message.
+        payload: Further arguments of the message.  Need to be JSON-serialisable
+            (numpy scalars and arrays are converted automatically).
+        flags: Bit flags of the message.
+        seq: Sequence number of the message (used to match acknowledgements).
+
+    Returns:
+        The encoded message.
+    """
+    header = _HEADER.pack(
+        MESSAGE_MAGIC, MESSAGE_FORMAT_VERSION, message_type, flags, job_id, seq
+    )
+    body = json.dumps(list(payload), separators=(",", ":"), default=_json_default)
+    return header + body.encode("utf-8")
+
+
+def decode_message(data: bytes) -> Message:
+    """Decode a message that was encoded with :func:`encode_message`.
+
+    Raises:
+        MessageDecodeError: if the data is not a valid message.
+    """
+    if len(data) < _HEADER.size:
+        raise MessageDecodeError(f"Message too short ({len(data)} bytes).")
+
+    magic, version, message_type, flags, job_id, seq = _HEADER.unpack_from(data)
+    if magic != MESSAGE_MAGIC:
+        raise MessageDecodeError("Data is not a cluster_utils message.")
+    if version != MESSAGE_FORMAT_VERSION:
+        raise MessageDecodeError(
+            f"Unsupported message format version {version} (expected"
+            f" {MESSAGE_FORMAT_VERSION})."
+        )
+
+    try:
+        message_type = MessageTypes(message_type)
+    except ValueError as e:
+        raise MessageDecodeError(f"Unknown message type {message_type}.") from e
+
+    try:
+        payload = json.loads(data[_HEADER.size :])
+    except ValueError as e:
+        raise MessageDecodeError(f"Invalid payload: {e}") from e
+    if not isinstance(payload, list):
+        raise MessageDecodeError("Invalid payload: Expected a list.")
+
+    return Message(message_type, job_id, payload, flags, seq)
+
+
+def is_legacy_message(data: bytes) -> bool:
+    """Check if data is a pickled message as sent by older versions of cluster_utils.
+
+    Pickle protocol 2 and above start with the PROTO opcode.
+    """
+    return data[:1] == b"\x80"
@@ -9,7 +9,13 @@ METADATA_FILE = "metadata.json"
 STATUS_PICKLE_FILE = "status.pickle"
 FULL_DF_FILE = "all_data.csv"
 REDUCED_DF_FILE = "reduced_data.csv"
+#: Name of the directory to which results of all jobs are saved in Parquet format.
+FULL_DF_PARQUET_DIR = "all_data.parquet"
+#: Name of the Parquet file to which results averaged per setting are saved.
+REDUCED_DF_PARQUET_FILE = "reduced_data.parquet"
 REPORT_DATA_FILE = "report_data.pickle"
+#: Name of the append-only journal with the events of an optimization run.
+RUN_JOURNAL_FILE = "journal.pickle"
 STD_ENDING = "__std"
 RESTART_PARAM_NAME = "job_restarts"
 
@@ -25,6 +31,33 @@ ITERATION = "_iteration"
 RESERVED_PARAMS = (ID, ITERATION, RESTART_PARAM_NAME)
 
 CONCLUDED_WITHOUT_RESULTS_GRACE_TIME_IN_SECS = 5.0
-JOB_MANAGER_LOOP_SLEEP_TIME_IN_SECS = 0.2
+#: Maximum time the main loop waits for events (job messages, keyboard input) before
+#: it polls the cluster system and updates the progress bars anyway.
+JOB_MANAGER_LOOP_MAX_WAIT_TIME_IN_SECS = 1.0
+
+#: Requested size of the receive buffer of the communication server socket.  A large
+#: buffer reduces the number of dropped messages when many jobs report at once.
+COMMUNICATION_SERVER_RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+#: Retransmission settings for messages that are sent in reliable mode.  The timeout is
+#: doubled after each attempt (up to the maximum).
+RELIABLE_MESSAGE_MAX_ATTEMPTS = 8
+RELIABLE_MESSAGE_INITIAL_TIMEOUT_IN_SECS = 0.25
+RELIABLE_MESSAGE_MAX_TIMEOUT_IN_SECS = 5.0
+#: Default for the minimum time between two transmissions of progress reports and
+#: intermediate results by a job.  Reports in between are combined.
+PROGRESS_REPORT_INTERVAL_IN_SECS = 1.0
+#: Maximum number of intermediate results that are combined into one message.
+EARLY_REPORT_MAX_BATCH_SIZE = 200
+#: Time that local jobs get to terminate after SIGTERM before they are killed with
+#: SIGKILL.
+LOCAL_JOB_TERMINATION_TIMEOUT_IN_SECS = 10.0
+#: Minimum growth of the run journal before a new snapshot of the optimizer is written.
+#: Beyond that, a snapshot is written when the journal has grown by as much as it had
+#: when the last snapshot was written, so snapshots get rarer as the run progresses.
+RUN_JOURNAL_MIN_BYTES_BETWEEN_SNAPSHOTS = 1024 * 1024
+#: Maximum number of jobs of a grid search that exist at the same time.  Jobs are only
+#: created for the next points of the grid when earlier ones have finished, so the
+#: memory needed does not depend on the size of the grid.
+GRID_SEARCH_MAX_LIVE_JOBS = 10000
 
 RETURN_CODE_FOR_RESUME = 3
@@ -99,6 +99,13 @@ def _init_job_script_argument_parser() -> argparse.ArgumentParser:
         metavar="<host>:<port>",
         help="IP and port used to connect to the cluster_utils main process.",
     )
+    parser.add_argument(
+        "--reliable-communication",
+        action="store_true",
+        help="""Retransmit important messages to the cluster_utils main process until
+            they are acknowledged.
+        """,
+    )
 
     return parser
 
@@ -201,6 +208,7 @@ def initialize_job(
         submission_state.communication_server_ip = args.cluster_utils_server["ip"]
         submission_state.communication_server_port = args.cluster_utils_server["port"]
         submission_state.job_id = args.job_id
+        submission_state.reliable_communication = args.reliable_communication
         submission_state.connection_details_available = True
         submission_state.connection_active = False
 
@@ -309,6 +317,7 @@ def finalize_job(metrics: MutableMapping[str, float], params) -> None:
 
     _save_dict_as_one_line_csv(metrics, metric_file)
     if submission_state.connection_active:
+        comm.progress_reporter.flush()
         comm.send_results_to_server(metrics)
 
 
@@ -318,6 +327,9 @@ def announce_early_results(metrics):
     Results reported with this function are by hyperparameter optimization to stop bad
     jobs early (see :confval:`kill_bad_jobs_early` option).
 
+    To limit the communication overhead, results of calls in quick succession are
+    combined and sent together (see :func:`set_progress_report_interval`).
+
     Args:
         metrics:  Dictionary with metrics that should be sent to the server.
     """
@@ -325,17 +337,7 @@ def announce_early_results(metrics):
         return
 
     sanitized = {key: _sanitize_numpy_torch(value) for key, value in metrics.items()}
-
-    print(
-        "Sending early results to: ",
-        (
-            submission_state.communication_server_ip,
-            submission_state.communication_server_port,
-        ),
-    )
-    comm.send_message(
-        MessageTypes.METRIC_EARLY_REPORT, message=(submission_state.job_id, sanitized)
-    )
+    comm.progress_reporter.report_early_results(sanitized)
 
 
 def announce_fraction_finished(fraction_finished: float) -> None:
@@ -344,23 +346,32 @@ def announce_fraction_finished(fraction_finished: float) -> None:
     You may use this function to report the progress of the job.  If done, the
     information is used by cluster_utils to estimate the remaining duration of the job.
 
+    If called in quick succession, only the latest value is sent to the server (see
+    :func:`set_progress_report_interval`).
+
     Args:
         fraction_finished: Value between 0 and 1, indicating the progress of the job.
     """
     if not submission_state.connection_active:
         return
 
-    print(
-        "Sending time estimate to: ",
-        (
-            submission_state.communication_server_ip,
-            submission_state.communication_server_port,
-        ),
-    )
-    comm.send_message(
-        MessageTypes.JOB_PROGRESS_PERCENTAGE,
-        message=(submission_state.job_id, fraction_finished),
-    )
+    comm.progress_reporter.report_fraction_finished(fraction_finished)
+
+
+def set_progress_report_interval(seconds: float) -> None:
+    """Set the minimum time between two transmissions of progress reports.
+
+    Calls of :func:`announce_early_results` and :func:`announce_fraction_finished` are
+    collected and sent to the server at most once per interval.  Pending reports are
+    always sent before the final results.  Set to 0 to send every report immediately.
+
+    Args:
+        seconds: Minimum time in seconds between two transmissions.  Defaults to
+            :attr:`~cluster_utils.base.constants.PROGRESS_REPORT_INTERVAL_IN_SECS`.
+    """
+    if seconds < 0:
+        raise ValueError("Interval must not be negative.")
+    comm.progress_reporter.interval = seconds
 
 
 def exit_for_resume() -> None:
@@ -376,6 +387,7 @@ def exit_for_resume() -> None:
         # TODO: shouldn't it at least sys.exit() in any case?
         return
     atexit.unregister(comm.report_exit_at_server)  # Disable exit reporting
+    comm.progress_reporter.flush()
     comm.send_message(MessageTypes.EXIT_FOR_RESUME, message=(submission_state.job_id,))
     sys.exit(constants.RETURN_CODE_FOR_RESUME)
 
@@ -417,4 +429,5 @@ __all__ = [
     "initialize_job",
     "save_metrics_params",
     "read_params_from_cmdline",
+    "set_progress_report_interval",
 ]
@@ -2,38 +2,116 @@
 
 from __future__ import annotations
 
-import pickle
+import math
+import random
 import socket
 import sys
+import threading
+import time
 import traceback
-from typing import Any
+from typing import Any, Mapping, Optional, Sequence
 
-from cluster_utils.base.communication import MessageTypes
+from cluster_utils.base import constants
+from cluster_utils.base.communication import (
+    FLAG_ACK_REQUESTED,
+    MessageDecodeError,
+    MessageTypes,
+    decode_message,
+    encode_message,
+)
 
 from . import submission_state
 
+#: Messages that are essential for the server to track the job.  In reliable mode, these
+#: are retransmitted until the server acknowledges them.
+RELIABLE_MESSAGE_TYPES = frozenset(
+    (
+        MessageTypes.JOB_STARTED,
+        MessageTypes.ERROR_ENCOUNTERED,
+        MessageTypes.JOB_SENT_RESULTS,
+        MessageTypes.JOB_CONCLUDED,
+        MessageTypes.EXIT_FOR_RESUME,
+    )
+)
+
+# start with a random sequence number, so that messages of a restarted job are not
+# mistaken as duplicates of messages of the previous run
+_sequence_number = random.getrandbits(32)
+
+
+# socket that is reused for all messages that do not need an acknowledgement
+_socket: Optional[socket.socket] = None
+_socket_lock = threading.Lock()
+
+
+def _next_sequence_number() -> int:
+    global _sequence_number
+    _sequence_number = (_sequence_number + 1) % 2**32
+    return _sequence_number
+
+
+def _send_without_ack(msg_data: bytes, server_address: tuple[str, int]) -> None:
+    global _socket
+    with _socket_lock:
+        if _socket is None:
+            _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # not sure if timeout is actually relevant for SOCK_DGRAM but let's set
+            # one to be sure
+            _socket.settimeout(10)
+        try:
+            _socket.sendto(msg_data, server_address)
+        except socket.error:
+            # create a new socket for the next message
+            _socket.close()
+            _socket = None
+            raise
+
 
 def send_message(message_type: MessageTypes, message: Any) -> None:
     """Send message to the cluster_utils server.
 
+    If reliable communication is enabled, important messages (see
+    :data:`RELIABLE_MESSAGE_TYPES`) are retransmitted until the server acknowledges
+    them.
+
     Args:
         message_type: The message type.
-        message: Additional information.  Needs to be pickleable.
+        message: Tuple with the job id as first element, followed by further
+            arguments of the message.  Needs to be JSON-serialisable.
     """
-    msg_data = pickle.dumps((message_type, message))
+    reliable = (
+        submission_state.reliable_communication
+        and message_type in RELIABLE_MESSAGE_TYPES
+    )
+    job_id, *payload = message
+    seq = _next_sequence_number()
+    msg_data = encode_message(
+        message_type,
+        job_id,
+        payload,
+        flags=FLAG_ACK_REQUESTED if reliable else 0,
+        seq=seq,
+    )
+    server_address = (
+        submission_state.communication_server_ip,
+        submission_state.communication_server_port,
+    )
 
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)  # Internet (IP)  # UDP
-        # not sure if timeout is actually relevant for SOCK_DGRAM but let's set one to
-        # be sure
-        sock.settimeout(10)
-        sock.sendto(
-            msg_data,
-            (
-                submission_state.communication_server_ip,
-                submission_state.communication_server_port,
-            ),
-        )
+        if reliable:
+            # use a separate socket, so that acknowledgements can be matched easily
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                acknowledged = _send_until_acknowledged(
+                    sock, msg_data, server_address, job_id, seq
+                )
+            if not acknowledged:
+                print(
+                    f"ERROR: Message {message_type.name} was not acknowledged by the"
+                    " cluster_utils server.",
+                    file=sys.stderr,
+                )
+        else:
+            _send_without_ack(msg_data, server_address)
     except socket.error as e:
         print(
             f"ERROR: Failed to send message {message_type.name} to cluster_utils"
@@ -42,6 +120,160 @@ def send_message(message_type: MessageTypes, message: Any) -> None:
         )
 
 
+def _send_until_acknowledged(
+    sock: socket.socket,
+    msg_data: bytes,
+    server_address: tuple[str, int],
+    job_id: int,
+    seq: int,
+) -> bool:
+    """Send message and retransmit it with exponential backoff until it is acknowledged.
+
+    Returns:
+        True if the message was acknowledged, False if all attempts timed out.
+    """
+    timeout = constants.RELIABLE_MESSAGE_INITIAL_TIMEOUT_IN_SECS
+    for _ in range(constants.RELIABLE_MESSAGE_MAX_ATTEMPTS):
+        sock.sendto(msg_data, server_address)
+
+        # add some jitter, so that jobs that finish at the same time do not retransmit
+        # in lockstep
+        deadline = time.monotonic() + timeout * random.uniform(1.0, 1.5)
+        while (remaining := deadline - time.monotonic()) > 0:
+            sock.settimeout(remaining)
+            try:
+                response, _ = sock.recvfrom(1024)
+            except socket.timeout:
+                break
+
+            try:
+                ack = decode_message(response)
+            except MessageDecodeError:
+                continue
+            if (
+                ack.message_type == MessageTypes.ACK
+                and ack.job_id == job_id
+                and ack.seq == seq
+            ):
+                return True
+
+        timeout = min(2 * timeout, constants.RELIABLE_MESSAGE_MAX_TIMEOUT_IN_SECS)
+
+    return False
+
+
+def compact_metric_history(
+    reports: Sequence[Mapping[str, Any]],
+) -> dict[str, list[Any]]:
+    """Convert list of metric dictionaries to a dictionary of lists.
+
+    Metrics that are missing in some of the reports are filled with None, so all lists
+    have the same length as ``reports``.
+    """
+    history: dict[str, list[Any]] = {}
+    for i, report in enumerate(reports):
+        for key, value in report.items():
+            if key not in history:
+                history[key] = [None] * i
+            history[key].append(value)
+        for values in history.values():
+            if len(values) == i:
+                values.append(None)
+
+    return history
+
+
+class ProgressReporter:
+    """Combines frequent progress reports of a job to limit the number of messages.
+
+    Reports are sent at most once per :attr:`interval` seconds.  Reports that arrive in
+    between are collected and sent together once the interval has passed: of the
+    progress only the latest value is sent, while all intermediate results are sent in
+    one message.
+    """
+
+    def __init__(
+        self, interval: float = constants.PROGRESS_REPORT_INTERVAL_IN_SECS
+    ) -> None:
+        #: Minimum time in seconds between two transmissions.
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._fraction_finished: Optional[float] = None
+        self._early_results: list[Mapping[str, Any]] = []
+        self._last_transmission = -math.inf
+        self._timer: Optional[threading.Timer] = None
+        self._announced_destination = False
+
+    def report_fraction_finished(self, fraction_finished: float) -> None:
+        with self._lock:
+            self._fraction_finished = fraction_finished
+            self._schedule_flush()
+
+    def report_early_results(self, metrics: Mapping[str, Any]) -> None:
+        with self._lock:
+            self._early_results.append(metrics)
+            if len(self._early_results) >= constants.EARLY_REPORT_MAX_BATCH_SIZE:
+                self._flush()
+            else:
+                self._schedule_flush()
+
+    def flush(self) -> None:
+        """Send all pending reports immediately."""
+        with self._lock:
+            self._flush()
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            # there is already a transmission scheduled
+            return
+
+        delay = self._last_transmission + self.interval - time.monotonic()
+        if delay <= 0:
+            self._flush()
+        else:
+            self._timer = threading.Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        early_results, self._early_results = self._early_results, []
+        fraction_finished, self._fraction_finished = self._fraction_finished, None
+        if not early_results and fraction_finished is None:
+            return
+
+        if not self._announced_destination:
+            print(
+                "Sending progress reports to: ",
+                (
+                    submission_state.communication_server_ip,
+                    submission_state.communication_server_port,
+                ),
+            )
+            self._announced_destination = True
+
+        self._last_transmission = time.monotonic()
+        if early_results:
+            send_message(
+                MessageTypes.METRIC_EARLY_REPORT_BATCH,
+                message=(
+                    submission_state.job_id,
+                    compact_metric_history(early_results),
+                ),
+            )
+        if fraction_finished is not None:
+            send_message(
+                MessageTypes.JOB_PROGRESS_PERCENTAGE,
+                message=(submission_state.job_id, fraction_finished),
+            )
+
+
+progress_reporter = ProgressReporter()
+
+
 def send_results_to_server(metrics):
     print(
         "Sending results to: ",
@@ -56,6 +288,7 @@ def send_results_to_server(metrics):
 
 
 def report_exit_at_server():
+    progress_reporter.flush()
     print(
         "Sending confirmation of exit to: ",
         (
@@ -67,6 +300,7 @@ def report_exit_at_server():
 
 
 def report_error_at_server(exctype, value, tb):
+    progress_reporter.flush()
     print(
         "Sending errors to: ",
         (
@@ -3,6 +3,7 @@
 communication_server_ip = None
 communication_server_port = None
 job_id = None
+reliable_communication = False
 connection_details_available = False
 connection_active = False
 start_time: float
@@ -9,13 +9,17 @@ from pathlib import Path
 from cluster_utils.base.utils import OptionalDependencyImport
 
 with OptionalDependencyImport("runner"):
-    from cluster_utils.base.constants import FULL_DF_FILE
     from cluster_utils.server.git_utils import make_git_params
     from cluster_utils.server.job_manager import grid_search
     from cluster_utils.server.latex_utils import (
         SectionFromJsonHook,
         StaticSectionGenerator,
     )
+    from cluster_utils.server.result_files import (
+        ResultFormat,
+        require_parquet_support,
+        write_full_data,
+    )
     from cluster_utils.server.settings import (
         GenerateReportSetting,
         SingularitySettings,
@@ -52,6 +56,10 @@ def main() -> int:
         # (already import here to fail early in case dependencies are missing)
         from cluster_utils.server.report import produce_gridsearch_report
 
+    result_format = ResultFormat.parse(params.get("result_format", "csv"))
+    if result_format == ResultFormat.PARQUET:
+        require_parquet_support()
+
     json_full_name = os.path.abspath(sys.argv[1])
 
     opt_procedure_name = params.optimization_procedure_name
@@ -116,6 +124,9 @@ def main() -> int:
         load_existing_results=params.get("load_existing_results", False),
         run_local=params.get("local_run", None),
         no_user_interaction=params.get("no_user_interaction", False),
+        reliable_communication=params.get("reliable_communication", False),
+        max_concurrent_submissions=params.get("max_concurrent_submissions", None),
+        accept_legacy_messages=params.get("accept_legacy_messages", False),
         opt_procedure_name=opt_procedure_name,
         singularity_settings=singularity_settings,
     )
@@ -127,7 +138,7 @@ def main() -> int:
         )
         return 1
 
-    df.to_csv(os.path.join(base_paths_and_files["result_dir"], FULL_DF_FILE))
+    write_full_data(df, base_paths_and_files["result_dir"], result_format)
 
     relevant_params = [param.param_name for param in hyperparam_dict]
     output_pdf = os.path.join(
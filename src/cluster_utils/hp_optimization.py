@@ -124,6 +124,10 @@ def main() -> int:
         kill_bad_jobs_early=params.get("kill_bad_jobs_early", False),
         early_killing_params=params.get("early_killing_params", {}),
         no_user_interaction=params.get("no_user_interaction", False),
+        reliable_communication=params.get("reliable_communication", False),
+        max_concurrent_submissions=params.get("max_concurrent_submissions", None),
+        accept_legacy_messages=params.get("accept_legacy_messages", False),
+        result_format=params.get("result_format", "csv"),
         opt_procedure_name=opt_procedure_name,
         report_generation_mode=params["generate_report"],
         singularity_settings=singularity_settings,
@@ -17,16 +17,16 @@ import sys
 import typing
 
 import colorama
-import pandas as pd
 
 from cluster_utils.base.constants import (
-    FULL_DF_FILE,
     METADATA_FILE,
     REPORT_DATA_FILE,
     STATUS_PICKLE_FILE,
 )
 from cluster_utils.server import report
-from cluster_utils.server.optimizers import Optimizer
+from cluster_utils.server.latex_utils import StaticSectionGenerator
+from cluster_utils.server.optimizers import Optimizer, load_optimizer
+from cluster_utils.server.result_files import find_full_data, read_table
 from cluster_utils.server.utils import ClusterRunType
 
 LOGGER_NAME = "generate_report"
@@ -98,8 +98,7 @@ def generate_hp_optimization_report(
 
     status_file = results_dir / STATUS_PICKLE_FILE
     logger.debug("Read file %s", status_file)
-    with open(status_file, "rb") as f:
-        optimizer: Optimizer = pickle.load(f)
+    optimizer: Optimizer = load_optimizer(str(status_file))
 
     report_data_file = results_dir / REPORT_DATA_FILE
     logger.debug("Read file %s", report_data_file)
@@ -123,16 +122,27 @@ def generate_grid_search_report(
 ) -> None:
     logger = logging.getLogger(LOGGER_NAME)
 
-    data_file = results_dir / FULL_DF_FILE
+    data_file = find_full_data(str(results_dir))
     other_info_file = results_dir / REPORT_DATA_FILE
 
-    logger.debug("Read file %s", data_file)
-    data = pd.read_csv(data_file)
-
     logger.debug("Read file %s", other_info_file)
     with open(other_info_file, "rb") as f:
         other_info = pickle.load(f)
 
+    # the report only needs parameters and metrics, unless a hook gets the data
+    columns: typing.Optional[list[str]] = [
+        *report.flatten_params(other_info["params"]),
+        *other_info["metrics"],
+    ]
+    if not all(
+        isinstance(getattr(hook, "section_generator", None), StaticSectionGenerator)
+        for hook in other_info.get("report_hooks", [])
+    ):
+        columns = None
+
+    logger.debug("Read file %s", data_file)
+    data = read_table(data_file, columns)
+
     report.produce_gridsearch_report(
         data,
         output_file=output_file,
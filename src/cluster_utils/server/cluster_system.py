@@ -1,25 +1,238 @@
 from __future__ import annotations
 
+import concurrent.futures
 import logging
 import shutil
+import threading
+import time
 from abc import ABC, abstractmethod
-from collections import deque
-from typing import TYPE_CHECKING, NewType, Optional, Sequence
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Callable, NewType, Optional, Sequence
 
 import colorama
 
-from .job import Job, JobStatus
-from .utils import rm_dir_full, styled
+from cluster_utils.base import constants
+
+from .job import Job, JobStatus, JobStatusListener
+from .utils import EventNotifier, rm_dir_full, styled
 
 if TYPE_CHECKING:
     from .condor_cluster_system import CondorClusterSubmission
     from .dummy_cluster_system import DummyClusterSubmission
+    from .run_journal import RunJournal
     from .slurm_cluster_system import SlurmClusterSubmission
 
 # use a dedicated type for cluster job ids instead of 'str' (this makes function
 # signatures easier to understand).  ClusterJobId will behave like a subclass of str.
 ClusterJobId = NewType("ClusterJobId", str)
 
+# marks the threads of the submission workers (see ClusterSubmission.dispatch_submissions)
+_submission_worker = threading.local()
+
+
+class JobRegistry:
+    """Index of jobs by their id and by their status.
+
+    Jobs that are added to the registry get a status listener attached, so the index
+    is updated automatically whenever :attr:`Job.status` changes.  This allows lookup
+    of jobs by id and counting of jobs per status in constant time, instead of
+    scanning the list of all jobs.
+
+    Status changes may happen in the thread of the communication server, so all
+    access to the index is protected by a lock.
+
+    Jobs that are finished can be removed with :meth:`retire`, so that runs with a huge
+    number of jobs do not need to keep all of them in memory.  Retired jobs are still
+    included in the counts (e.g. :meth:`count`) but not in the lists of jobs.
+    """
+
+    def __init__(
+        self,
+        on_change: Optional[Callable[[], None]] = None,
+        on_status_change: Optional[JobStatusListener] = None,
+    ) -> None:
+        """
+        Args:
+            on_change: Called (without arguments) after the status of a job changed.
+            on_status_change: Called with the job and its previous status after the
+                status of a job changed (but not when only results were set).
+        """
+        self._on_change = on_change
+        self._on_status_change_callback = on_status_change
+        self._lock = threading.Lock()
+        self._jobs_by_id: dict[int, Job] = {}
+        # dicts are used as ordered sets (mapping job id to job)
+        self._jobs_by_status: defaultdict[int, dict[int, Job]] = defaultdict(dict)
+        self._submitted_jobs: dict[int, Job] = {}
+        self._successful_jobs: dict[int, Job] = {}
+        # successful jobs whose results were not yet used (see pop_untold_jobs)
+        self._untold_jobs: dict[int, Job] = {}
+        # counts of retired jobs
+        self._n_retired_by_status: defaultdict[int, int] = defaultdict(int)
+        self._n_retired_submitted = 0
+        self._n_retired_successful = 0
+
+    def __len__(self) -> int:
+        return len(self._jobs_by_id) + self.n_retired
+
+    @property
+    def n_retired(self) -> int:
+        """Number of jobs that were removed with :meth:`retire`."""
+        return sum(self._n_retired_by_status.values())
+
+    @property
+    def n_live(self) -> int:
+        """Number of jobs that are registered and not retired."""
+        return len(self._jobs_by_id)
+
+    def __contains__(self, job: Job) -> bool:
+        return self._jobs_by_id.get(job.id) is job
+
+    def add(self, job: Job) -> None:
+        """Add job to the registry.
+
+        Raises:
+            ValueError: if a different job with the same id is already registered.
+        """
+        with self._lock:
+            if job.id in self._jobs_by_id:
+                if self._jobs_by_id[job.id] is job:
+                    return
+                raise ValueError(f"A job with id {job.id} is already registered.")
+
+            self._jobs_by_id[job.id] = job
+            self._index(job)
+        job.status_listener = self._on_status_change
+
+    def retire(self, job: Job) -> None:
+        """Remove a finished job from the registry but keep it in the counts.
+
+        Later status changes of the job are not tracked anymore.
+        """
+        with self._lock:
+            if self._jobs_by_id.get(job.id) is not job:
+                return
+            del self._jobs_by_id[job.id]
+            self._jobs_by_status[job.status].pop(job.id, None)
+            self._n_retired_by_status[job.status] += 1
+            if self._submitted_jobs.pop(job.id, None) is not None:
+                self._n_retired_submitted += 1
+            if self._successful_jobs.pop(job.id, None) is not None:
+                self._n_retired_successful += 1
+            self._untold_jobs.pop(job.id, None)
+        job.status_listener = None
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs_by_id.get(job_id)
+
+    def all_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs_by_id.values())
+
+    def jobs_with_status(self, *statuses: int) -> list[Job]:
+        with self._lock:
+            return [
+                job
+                for status in statuses
+                for job in self._jobs_by_status[status].values()
+            ]
+
+    def count(self, *statuses: int) -> int:
+        return sum(
+            len(self._jobs_by_status[status]) + self._n_retired_by_status.get(status, 0)
+            for status in statuses
+        )
+
+    def submitted_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._submitted_jobs.values())
+
+    def n_submitted(self) -> int:
+        return len(self._submitted_jobs) + self._n_retired_submitted
+
+    def successful_jobs(self) -> list[Job]:
+        with self._lock:
+            return list(self._successful_jobs.values())
+
+    def n_successful(self) -> int:
+        return len(self._successful_jobs) + self._n_retired_successful
+
+    def pop_untold_jobs(self) -> list[Job]:
+        """Take the successful jobs whose results were not yet used for an update.
+
+        Jobs are added when they become successful and each job is only returned once,
+        so this does not depend on the total number of jobs.
+        """
+        with self._lock:
+            jobs = [
+                job
+                for job in self._untold_jobs.values()
+                if not job.results_used_for_update
+            ]
+            self._untold_jobs.clear()
+        return jobs
+
+    def _index(self, job: Job) -> None:
+        self._jobs_by_status[job.status][job.id] = job
+        if job.cluster_id is not None:
+            self._submitted_jobs[job.id] = job
+        if job.status == JobStatus.CONCLUDED and job.has_results():
+            if not job.results_used_for_update:
+                self._untold_jobs[job.id] = job
+            self._successful_jobs[job.id] = job
+        else:
+            self._successful_jobs.pop(job.id, None)
+            self._untold_jobs.pop(job.id, None)
+
+    def _on_status_change(self, job: Job, old_status: int) -> None:
+        with self._lock:
+            if self._jobs_by_id.get(job.id) is not job:
+                # retired concurrently
+                return
+            self._jobs_by_status[old_status].pop(job.id, None)
+            self._index(job)
+        if self._on_status_change_callback is not None and job.status != old_status:
+            self._on_status_change_callback(job, old_status)
+        if self._on_change is not None:
+            self._on_change()
+
+
+class SubmissionLatency:
+    """Statistics about the time it takes to submit jobs to the cluster system.
+
+    Submissions may run in several worker threads, so updates are protected by a lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        #: Number of calls to the cluster system (one call may submit several jobs).
+        self.n_submissions = 0
+        #: Number of jobs that were submitted.
+        self.n_jobs = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float, n_jobs: int) -> None:
+        """Record a submission of ``n_jobs`` jobs that took ``seconds``."""
+        with self._lock:
+            self.n_submissions += 1
+            self.n_jobs += n_jobs
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    @property
+    def mean_seconds(self) -> float:
+        """Mean duration of a submission."""
+        if self.n_submissions == 0:
+            return 0.0
+        return self.total_seconds / self.n_submissions
+
+    def __str__(self) -> str:
+        return (
+            f"{self.n_jobs} jobs in {self.n_submissions} submissions, mean"
+            f" {self.mean_seconds:.2f} s, max {self.max_seconds:.2f} s per submission"
+        )
+
 
 class ClusterSubmission(ABC):
     """Base class for cluster system interfaces.
@@ -38,12 +251,36 @@ class ClusterSubmission(ABC):
     to be explicitly enqueued by calling :meth:`enqueue_job_for_submission`.
 
     By calling :meth:`submit_next` you can then submit jobs from the queue one by one in
-    FIFO order.
+    FIFO order.  Alternatively, :meth:`submit_next_batch` submits several jobs from the
+    queue at once, which cluster systems that support it (see
+    :attr:`MAX_SUBMISSION_BATCH_SIZE`) can do with a single call to the scheduler.
+
+    Both block until the scheduler accepted the jobs.  The main loop instead uses
+    :meth:`dispatch_submissions`, which hands the batches to a pool of worker threads
+    (at most :attr:`max_concurrent_submissions` at a time) and returns immediately.
+    Cluster id and status of the jobs are updated by the workers once the submission
+    is done.
     """
 
+    #: Maximum number of jobs that are submitted together by :meth:`submit_next_batch`.
+    #: Cluster systems that can submit several jobs efficiently in one go should
+    #: increase this and overwrite :meth:`submit_many_fn`.
+    MAX_SUBMISSION_BATCH_SIZE = 1
+
+    #: Default for :attr:`max_concurrent_submissions`.
+    MAX_CONCURRENT_SUBMISSIONS = 4
+
     def __init__(self, paths: dict[str, str], remove_jobs_dir: bool = True) -> None:
-        #: List of all jobs that have been registered via :meth:`add_jobs`.
-        self.jobs: list[Job] = []
+        #: Notified whenever something happens that the main loop should react on
+        #: (e.g. a job changed its status).
+        self.event_notifier = EventNotifier()
+        #: Index of all jobs that have been registered via :meth:`add_jobs`.
+        self.job_registry = JobRegistry(
+            on_change=self.event_notifier.notify,
+            on_status_change=self._on_job_status_change,
+        )
+        #: If set, submissions and status changes of jobs are recorded in this journal.
+        self.run_journal: Optional[RunJournal] = None
         #: Queue of jobs that are waiting to be submitted.
         self.submission_queue: deque[Job] = deque()
         self.remove_jobs_dir = remove_jobs_dir
@@ -51,6 +288,20 @@ class ClusterSubmission(ABC):
         self.submission_hooks: dict[str, ClusterSubmissionHook] = dict()
         self._inc_job_id = -1
         self.error_msgs: set[str] = set()
+        #: Maximum number of submissions that are run in parallel by
+        #: :meth:`dispatch_submissions`.
+        self.max_concurrent_submissions = self.MAX_CONCURRENT_SUBMISSIONS
+        #: Time it took to submit jobs to the cluster system.
+        self.submission_latency = SubmissionLatency()
+        self._submission_executor: Optional[concurrent.futures.ThreadPoolExecutor] = (
+            None
+        )
+        self._pending_submissions: set[concurrent.futures.Future] = set()
+
+    @property
+    def jobs(self) -> list[Job]:
+        """List of all jobs that have been registered via :meth:`add_jobs`."""
+        return self.job_registry.all_jobs()
 
     @property
     def current_jobs(self) -> list[Job]:
@@ -65,6 +316,14 @@ class ClusterSubmission(ABC):
         self._inc_job_id += 1
         return self._inc_job_id
 
+    def reserve_job_ids(self, max_job_id: int) -> None:
+        """Make sure :attr:`inc_job_id` only returns ids greater than ``max_job_id``.
+
+        Used when continuing a run, so that new jobs do not reuse ids (and thus working
+        directories) of jobs of the earlier run.
+        """
+        self._inc_job_id = max(self._inc_job_id, max_job_id)
+
     def register_submission_hook(self, hook: ClusterSubmissionHook) -> None:
         assert isinstance(hook, ClusterSubmissionHook)
         if hook.state > 0:
@@ -101,11 +360,8 @@ class ClusterSubmission(ABC):
     def save_job_info(self, result_dir: str) -> bool:
         return False
 
-    def get_job(self, job_id):
-        for job in self.jobs:
-            if job.id == job_id:
-                return job
-        return None
+    def get_job(self, job_id: int) -> Optional[Job]:
+        return self.job_registry.get(job_id)
 
     def add_jobs(self, jobs: Job | list[Job], enqueue: bool = True) -> None:
         """Register a new job.
@@ -117,11 +373,36 @@ class ClusterSubmission(ABC):
         """
         if not isinstance(jobs, list):
             jobs = [jobs]
-        self.jobs = self.jobs + jobs
+        for job in jobs:
+            self.job_registry.add(job)
 
         if enqueue:
             self.submission_queue.extend(jobs)
 
+    def retire_completed_jobs(self) -> list[Job]:
+        """Remove all completed (i.e. concluded or failed) jobs from the index.
+
+        They still count as completed, successful or failed jobs, but are not included
+        in any list of jobs anymore and status changes are not tracked anymore, so the
+        caller should keep what it needs of them (e.g. the results).  Error messages
+        of failed jobs are reported before they are removed.
+
+        Returns:
+            The removed jobs.
+        """
+        self._check_error_msgs()
+        jobs = self.completed_jobs
+        for job in jobs:
+            self.job_registry.retire(job)
+            self._on_job_retired(job)
+        return jobs
+
+    def _on_job_retired(self, job: Job) -> None:  # noqa: B027
+        """Called for every job that is removed by :meth:`retire_completed_jobs`.
+
+        Cluster systems that keep state per job should overwrite this to release it.
+        """
+
     def enqueue_job_for_submission(self, job: Job) -> None:
         """Add job to the submission queue."""
         self.submission_queue.append(job)
@@ -147,101 +428,228 @@ class ClusterSubmission(ABC):
 
         self._submit(job)
 
+    def submit_next_batch(self, max_jobs: Optional[int] = None) -> int:
+        """Submit the next jobs from the submission queue together.
+
+        Args:
+            max_jobs: Maximum number of jobs to submit.  The number is further limited
+                by :attr:`MAX_SUBMISSION_BATCH_SIZE`.
+
+        Returns:
+            The number of jobs that were submitted (0 if the queue is empty).
+        """
+        logger = logging.getLogger("cluster_utils")
+
+        jobs = self._pop_next_batch(max_jobs)
+        if jobs:
+            logger.debug("Submit next %d jobs from queue.", len(jobs))
+            self.submit_many(jobs)
+
+        return len(jobs)
+
+    def dispatch_submissions(self) -> int:
+        """Submit jobs from the submission queue in the background.
+
+        Batches of jobs (see :meth:`submit_next_batch`) are handed to a pool of worker
+        threads, so that slow calls to the scheduler do not block the caller.  At most
+        :attr:`max_concurrent_submissions` submissions run at the same time.  When all
+        workers are busy, the remaining jobs stay in the submission queue until a
+        later call.  The :attr:`event_notifier` is notified whenever a submission
+        finishes.
+
+        Raises:
+            Exception: Errors of background submissions that finished since the last
+                call are re-raised here.
+
+        Returns:
+            The number of jobs that were handed to the workers.
+        """
+        logger = logging.getLogger("cluster_utils")
+        self._collect_finished_submissions()
+
+        n_dispatched = 0
+        while (
+            self.submission_queue
+            and len(self._pending_submissions) < self.max_concurrent_submissions
+        ):
+            jobs = self._pop_next_batch()
+            logger.debug("Dispatch submission of %d jobs.", len(jobs))
+            for job in jobs:
+                self._prepare_submission(job)
+            statuses = [job.status for job in jobs]
+
+            if self._submission_executor is None:
+                self._submission_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_submissions,
+                    thread_name_prefix="submission",
+                )
+            future = self._submission_executor.submit(
+                self._submit_in_background, jobs, statuses
+            )
+            future.add_done_callback(lambda _: self.event_notifier.notify())
+            self._pending_submissions.add(future)
+            n_dispatched += len(jobs)
+
+        return n_dispatched
+
+    @property
+    def n_pending_submissions(self) -> int:
+        """Number of background submissions that are dispatched but not collected."""
+        return len(self._pending_submissions)
+
+    def _collect_finished_submissions(self) -> None:
+        finished = {future for future in self._pending_submissions if future.done()}
+        self._pending_submissions -= finished
+        for future in finished:
+            # re-raises the exception if the submission failed
+            future.result()
+
+    def _submit_in_background(self, jobs: Sequence[Job], statuses: list[int]) -> None:
+        _submission_worker.active = True
+        cluster_ids = self._timed_submit_many_fn(jobs)
+        for job, status, cluster_id in zip(jobs, statuses, cluster_ids):
+            self._mark_submitted(job, cluster_id, status)
+
+    def _pop_next_batch(self, max_jobs: Optional[int] = None) -> list[Job]:
+        batch_size = self.MAX_SUBMISSION_BATCH_SIZE
+        if max_jobs is not None:
+            batch_size = min(batch_size, max_jobs)
+        batch_size = min(batch_size, len(self.submission_queue))
+
+        return [self.submission_queue.popleft() for _ in range(batch_size)]
+
     @property
     def submitted_jobs(self) -> list[Job]:
-        return [job for job in self.current_jobs if job.cluster_id is not None]
+        return self.job_registry.submitted_jobs()
 
     @property
     def n_submitted_jobs(self) -> int:
-        return len(self.submitted_jobs)
+        return self.job_registry.n_submitted()
 
     @property
     def running_jobs(self) -> list[Job]:
-        running_jobs = [
-            job for job in self.current_jobs if job.status == JobStatus.RUNNING
-        ]
-        return running_jobs
+        return self.job_registry.jobs_with_status(JobStatus.RUNNING)
 
     @property
     def n_running_jobs(self) -> int:
-        return len(self.running_jobs)
+        return self.job_registry.count(JobStatus.RUNNING)
 
     @property
     def completed_jobs(self) -> list[Job]:
-        completed_jobs = [
-            job
-            for job in self.current_jobs
-            if job.status == JobStatus.CONCLUDED or job.status == JobStatus.FAILED
-        ]
-        return completed_jobs
+        return self.job_registry.jobs_with_status(JobStatus.CONCLUDED, JobStatus.FAILED)
 
     @property
     def n_completed_jobs(self) -> int:
-        return len(self.completed_jobs)
+        return self.job_registry.count(JobStatus.CONCLUDED, JobStatus.FAILED)
 
     @property
     def idle_jobs(self) -> list[Job]:
-        idle_jobs = [
-            job
-            for job in self.current_jobs
-            if job.status in [JobStatus.SUBMITTED, JobStatus.INITIAL_STATUS]
-        ]
-        return idle_jobs
+        return self.job_registry.jobs_with_status(
+            JobStatus.SUBMITTED, JobStatus.INITIAL_STATUS
+        )
 
     @property
     def n_idle_jobs(self) -> int:
-        return len(self.idle_jobs)
+        return self.job_registry.count(JobStatus.SUBMITTED, JobStatus.INITIAL_STATUS)
 
     @property
     def successful_jobs(self) -> list[Job]:
-        return [
-            job
-            for job in self.current_jobs
-            if job.status == JobStatus.CONCLUDED and job.get_results() is not None
-        ]
+        return self.job_registry.successful_jobs()
 
     @property
     def n_successful_jobs(self) -> int:
-        return len(self.successful_jobs)
+        return self.job_registry.n_successful()
+
+    def pop_untold_jobs(self) -> list[Job]:
+        """Take the successful jobs whose results were not yet told to the optimizer.
+
+        Each job is returned only once, so the caller has to pass the jobs to the
+        optimizer (which marks them with ``results_used_for_update``).
+        """
+        return self.job_registry.pop_untold_jobs()
 
     @property
     def failed_jobs(self) -> list[Job]:
+        # completed jobs that are not successful, i.e. failed jobs and jobs that
+        # concluded without providing results
         return [
             job
             for job in self.completed_jobs
-            if job.status == JobStatus.FAILED
-            or (
-                job.get_results() is None
-                and job.status != JobStatus.CONCLUDED_WITHOUT_RESULTS
-            )
+            if job.status == JobStatus.FAILED or not job.has_results()
         ]
 
     @property
     def n_failed_jobs(self) -> int:
-        return len(self.failed_jobs)
+        return self.n_completed_jobs - self.n_successful_jobs
 
     @property
     def n_total_jobs(self) -> int:
-        return len(self.current_jobs)
+        return len(self.job_registry)
 
     def submit_all(self) -> None:
         for job in self.current_jobs:
             if job.cluster_id is None:
                 self._submit(job)
 
+    def submit_many(self, jobs: Sequence[Job]) -> None:
+        """Submit the given jobs together (see :meth:`submit_many_fn`)."""
+        for job in jobs:
+            self._prepare_submission(job)
+
+        cluster_ids = self._timed_submit_many_fn(jobs)
+        for job, cluster_id in zip(jobs, cluster_ids):
+            self._mark_submitted(job, cluster_id)
+
+    def _timed_submit_many_fn(self, jobs: Sequence[Job]) -> list[ClusterJobId]:
+        start = time.monotonic()
+        cluster_ids = self.submit_many_fn(jobs)
+        self.submission_latency.add(time.monotonic() - start, len(jobs))
+
+        if len(cluster_ids) != len(jobs):
+            raise SubmissionError(
+                f"Submitted {len(jobs)} jobs but got {len(cluster_ids)} cluster ids."
+            )
+        return cluster_ids
+
     def _submit(self, job: Job) -> None:
+        self._prepare_submission(job)
+        start = time.monotonic()
+        cluster_id = self.submit_fn(job)
+        self.submission_latency.add(time.monotonic() - start, 1)
+        self._mark_submitted(job, cluster_id)
+
+    def _prepare_submission(self, job: Job) -> None:
         logger = logging.getLogger("cluster_utils")
         if job.cluster_id is not None and not job.waiting_for_resume:
             raise RuntimeError("Can not run a job that already ran")
-        if job not in self.jobs:
+        if job not in self.job_registry:
             logger.warning(
                 "Submitting job that was not yet added to the cluster system interface,"
                 " will add it now"
             )
-            self.add_jobs(job)
-        cluster_id = self.submit_fn(job)
+            self.add_jobs(job, enqueue=False)
+
+    def _mark_submitted(
+        self,
+        job: Job,
+        cluster_id: ClusterJobId,
+        status_before_submission: Optional[int] = None,
+    ) -> None:
+        """Set cluster id and status of a job after it was submitted.
+
+        Args:
+            job: The submitted job.
+            cluster_id: The id the cluster system assigned to the job.
+            status_before_submission: If set, the status is only changed to SUBMITTED
+                if the job still has this status.  When submitting in the background,
+                the job may already have reported that it is running.
+        """
+        logger = logging.getLogger("cluster_utils")
         job.cluster_id = cluster_id
-        job.status = JobStatus.SUBMITTED
+        if self.run_journal is not None:
+            self.run_journal.record_submitted(job.id, cluster_id, job.run_script_path)
+        if status_before_submission is None or job.status == status_before_submission:
+            job.status = JobStatus.SUBMITTED
 
         if job.waiting_for_resume:
             logger.info(
@@ -252,6 +660,10 @@ class ClusterSubmission(ABC):
                 "Job with id %d submitted with cluster id %s", job.id, job.cluster_id
             )
 
+    def _on_job_status_change(self, job: Job, old_status: int) -> None:
+        if self.run_journal is not None:
+            self.run_journal.record_status(job.id, job.status)
+
     def resume(self, job: Job) -> None:
         """Resume a job that was terminated with :func:`~cluster_utils.exit_for_resume`."""
         job.waiting_for_resume = True
@@ -309,10 +721,30 @@ class ClusterSubmission(ABC):
     def submit_fn(self, job: Job) -> ClusterJobId:
         raise NotImplementedError
 
+    def submit_many_fn(self, jobs: Sequence[Job]) -> list[ClusterJobId]:
+        """Submit several jobs and return their cluster ids (in the same order).
+
+        The default implementation simply calls :meth:`submit_fn` for each job.
+        Overwrite this for cluster systems that support submitting several jobs at
+        once.
+        """
+        return [self.submit_fn(job) for job in jobs]
+
     @abstractmethod
     def stop_fn(self, cluster_id: ClusterJobId) -> None:
         raise NotImplementedError
 
+    def query_active_jobs(
+        self, cluster_ids: Sequence[ClusterJobId]
+    ) -> set[ClusterJobId]:
+        """Check which of the given jobs are still queued or running.
+
+        Used to reattach to the jobs of an interrupted run.  The default implementation
+        assumes that jobs can not be tracked by a different process and returns an
+        empty set.
+        """
+        return set()
+
     @abstractmethod
     def is_ready_to_check_for_failed_jobs(self) -> bool:
         """Return if it's okay to call :meth:`check_for_failed_jobs`.
@@ -322,6 +754,15 @@ class ClusterSubmission(ABC):
         """
         raise NotImplementedError
 
+    def seconds_until_next_check_for_failed_jobs(self) -> float:
+        """Return how long it takes until the next check for failed jobs is due.
+
+        The main loop waits for events at most this long before it polls the cluster
+        system again.  Systems that throttle :meth:`is_ready_to_check_for_failed_jobs`
+        should overwrite this to return the remaining time until the next check.
+        """
+        return constants.JOB_MANAGER_LOOP_MAX_WAIT_TIME_IN_SECS
+
     @abstractmethod
     def mark_failed_jobs(self, jobs: Sequence[Job]) -> None:
         """Check if the given jobs failed on the cluster.
@@ -333,6 +774,20 @@ class ClusterSubmission(ABC):
 
     def close(self) -> None:
         logger = logging.getLogger("cluster_utils")
+        if self._submission_executor is not None:
+            # Wait for running submissions, so their jobs are stopped as well.  Cluster
+            # systems may call close() from a worker when a submission fails, which
+            # must not wait for itself.
+            in_worker = getattr(_submission_worker, "active", False)
+            self._submission_executor.shutdown(wait=not in_worker)
+            self._submission_executor = None
+        if self.submission_latency.n_submissions:
+            logger.info(
+                "Submission latency of %s: %s",
+                type(self).__name__,
+                self.submission_latency,
+            )
+
         self.stop_all()
 
         if self.remove_jobs_dir:
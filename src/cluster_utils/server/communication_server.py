@@ -1,15 +1,25 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import logging
 import pickle
 import signal
 import socket
 import threading
 import time
+from collections import deque
+from typing import Any, Optional
 
 from cluster_utils.base import constants
-from cluster_utils.base.communication import MessageTypes
+from cluster_utils.base.communication import (
+    FLAG_ACK_REQUESTED,
+    MessageDecodeError,
+    MessageTypes,
+    decode_message,
+    encode_message,
+    is_legacy_message,
+)
 
 from .job import JobStatus
 
@@ -25,16 +35,67 @@ class DatagramProtocol:
 
     def datagram_received(self, data, addr):
         if data is not None:
-            self.server.handle_message(data)
+            self.server.handle_message(data, addr)
+
+
+class DuplicateMessageFilter:
+    """Detect retransmitted messages based on their sequence numbers.
+
+    For each job, the sequence numbers of the most recent messages are remembered.  A
+    message is only remembered (:meth:`mark`) after it was processed successfully, so
+    that a retransmission of a message whose processing failed is processed again.
+    """
+
+    def __init__(self, window_size: int = 64) -> None:
+        self.window_size = window_size
+        self._seen: dict[int, tuple[set[int], deque[int]]] = {}
+
+    def seen(self, job_id: int, seq: int) -> bool:
+        """Check if the message was processed before."""
+        return job_id in self._seen and seq in self._seen[job_id][0]
+
+    def mark(self, job_id: int, seq: int) -> None:
+        """Remember that the message was processed."""
+        seen_set, seen_order = self._seen.setdefault(job_id, (set(), deque()))
+        if seq in seen_set:
+            return
+
+        seen_set.add(seq)
+        seen_order.append(seq)
+        if len(seen_order) > self.window_size:
+            seen_set.discard(seen_order.popleft())
 
 
 class CommunicationServer:
-    def __init__(self, cluster_system):
+    def __init__(
+        self,
+        cluster_system,
+        reliable_communication: bool = False,
+        port: int = 0,
+        accept_legacy_messages: bool = False,
+    ):
+        """
+        Args:
+            cluster_system: The cluster system interface that manages the jobs.
+            reliable_communication: If true, jobs are told to retransmit important
+                messages until they are acknowledged by the server.
+            port: Port on which the server should listen.  If 0 or if the port is not
+                available, a free port is picked automatically.
+            accept_legacy_messages: If true, messages in the pickle format of old
+                cluster_utils versions are accepted.  This is insecure, as anyone who
+                can send messages to the server can execute arbitrary code with them.
+                If false, such messages are dropped.
+        """
         logger = logging.getLogger("cluster_utils")
         self.event_loop = None
+        self.transport = None
         self.ip_adress = self.get_own_ip()
         self.port = None
         self.cluster_system = cluster_system
+        self.reliable_communication = reliable_communication
+        self.accept_legacy_messages = accept_legacy_messages
+        self.duplicate_filter = DuplicateMessageFilter()
+        self._warned_about_legacy_messages = False
 
         self.handlers = {
             MessageTypes.JOB_STARTED: self.handle_job_started,
@@ -44,16 +105,23 @@ class CommunicationServer:
             MessageTypes.EXIT_FOR_RESUME: self.handle_exit_for_resume,
             MessageTypes.JOB_PROGRESS_PERCENTAGE: self.handle_job_progress,
             MessageTypes.METRIC_EARLY_REPORT: self.handle_metric_early_report,
+            MessageTypes.METRIC_EARLY_REPORT_BATCH: (
+                self.handle_metric_early_report_batch
+            ),
         }
 
         logger.info(f"Master script running on IP: {self.ip_adress}")
-        self.start_listening()
+        self.start_listening(port)
 
     @property
     def connection_info(self):
         if self.ip_adress is None or self.port is None:
             raise ValueError("Either IP adress or port are not known yet.")
-        return {"ip": self.ip_adress, "port": self.port}
+        return {
+            "ip": self.ip_adress,
+            "port": self.port,
+            "reliable": self.reliable_communication,
+        }
 
     def get_own_ip(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -67,30 +135,52 @@ class CommunicationServer:
             s.close()
         return ip
 
-    def start_listening(self):
+    def start_listening(self, port: int = 0):
         logger = logging.getLogger("cluster_utils")
 
         self.event_loop = asyncio.get_event_loop()
 
         # create UDP server
-        coroutine = self.event_loop.create_datagram_endpoint(
-            lambda: DatagramProtocol(self),
-            # setting port to 0 makes it automatically pick a free port
-            local_addr=(self.ip_adress, 0),
-        )
-        transport, _ = self.event_loop.run_until_complete(coroutine)
+        try:
+            self.transport = self._create_endpoint(port)
+        except OSError as e:
+            if port == 0:
+                raise
+            logger.warning(
+                "Could not listen on port %d (%s), picking a different one.", port, e
+            )
+            self.transport = self._create_endpoint(0)
 
         # get the port it chose from the underlying socket object
-        socket = transport.get_extra_info("socket")
-        self.port = socket.getsockname()[1]
+        sock = self.transport.get_extra_info("socket")
+        self.port = sock.getsockname()[1]
         logger.info(f"Communication happening on port: {self.port}")
 
+        # a larger receive buffer helps to not drop messages when many jobs report at
+        # the same time (the OS may limit the actual size)
+        with contextlib.suppress(OSError):
+            sock.setsockopt(
+                socket.SOL_SOCKET,
+                socket.SO_RCVBUF,
+                constants.COMMUNICATION_SERVER_RECEIVE_BUFFER_SIZE,
+            )
+
         # register a signal handler to stop the event loop on SIGINT
         self.event_loop.add_signal_handler(signal.SIGINT, self.event_loop.stop)
 
         t = threading.Thread(target=self.event_loop.run_forever, daemon=True)
         t.start()
 
+    def _create_endpoint(self, port: int):
+        assert self.event_loop is not None
+        coroutine = self.event_loop.create_datagram_endpoint(
+            lambda: DatagramProtocol(self),
+            # setting port to 0 makes it automatically pick a free port
+            local_addr=(self.ip_adress, port),
+        )
+        transport, _ = self.event_loop.run_until_complete(coroutine)
+        return transport
+
     def handle_job_started(self, message):
         logger = logging.getLogger("cluster_utils")
         job_id, hostname = message
@@ -117,8 +207,7 @@ class CommunicationServer:
                 "Job was not in the list of jobs but encountered an error... fucked up"
                 " twice, huh?"
             )
-        job.status = JobStatus.FAILED
-        job.error_info = "".join(strings)
+        job.mark_failed("".join(strings))
 
     def handle_job_sent_results(self, message):
         logger = logging.getLogger("cluster_utils")
@@ -137,7 +226,7 @@ class CommunicationServer:
             logger.info(f"Job {job_id} sent results.")
         job.metrics = metrics
         job.set_results()
-        if job.get_results() is None:
+        if not job.has_results():
             raise ValueError("Job sent metrics but something went wrong")
 
     def handle_job_concluded(self, message):
@@ -149,7 +238,7 @@ class CommunicationServer:
                 "Received a job-concluded-message from a job that is not listed in the"
                 " cluster interface system"
             )
-        if job.status != JobStatus.SENT_RESULTS or job.get_results() is None:
+        if job.status != JobStatus.SENT_RESULTS or not job.has_results():
             # It is possible that the CONCLUDED message is processed before the SENT_RESULTS
             # message. We catch that case here by moving the job to an intermediate concluded state
             # and that is either changed to CONCLUDED when the SENT_RESULTS message arrives, or to
@@ -158,8 +247,7 @@ class CommunicationServer:
 
             def fail_job_if_still_no_results():
                 if job.status == JobStatus.CONCLUDED_WITHOUT_RESULTS:
-                    job.status = JobStatus.FAILED
-                    job.error_info = "Job concluded but sent no results."
+                    job.mark_failed("Job concluded but sent no results.")
                     logger.info(
                         f"Job {job_id} has concluded, but has not sent results after"
                         f" {constants.CONCLUDED_WITHOUT_RESULTS_GRACE_TIME_IN_SECS} seconds."
@@ -209,17 +297,92 @@ class CommunicationServer:
             job.reported_metric_values = job.reported_metric_values or []
             job.reported_metric_values.append(metrics[job.metric_to_watch])
 
-    def handle_message(self, pickled_data: bytes) -> None:
-        """Handle a pickled message."""
-        msg_type_idx, message = pickle.loads(pickled_data)
+    def handle_metric_early_report_batch(self, message):
+        logger = logging.getLogger("cluster_utils")
+        job_id, metric_history = message
+        job = self.cluster_system.get_job(job_id)
+        values = [
+            value
+            for value in metric_history.get(job.metric_to_watch, [])
+            if value is not None
+        ]
+        logger.info(f"Job {job_id} sent {len(values)} intermediate results.")
+        if values:
+            logger.info(
+                f"Job {job_id} currently has {job.metric_to_watch}={values[-1]}."
+            )
+            job.reported_metric_values = job.reported_metric_values or []
+            job.reported_metric_values.extend(values)
+
+    def handle_message(self, data: bytes, addr: Optional[Any] = None) -> None:
+        """Decode a received message and pass it to the corresponding handler.
+
+        Args:
+            data: The received data.
+            addr: Address of the sender.  Needed to send acknowledgements.
+        """
+        logger = logging.getLogger("cluster_utils")
+
+        decoded = None
+        if is_legacy_message(data):
+            if not self.accept_legacy_messages:
+                logger.error(
+                    "Dropped message in the pickle format of old cluster_utils versions"
+                    " (from %s).  Please make sure that the jobs use the same version"
+                    " of cluster_utils as the server.",
+                    addr,
+                )
+                return
+            msg_type_idx, message = self._decode_legacy_message(data)
+        else:
+            try:
+                decoded = decode_message(data)
+            except MessageDecodeError as e:
+                logger.error("Received invalid message: %s  Raw data: %s", e, data)
+                return
+            msg_type_idx, message = decoded.message_type, decoded.arguments
+
+        ack_requested = decoded is not None and decoded.flags & FLAG_ACK_REQUESTED
+        if ack_requested and self.duplicate_filter.seen(decoded.job_id, decoded.seq):
+            # the acknowledgement got lost, so the job sent the message again
+            logger.debug(
+                "Ignore duplicate message %s of job %d.", msg_type_idx, decoded.job_id
+            )
+            self._send_ack(decoded.job_id, decoded.seq, addr)
+            return
 
         if msg_type_idx in self.handlers:
             self.handlers[msg_type_idx](message)
+            if ack_requested:
+                # only after the message was processed, otherwise the retransmission
+                # of a message whose handler failed would be ignored
+                self.duplicate_filter.mark(decoded.job_id, decoded.seq)
+                self._send_ack(decoded.job_id, decoded.seq, addr)
+            # let the main loop react on the new information
+            self.cluster_system.event_notifier.notify()
         else:
-            logger = logging.getLogger("cluster_utils")
             logger.error(
                 "Received invalid message: type: %s, message: %s, raw data: %s.",
                 msg_type_idx,
                 message,
-                pickled_data,
+                data,
+            )
+
+    def _send_ack(self, job_id: int, seq: int, addr: Optional[Any]) -> None:
+        if addr is None or self.transport is None:
+            return
+        self.transport.sendto(
+            encode_message(MessageTypes.ACK, job_id, [], seq=seq), addr
+        )
+
+    def _decode_legacy_message(self, pickled_data: bytes) -> tuple[int, Any]:
+        """Decode a pickled message as sent by jobs using an old cluster_utils version."""
+        if not self._warned_about_legacy_messages:
+            logger = logging.getLogger("cluster_utils")
+            logger.warning(
+                "Received message in the deprecated pickle format.  Please make sure"
+                " that the jobs use the same version of cluster_utils as the server."
             )
+            self._warned_about_legacy_messages = True
+
+        return pickle.loads(pickled_data)
@@ -2,14 +2,16 @@
 
 from __future__ import annotations
 
+import json
 import logging
 import os
+import re
 import subprocess
+import time
 from collections import namedtuple
-from contextlib import suppress
 from copy import copy
 from subprocess import PIPE, run
-from typing import Any, Sequence
+from typing import Any, NamedTuple, Optional, Sequence
 
 from cluster_utils.base.constants import RETURN_CODE_FOR_RESUME
 
@@ -39,8 +41,10 @@ fi
 # TODO: the MPI_CLUSTER_RUN_SCRIPT above does not forward errorcodes other than 1 and 3.
 # Could this be a problem?
 
-MPI_CLUSTER_JOB_SPEC_FILE = f"""# Submission ID %(id)d
-JobBatchName=%(opt_procedure_name)s
+# Settings of the submit description that are shared by single and bulk submissions.
+# For bulk submissions, %(run_script_file_path)s is replaced by a Condor macro that is
+# set per job.
+_MPI_CLUSTER_JOB_SPEC_SETTINGS = f"""JobBatchName=%(opt_procedure_name)s
 executable = %(run_script_file_path)s
 
 error = %(run_script_file_path)s.err
@@ -64,10 +68,22 @@ getenv=True
 %(concurrent_line)s
 
 %(extra_submission_lines)s
+"""
 
+MPI_CLUSTER_JOB_SPEC_FILE = f"""# Submission ID %(id)d
+{_MPI_CLUSTER_JOB_SPEC_SETTINGS}
 queue
 """
 
+# Submit description for several jobs at once.  Each job gets its own process in the
+# same cluster (with process ids in the order of the list).
+MPI_CLUSTER_BULK_JOB_SPEC_FILE = f"""# Submission IDs %(ids)s
+{_MPI_CLUSTER_JOB_SPEC_SETTINGS}
+queue run_script from (
+%(run_scripts)s
+)
+"""
+
 
 CondorRecord = namedtuple(
     "CondorRecord",
@@ -85,7 +101,176 @@ CondorRecord = namedtuple(
 )
 
 
+# Codes of the events in the job event log (see "Job Event Log Codes" in the HTCondor
+# manual)
+CONDOR_EVENT_EXECUTE = 1
+CONDOR_EVENT_TERMINATED = 5
+
+# Values of the JobStatus attribute
+CONDOR_JOB_STATUS_REMOVED = 3
+CONDOR_JOB_STATUS_COMPLETED = 4
+
+_CONDOR_EVENT_HEADER_PATTERN = re.compile(r"(\d{3}) \((\d+)\.(\d+)\.\d+\) (.*)")
+_CONDOR_RETURN_VALUE_PATTERN = re.compile(r"\(return value (-?\d+)\)")
+
+
+def normalize_condor_job_id(cluster_id: str) -> str:
+    """Convert a job id to the form "cluster.proc" (proc defaults to 0)."""
+    return cluster_id if "." in cluster_id else f"{cluster_id}.0"
+
+
+class CondorLogEvent(NamedTuple):
+    """Event from the job event log of HTCondor.
+
+    Attributes:
+        code: Event code (e.g. 5 for "Job terminated").
+        job_id: Id of the job in the form "cluster.proc".
+        text: Remaining text of the event (header after the time stamp and all further
+            lines of the event).
+    """
+
+    code: int
+    job_id: str
+    text: str
+
+    @classmethod
+    def parse(cls, lines: Sequence[str]) -> Optional[CondorLogEvent]:
+        match = _CONDOR_EVENT_HEADER_PATTERN.match(lines[0]) if lines else None
+        if not match:
+            return None
+        code, cluster, proc, header = match.groups()
+        # header starts with date and time
+        description = header.split(" ", 2)[-1]
+        return cls(
+            code=int(code),
+            job_id=f"{int(cluster)}.{int(proc)}",
+            text="\n".join([description, *lines[1:]]),
+        )
+
+    @property
+    def return_value(self) -> Optional[int]:
+        """Return value of the job (for "Job terminated" events)."""
+        match = _CONDOR_RETURN_VALUE_PATTERN.search(self.text)
+        return int(match.group(1)) if match else None
+
+    @property
+    def hostname(self) -> str:
+        """Host name derived from the address in a "Job executing" event."""
+        # Only works for the addresses used on the MPI-IS cluster
+        _, __, hostname = self.text.rpartition("Job executing on host: <172.22.")
+        return f"?0{hostname[2:].split(':')[0]}"
+
+
+class CondorLogFollower:
+    """Read the job event log of a job incrementally.
+
+    Remembers how far the file was read, so each call of :meth:`read_new_events` only
+    reads and parses what was appended since the last call.
+    """
+
+    def __init__(self, log_file: str) -> None:
+        self.log_file = log_file
+        self._offset = 0
+        self._partial_line = ""
+        self._event_lines: list[str] = []
+        #: Host name from the latest "Job executing" event that was read.
+        self.hostname: Optional[str] = None
+
+    def read_new_events(self) -> list[CondorLogEvent]:
+        try:
+            with open(self.log_file, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        self._offset += len(data)
+
+        lines = (self._partial_line + data.decode(errors="replace")).split("\n")
+        # the last line is not complete yet (empty if data ends with a newline)
+        self._partial_line = lines.pop()
+
+        events = []
+        for line in lines:
+            # events are terminated by a line with "..."
+            if line == "...":
+                event = CondorLogEvent.parse(self._event_lines)
+                if event is not None:
+                    events.append(event)
+                self._event_lines = []
+            else:
+                self._event_lines.append(line)
+
+        return events
+
+
+def read_file_tail(path: str, max_bytes: int) -> str:
+    """Read at most the last ``max_bytes`` bytes of the given file."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - max_bytes))
+        return f.read().decode(errors="replace")
+
+
+def query_condor_queue() -> Optional[dict[str, int]]:
+    """Get the status of all jobs of the user that are in the queue.
+
+    Returns:
+        Dictionary mapping job ids ("cluster.proc") to the value of their JobStatus
+        attribute or None if condor_q failed.
+    """
+    logger = logging.getLogger("cluster_utils")
+    cmd = ["condor_q", "-json", "-attributes", "ClusterId,ProcId,JobStatus"]
+    try:
+        proc = run(cmd, stdout=PIPE, stderr=PIPE, timeout=30.0)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("Failed to run condor_q: %s", e)
+        return None
+    if proc.returncode != 0:
+        logger.warning("condor_q failed: %s", proc.stderr.decode())
+        return None
+
+    # condor_q does not print anything if there are no jobs
+    output = proc.stdout.decode().strip()
+    try:
+        ads = json.loads(output) if output else []
+    except json.JSONDecodeError:
+        logger.warning("Could not parse output of condor_q:\n%s", output)
+        return None
+
+    return {f"{ad['ClusterId']}.{ad['ProcId']}": ad["JobStatus"] for ad in ads}
+
+
+def extract_cluster_from_submit_output(submit_output: str) -> tuple[int, str]:
+    """Extract number of submitted jobs and cluster id from output of condor_submit.
+
+    Raises:
+        ValueError: if the output does not contain a line reporting the submission.
+    """
+    # Output of a successful submission looks like this:
+    # > 3 job(s) submitted to cluster 4242.
+    for line in submit_output.splitlines():
+        if "submitted" in line:
+            n_jobs = int(line.split(" ", 1)[0])
+            cluster = line.rstrip().split(" ")[-1].rstrip(".")
+            return n_jobs, cluster
+
+    raise ValueError(
+        f"Could not find cluster id in output \n------\n{submit_output}\n------\n"
+    )
+
+
 class CondorClusterSubmission(ClusterSubmission):
+    #: Jobs are submitted together as processes of one cluster (using a single submit
+    #: description).
+    MAX_SUBMISSION_BATCH_SIZE = 1000
+
+    #: Minimum duration between checks for failing jobs (to avoid polling the system too
+    #: much)
+    CHECK_FOR_FAILURES_INTERVAL_SEC = 10
+
+    #: Maximum size of the error output that is read from the .err file of a failed job
+    MAX_ERROR_OUTPUT_BYTES = 16 * 1024
+
     def __init__(
         self,
         requirements: dict[str, Any],  # TODO can this be more specific than Any?
@@ -97,12 +282,39 @@ class CondorClusterSubmission(ClusterSubmission):
         os.environ["MPLBACKEND"] = "agg"
         self._process_requirements(requirements)
 
+        #: Time stamp of the last time checking for errors
+        self._last_time_checking_for_failures = 0.0
+        #: Followers of the event logs of the jobs (by job id)
+        self._log_followers: dict[int, CondorLogFollower] = {}
+
     def submit_fn(self, job: Job) -> ClusterJobId:
-        logger = logging.getLogger("cluster_utils")
         self.generate_job_spec_file(job)
-        submit_cmd = "condor_submit_bid {} {}\n".format(
-            self.bid, job.job_spec_file_path
+        assert job.job_spec_file_path is not None
+        _, cluster = self._condor_submit(job.job_spec_file_path, f"id {job.id}")
+        return ClusterJobId(cluster)
+
+    def submit_many_fn(self, jobs: Sequence[Job]) -> list[ClusterJobId]:
+        if len(jobs) == 1:
+            return [self.submit_fn(jobs[0])]
+
+        spec_file_path = self.generate_bulk_job_spec_file(jobs)
+        n_jobs, cluster = self._condor_submit(
+            spec_file_path, "ids {}-{}".format(jobs[0].id, jobs[-1].id)
         )
+        return [ClusterJobId(f"{cluster}.{proc}") for proc in range(n_jobs)]
+
+    def _condor_submit(self, spec_file_path: str, description: str) -> tuple[int, str]:
+        """Submit the given submit description.
+
+        Args:
+            spec_file_path: Path to the submit description file.
+            description: Description of the submitted job(s) for log messages.
+
+        Returns:
+            Number of submitted jobs and the id of the cluster they belong to.
+        """
+        logger = logging.getLogger("cluster_utils")
+        submit_cmd = "condor_submit_bid {} {}\n".format(self.bid, spec_file_path)
         for try_number in range(10):
             if try_number == 9:
                 logging.exception("Job aborted, cluster unstable.")
@@ -121,7 +333,7 @@ class CondorClusterSubmission(ClusterSubmission):
                 submit_output = result.stdout.decode("utf-8")
                 break
             except subprocess.TimeoutExpired:
-                logger.warning(f"Job submission for id {job.id} hangs. Retrying...")
+                logger.warning(f"Job submission for {description} hangs. Retrying...")
 
         good_lines = [line for line in submit_output.split("\n") if "submitted" in line]
         bad_lines = [
@@ -131,17 +343,15 @@ class CondorClusterSubmission(ClusterSubmission):
         ]
         if not good_lines or bad_lines:
             logger.error(
-                f"Job with id {job.id} submitted to condor cluster, but job submission"
-                f" failed. Submission output:\n{submit_output}"
+                f"Job with {description} submitted to condor cluster, but job"
+                f" submission failed. Submission output:\n{submit_output}"
             )
             print(bad_lines)
             self.close()
             raise RuntimeError("Cluster submission failed")
 
         assert len(good_lines) == 1
-        new_cluster_id = good_lines[0].split(" ")[-1][:-1]
-
-        return ClusterJobId(new_cluster_id)
+        return extract_cluster_from_submit_output(good_lines[0])
 
     def stop_fn(self, cluster_id: ClusterJobId) -> None:
         cmd = "condor_rm {}".format(cluster_id)
@@ -153,55 +363,141 @@ class CondorClusterSubmission(ClusterSubmission):
         # file), so nothing to do here.
         pass
 
+    def query_active_jobs(
+        self, cluster_ids: Sequence[ClusterJobId]
+    ) -> set[ClusterJobId]:
+        queue = query_condor_queue()
+        if queue is None:
+            return set()
+        return {
+            cluster_id
+            for cluster_id in cluster_ids
+            if queue.get(normalize_condor_job_id(cluster_id))
+            not in (None, CONDOR_JOB_STATUS_REMOVED, CONDOR_JOB_STATUS_COMPLETED)
+        }
+
     def is_ready_to_check_for_failed_jobs(self) -> bool:
-        # TODO: should we throttle this a bit?  Probably doesn't need to be checked
-        # multiple times per second
-        return True
+        return self.seconds_until_next_check_for_failed_jobs() <= 0
+
+    def seconds_until_next_check_for_failed_jobs(self) -> float:
+        time_since_last_check = time.time() - self._last_time_checking_for_failures
+        return self.CHECK_FOR_FAILURES_INTERVAL_SEC - time_since_last_check
 
     def mark_failed_jobs(self, jobs: Sequence[Job]) -> None:
+        logger = logging.getLogger("cluster_utils")
+        logger.debug("Check for failed jobs")
+
+        # Jobs that are still in the queue (idle, running, held, ...) can not have
+        # failed, so their logs do not need to be read.  If condor_q fails, check the
+        # logs of all jobs.
+        queue = query_condor_queue()
+
+        # forget followers of jobs that are not checked anymore (e.g. finished jobs)
+        job_ids = {job.id for job in jobs}
+        for job_id in set(self._log_followers) - job_ids:
+            del self._log_followers[job_id]
+
         for job in jobs:
             assert job.run_script_path is not None
+            assert job.cluster_id is not None
+
+            if queue is not None:
+                job_status = queue.get(normalize_condor_job_id(job.cluster_id))
+                if job_status is not None and job_status != CONDOR_JOB_STATUS_COMPLETED:
+                    continue
 
-            # read condor log file to check the return code
-            log_file = f"{job.run_script_path}.log"
-            with suppress(FileNotFoundError):
-                with open(log_file) as f:
-                    content = f.read()
-                _, __, after = content.rpartition("return value ")
+            self._check_log_for_failure(job)
 
-                if after and after[0] == "1":
-                    _, __, hostname = content.rpartition(
-                        "Job executing on host: <172.22."
-                    )
-                    hostname = f"?0{hostname[2:].split(':')[0]}"
-                    job.hostname = hostname
+        self._last_time_checking_for_failures = time.time()
 
-                    # read error message from the stderr output file
-                    err_file = f"{job.run_script_path}.err"
-                    with open(err_file) as f_err:
-                        error_output = f_err.read()
+    def _on_job_retired(self, job: Job) -> None:
+        self._log_followers.pop(job.id, None)
 
-                    job.mark_failed(error_output)
+    def _check_log_for_failure(self, job: Job) -> None:
+        follower = self._log_followers.get(job.id)
+        if follower is None:
+            follower = CondorLogFollower(f"{job.run_script_path}.log")
+            self._log_followers[job.id] = follower
+
+        for event in follower.read_new_events():
+            if event.code == CONDOR_EVENT_EXECUTE:
+                follower.hostname = event.hostname
+            elif event.code == CONDOR_EVENT_TERMINATED and event.return_value == 1:
+                job.hostname = follower.hostname
+
+                # read error message from the stderr output file
+                err_file = f"{job.run_script_path}.err"
+                try:
+                    error_output = read_file_tail(err_file, self.MAX_ERROR_OUTPUT_BYTES)
+                except FileNotFoundError:
+                    error_output = ""
+
+                job.mark_failed(error_output)
+                del self._log_followers[job.id]
+                return
 
     def generate_job_spec_file(self, job: Job) -> None:
         job_file_name = "job_{}_{}.sh".format(job.iteration, job.id)
-        run_script_file_path = os.path.join(self.submission_dir, job_file_name)
         job_spec_file_path = os.path.join(self.submission_dir, job_file_name + ".sub")
+        run_script_file_path = self._generate_run_script(job, job_spec_file_path)
+        # Prepare namespace for string formatting (class vars + locals)
+        namespace = copy(vars(self))
+        namespace.update(job.as_dict())
+        namespace.update(locals())
+
+        with open(job_spec_file_path, "w") as spec_file:
+            spec_file.write(MPI_CLUSTER_JOB_SPEC_FILE % namespace)
+
+        job.job_spec_file_path = job_spec_file_path
+
+    def generate_bulk_job_spec_file(self, jobs: Sequence[Job]) -> str:
+        """Generate run scripts and a single submit description for the given jobs.
+
+        Returns:
+            Path to the submit description.
+        """
+        job_spec_file_name = "jobs_{}_{}_{}.sub".format(
+            jobs[0].iteration, jobs[0].id, jobs[-1].id
+        )
+        job_spec_file_path = os.path.join(self.submission_dir, job_spec_file_name)
+        run_scripts = []
+        for job in jobs:
+            run_scripts.append(self._generate_run_script(job, job_spec_file_path))
+            job.job_spec_file_path = job_spec_file_path
+
+        # Prepare namespace for string formatting (class vars + locals)
+        namespace = copy(vars(self))
+        namespace.update(jobs[0].as_dict())
+        namespace.update(
+            ids=", ".join(str(job.id) for job in jobs),
+            run_script_file_path="$(run_script)",
+            run_scripts="\n".join(run_scripts),
+        )
+
+        with open(job_spec_file_path, "w") as spec_file:
+            spec_file.write(MPI_CLUSTER_BULK_JOB_SPEC_FILE % namespace)
+
+        return job_spec_file_path
+
+    def _generate_run_script(self, job: Job, job_spec_file_path: str) -> str:
+        """Generate the run script of the job and return the path to it.
+
+        The path is also written to ``job.run_script_path``.
+        """
+        job_file_name = "job_{}_{}.sh".format(job.iteration, job.id)
+        run_script_file_path = os.path.join(self.submission_dir, job_file_name)
         cmd = job.generate_execution_cmd(self.paths)
         # Prepare namespace for string formatting (class vars + locals)
         namespace = copy(vars(self))
-        namespace.update(vars(job))
+        namespace.update(job.as_dict())
         namespace.update(locals())
 
         with open(run_script_file_path, "w") as script_file:
             script_file.write(MPI_CLUSTER_RUN_SCRIPT % namespace)
         os.chmod(run_script_file_path, 0o755)  # Make executable
 
-        with open(job_spec_file_path, "w") as spec_file:
-            spec_file.write(MPI_CLUSTER_JOB_SPEC_FILE % namespace)
-
-        job.job_spec_file_path = job_spec_file_path
         job.run_script_path = run_script_file_path
+        return run_script_file_path
 
     # TODO: Check that two simultaneous HPOs dont collide
 
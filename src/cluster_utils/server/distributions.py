@@ -10,6 +10,10 @@ from cluster_utils.base import constants
 
 from .utils import check_valid_param_name
 
+#: Minimal number of samples that are drawn at once (smart rounding needs a reasonable
+#: sample size, otherwise a single sample is rounded to one significant digit).
+MIN_SAMPLE_BATCH_SIZE = 10
+
 
 def clip(number, bounds):
     low, high = bounds
@@ -35,6 +39,18 @@ class Distribution(ABC):
     def prepare_samples(self, howmany):
         self.iter = iter(self.samples)
 
+    def sample_batch(self, howmany):
+        """Draw ``howmany`` samples at once.
+
+        Subclasses override this to draw all samples in one vectorised pass.
+        """
+        self.prepare_samples(howmany)
+        return [self.sample() for _ in range(howmany)]
+
+    def _postprocess_batch(self, samples):
+        """Vectorised counterpart of the post-processing done in prepare_samples."""
+        return samples
+
 
 class BoundedDistribution(Distribution):
     def __init__(self, *, bounds, **kwargs):
@@ -49,6 +65,9 @@ class BoundedDistribution(Distribution):
         ]
         super().prepare_samples(howmany)
 
+    def _postprocess_batch(self, samples):
+        return super()._postprocess_batch(np.clip(samples, self.lower, self.upper))
+
 
 def significant_digits(number, digits):
     return "{:g}".format(float("{:.{p}g}".format(number, p=digits)))
@@ -69,6 +88,27 @@ def smart_round(samples):
     return samples
 
 
+def round_significant_digits(samples, digits):
+    """Vectorised version of :func:`significant_digits` (returns floats)."""
+    samples = np.asarray(samples, dtype=float)
+    with np.errstate(divide="ignore"):
+        magnitude = np.floor(np.log10(np.abs(samples)))
+    # zero (and non-finite values) do not need rounding
+    magnitude[~np.isfinite(magnitude)] = 0
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(samples * scale) / scale
+
+
+def smart_round_batch(samples):
+    """Vectorised version of :func:`smart_round`."""
+    n_unique = len(np.unique(samples))
+    for i in [1, 2, 3, 4, 5]:  # Try up to five significant digits
+        rounded = round_significant_digits(samples, i)
+        if len(np.unique(rounded)) >= n_unique // 2:
+            return rounded
+    return samples
+
+
 class NumericalDistribution(BoundedDistribution):
     def __init__(self, *, smart_rounding=True, **kwargs):
         self.smart_rounding = smart_rounding
@@ -79,6 +119,21 @@ class NumericalDistribution(BoundedDistribution):
             self.samples = smart_round(self.samples)
         super().prepare_samples(howmany)
 
+    def sample_batch(self, howmany):
+        samples = self._postprocess_batch(
+            self._draw_batch(max(MIN_SAMPLE_BATCH_SIZE, howmany))
+        )
+        return samples[:howmany].tolist()
+
+    def _draw_batch(self, howmany):
+        """Draw ``howmany`` raw samples as NumPy array."""
+        raise NotImplementedError
+
+    def _postprocess_batch(self, samples):
+        if self.smart_rounding:
+            samples = smart_round_batch(samples)
+        return super()._postprocess_batch(samples)
+
 
 class DistributionOverIntegers(Distribution):
     def __init__(self, **kwargs):
@@ -94,6 +149,9 @@ class DistributionOverIntegers(Distribution):
         self.samples = [int(sample + 0.5) for sample in self.samples]
         super().prepare_samples(howmany)
 
+    def _postprocess_batch(self, samples):
+        return super()._postprocess_batch(np.trunc(samples + 0.5).astype(int))
+
 
 class TruncatedNormal(NumericalDistribution):
     def __init__(self, **kwargs):
@@ -118,13 +176,16 @@ class TruncatedNormal(NumericalDistribution):
         howmany = max(
             10, howmany
         )  # HACK: for smart rounding a reasonable sample size is needed
+        self.samples = self._draw_batch(howmany)
+        super().prepare_samples(howmany)
+
+    def _draw_batch(self, howmany):
         mean_to_use = (
             self.mean if self.last_mean is None else 4 * self.mean - 3 * self.last_mean
         )  # a momentum term 3/4
         if not (self.lower <= mean_to_use <= self.upper):
             mean_to_use = self.mean
-        self.samples = np.random.normal(size=howmany) * self.std + mean_to_use
-        super().prepare_samples(howmany)
+        return np.random.normal(size=howmany) * self.std + mean_to_use
 
     def plot(self):
         pass
@@ -165,6 +226,10 @@ class TruncatedLogNormal(NumericalDistribution):
         howmany = max(
             10, howmany
         )  # HACK: for smart rounding a reasonable sample size is needed
+        self.samples = self._draw_batch(howmany)
+        super().prepare_samples(howmany)
+
+    def _draw_batch(self, howmany):
         log_mean_to_use = (
             self.log_mean
             if self.last_log_mean is None
@@ -172,10 +237,7 @@ class TruncatedLogNormal(NumericalDistribution):
         )
         if not (self.lower <= log_mean_to_use <= self.upper):
             log_mean_to_use = self.log_mean
-        self.samples = np.exp(
-            np.random.normal(size=howmany) * self.log_std + log_mean_to_use
-        )
-        super().prepare_samples(howmany)
+        return np.exp(np.random.normal(size=howmany) * self.log_std + log_mean_to_use)
 
 
 class IntLogNormal(TruncatedLogNormal, DistributionOverIntegers):
@@ -248,6 +310,11 @@ class Discrete(Distribution):
         self.samples = np.random.choice(self.option_list, p=self.probs, size=howmany)
         super().prepare_samples(howmany)
 
+    def sample_batch(self, howmany):
+        # sample indices, so that options can be of any type (e.g. tuples)
+        indices = np.random.choice(len(self.option_list), p=self.probs, size=howmany)
+        return [self.option_list[i] for i in indices]
+
     def plot(self):
         # conditional import as it depends on optional dependencies
         import matplotlib.pyplot as plt
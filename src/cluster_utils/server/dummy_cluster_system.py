@@ -2,14 +2,19 @@
 
 from __future__ import annotations
 
+import collections
 import concurrent.futures
+import glob
 import logging
 import os
-import random
+import signal
+import subprocess
+import threading
+from contextlib import suppress
 from copy import copy
-from multiprocessing import cpu_count
-from subprocess import PIPE, run
-from typing import Any, Sequence
+from typing import Any, Optional, Sequence
+
+from cluster_utils.base import constants
 
 from .cluster_system import ClusterJobId, ClusterSubmission
 from .job import Job
@@ -41,7 +46,137 @@ exit $rc
 """
 
 
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """Parse a CPU list like "0-3,8,10-11" (as used in /sys and by taskset)."""
+    cpus: list[int] = []
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _read_numa_nodes() -> list[list[int]]:
+    nodes = []
+    for cpulist_file in sorted(glob.glob("/sys/devices/system/node/node*/cpulist")):
+        with open(cpulist_file) as f:
+            nodes.append(parse_cpu_list(f.read()))
+    return nodes
+
+
+def _read_sockets(cpus: Sequence[int]) -> list[list[int]]:
+    sockets: dict[int, list[int]] = collections.defaultdict(list)
+    for cpu in cpus:
+        package_id_file = (
+            f"/sys/devices/system/cpu/cpu{cpu}/topology/physical_package_id"
+        )
+        try:
+            with open(package_id_file) as f:
+                sockets[int(f.read())].append(cpu)
+        except (OSError, ValueError):
+            return []
+    return list(sockets.values())
+
+
+def usable_cpus() -> list[int]:
+    """Get the CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def detect_cpu_groups(cpus: Sequence[int]) -> list[list[int]]:
+    """Group the given CPUs by NUMA node (or by socket if there is no NUMA info).
+
+    CPUs for which no topology information is found are put in a separate group.  If
+    nothing is known about the topology, all CPUs form one group.
+    """
+    usable = set(cpus)
+    groups = _read_numa_nodes()
+    if len(groups) <= 1:
+        groups = _read_sockets(sorted(usable))
+
+    groups = [[cpu for cpu in group if cpu in usable] for group in groups]
+    groups = [group for group in groups if group]
+    unassigned = usable.difference(*groups) if groups else usable
+    if unassigned:
+        groups.append(sorted(unassigned))
+    return groups
+
+
+class CpuAllocator:
+    """Keep track of free CPUs and assign them to jobs.
+
+    CPUs are organised in groups (NUMA nodes or sockets).  A job is placed in a single
+    group if possible, choosing the group with the fewest free CPUs that still fit the
+    job, so that whole groups stay available for bigger jobs.  Jobs that do not fit
+    into a single group get whole free groups first.
+    """
+
+    def __init__(self, cpu_groups: Sequence[Sequence[int]]) -> None:
+        self.cpu_groups = [sorted(group) for group in cpu_groups if group]
+        self._free: set[int] = {cpu for group in self.cpu_groups for cpu in group}
+        self.n_cpus = len(self._free)
+
+    @property
+    def n_free(self) -> int:
+        return len(self._free)
+
+    def allocate(self, n_cpus: int) -> Optional[list[int]]:
+        """Reserve ``n_cpus`` CPUs.  Returns None if not enough CPUs are free."""
+        if n_cpus > len(self._free):
+            return None
+
+        free_per_group = [
+            ([cpu for cpu in group if cpu in self._free], len(group))
+            for group in self.cpu_groups
+        ]
+        fitting = [free for free, _ in free_per_group if len(free) >= n_cpus]
+        cpus: list[int]
+        if fitting:
+            cpus = min(fitting, key=len)[:n_cpus]
+        else:
+            # completely free groups first, then the ones with the most free CPUs
+            free_per_group.sort(
+                key=lambda item: (len(item[0]) < item[1], -len(item[0]))
+            )
+            cpus = []
+            for free, _ in free_per_group:
+                cpus.extend(free[: n_cpus - len(cpus)])
+                if len(cpus) == n_cpus:
+                    break
+
+        self._free.difference_update(cpus)
+        return sorted(cpus)
+
+    def release(self, cpus: Sequence[int]) -> None:
+        self._free.update(cpus)
+
+
+class LocalJob:
+    """A job that is run as a subprocess on the local machine."""
+
+    def __init__(self, cluster_id: ClusterJobId, job: Job) -> None:
+        self.cluster_id = cluster_id
+        self.job = job
+        assert job.run_script_path is not None
+        self.run_script_path = job.run_script_path
+        self.cpus: list[int] = []
+        #: Process of the run script.  It is the leader of a new process group, so the
+        #: job can be stopped including all processes it started.
+        self.process: Optional[subprocess.Popen] = None
+        #: Set when the process of the job exited.
+        self.exited = threading.Event()
+        #: Resolves to a :class:`subprocess.CompletedProcess` when the job terminates.
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+
 class DummyClusterSubmission(ClusterSubmission):
+    # starting a local job is fast, so there is nothing to gain from parallel
+    # submissions
+    MAX_CONCURRENT_SUBMISSIONS = 1
+
     def __init__(
         self,
         requirements: dict[str, Any],
@@ -50,14 +185,18 @@ class DummyClusterSubmission(ClusterSubmission):
     ) -> None:
         super().__init__(paths, remove_jobs_dir)
         self._process_requirements(requirements)
-        self.available_cpus = range(cpu_count())
-        self.futures_tuple: list[tuple[ClusterJobId, concurrent.futures.Future]] = []
-        self.executor = concurrent.futures.ProcessPoolExecutor(self.concurrent_jobs)
+        self.local_jobs: dict[ClusterJobId, LocalJob] = {}
+        # jobs that are waiting for free CPUs
+        self.pending_jobs: collections.deque[LocalJob] = collections.deque()
+        # protects the CPU allocator and the pending queue, which are also accessed by
+        # the threads waiting for the job processes
+        self._lock = threading.Lock()
         self.next_cluster_id = 0
 
     def generate_cluster_id(self) -> ClusterJobId:
-        cluster_id = ClusterJobId(f"local-{self.next_cluster_id}")
-        self.next_cluster_id += 1
+        with self._lock:
+            cluster_id = ClusterJobId(f"local-{self.next_cluster_id}")
+            self.next_cluster_id += 1
         return cluster_id
 
     def submit_fn(self, job: Job) -> ClusterJobId:
@@ -65,30 +204,146 @@ class DummyClusterSubmission(ClusterSubmission):
         if not job.waiting_for_resume:
             self.generate_job_spec_file(job)
 
-        free_cpus = random.sample(self.available_cpus, self.cpus_per_job)
-        free_cpus_str = ",".join(map(str, free_cpus))
-        cmd = "taskset --cpu-list {} bash {}".format(free_cpus_str, job.run_script_path)
-        cluster_id = self.generate_cluster_id()
-        new_futures_tuple = (
-            cluster_id,
-            self.executor.submit(
-                run,
-                cmd,
-                stdout=PIPE,
-                stderr=PIPE,
-                shell=True,  # type:ignore
-            ),
+        local_job = LocalJob(self.generate_cluster_id(), job)
+        job.futures_object = local_job.future
+        # wake up the main loop when the job terminates, so failures are noticed
+        # without delay
+        job.futures_object.add_done_callback(lambda _: self.event_notifier.notify())
+        self.local_jobs[local_job.cluster_id] = local_job
+
+        with self._lock:
+            self.pending_jobs.append(local_job)
+            self._start_pending_jobs()
+
+        return local_job.cluster_id
+
+    def _on_job_retired(self, job: Job) -> None:
+        # the thread waiting for the process keeps its own reference, so CPUs are still
+        # released when the process exits
+        if job.cluster_id is not None:
+            self.local_jobs.pop(job.cluster_id, None)
+
+    def _start_pending_jobs(self) -> None:
+        """Start pending jobs as long as there are enough free CPUs.
+
+        Must be called while holding ``self._lock``.
+        """
+        while self.pending_jobs:
+            cpus = self.cpu_allocator.allocate(self.cpus_per_job)
+            if cpus is None:
+                return
+            local_job = self.pending_jobs.popleft()
+            local_job.cpus = cpus
+            self._start(local_job)
+
+    def _start(self, local_job: LocalJob) -> None:
+        logger = logging.getLogger("cluster_utils")
+        if not local_job.future.set_running_or_notify_cancel():
+            self._release_cpus(local_job)
+            return
+
+        cmd = [
+            "taskset",
+            "--cpu-list",
+            ",".join(map(str, local_job.cpus)),
+            "bash",
+            local_job.run_script_path,
+        ]
+        logger.debug("Start job %s: %s", local_job.cluster_id, cmd)
+        # The run script redirects the output of the job to the .out/.err files
+        # itself.  Output before that (e.g. errors of taskset) goes to the .err file
+        # as well.
+        try:
+            with open(f"{local_job.run_script_path}.err", "ab") as err_file:
+                local_job.process = subprocess.Popen(
+                    cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=err_file,
+                    stderr=err_file,
+                    start_new_session=True,
+                )
+        except OSError as e:
+            self._release_cpus(local_job)
+            local_job.exited.set()
+            local_job.future.set_exception(e)
+            return
+
+        threading.Thread(
+            target=self._wait_for_exit,
+            args=(local_job,),
+            name=f"wait-{local_job.cluster_id}",
+            daemon=True,
+        ).start()
+
+    def _wait_for_exit(self, local_job: LocalJob) -> None:
+        assert local_job.process is not None
+        returncode = local_job.process.wait()
+        local_job.exited.set()
+
+        with self._lock:
+            self._release_cpus(local_job)
+            self._start_pending_jobs()
+
+        local_job.future.set_result(
+            subprocess.CompletedProcess(local_job.process.args, returncode)
         )
-        job.futures_object = new_futures_tuple[1]
-        self.futures_tuple.append(new_futures_tuple)
 
-        return cluster_id
+    def _release_cpus(self, local_job: LocalJob) -> None:
+        """Return the CPUs of the job to the allocator (only once).
+
+        Must be called while holding ``self._lock``.
+        """
+        self.cpu_allocator.release(local_job.cpus)
+        local_job.cpus = []
 
     def stop_fn(self, job_id: ClusterJobId) -> None:
-        for cluster_id, future in self.futures_tuple:
-            if cluster_id == job_id:
-                future.cancel()
-        concurrent.futures.wait(self.futures)
+        """Stop the job without waiting for it to terminate.
+
+        The process group of the job is sent SIGTERM and, if the job did not exit after
+        :data:`~cluster_utils.base.constants.LOCAL_JOB_TERMINATION_TIMEOUT_IN_SECS`,
+        SIGKILL.  The CPUs of the job are released immediately.
+        """
+        logger = logging.getLogger("cluster_utils")
+        local_job = self.local_jobs.get(job_id)
+        if local_job is None:
+            return
+
+        with self._lock:
+            if local_job in self.pending_jobs:
+                self.pending_jobs.remove(local_job)
+                local_job.future.cancel()
+                return
+
+            if local_job.process is None or local_job.exited.is_set():
+                return
+
+            logger.debug("Terminate job %s", job_id)
+            self._signal_process_group(local_job, signal.SIGTERM)
+            self._release_cpus(local_job)
+            self._start_pending_jobs()
+
+        threading.Thread(
+            target=self._kill_after_timeout,
+            args=(local_job,),
+            name=f"kill-{local_job.cluster_id}",
+        ).start()
+
+    def _kill_after_timeout(self, local_job: LocalJob) -> None:
+        logger = logging.getLogger("cluster_utils")
+        if not local_job.exited.wait(constants.LOCAL_JOB_TERMINATION_TIMEOUT_IN_SECS):
+            logger.warning(
+                "Job %s did not terminate within %s seconds.  Kill it.",
+                local_job.cluster_id,
+                constants.LOCAL_JOB_TERMINATION_TIMEOUT_IN_SECS,
+            )
+        # also kill processes of the job that survived the run script
+        self._signal_process_group(local_job, signal.SIGKILL)
+
+    @staticmethod
+    def _signal_process_group(local_job: LocalJob, sig: signal.Signals) -> None:
+        assert local_job.process is not None
+        with suppress(ProcessLookupError, PermissionError):
+            os.killpg(local_job.process.pid, sig)
 
     def is_ready_to_check_for_failed_jobs(self) -> bool:
         # no need to throttle checks locally
@@ -99,10 +354,17 @@ class DummyClusterSubmission(ClusterSubmission):
             assert job.futures_object is not None
             if (
                 job.futures_object.done()
+                and not job.futures_object.cancelled()
+                and job.futures_object.exception() is None
                 and job.futures_object.result().returncode == 1
             ):
-                msg = job.futures_object.result().stderr.decode()
-                job.mark_failed(msg)
+                assert job.run_script_path is not None
+                error_output = ""
+                with suppress(FileNotFoundError), open(
+                    f"{job.run_script_path}.err"
+                ) as f_err:
+                    error_output = f_err.read()
+                job.mark_failed(error_output)
 
     def generate_job_spec_file(self, job: Job) -> None:
         logger = logging.getLogger("cluster_utils")
@@ -113,7 +375,7 @@ class DummyClusterSubmission(ClusterSubmission):
         cmd = job.generate_execution_cmd(self.paths)
         # Prepare namespace for string formatting (class vars + locals)
         namespace = copy(vars(self))
-        namespace.update(vars(job))
+        namespace.update(job.as_dict())
         namespace.update(locals())
 
         with open(run_script_file_path, "w") as script_file:
@@ -123,41 +385,42 @@ class DummyClusterSubmission(ClusterSubmission):
         job.run_script_path = run_script_file_path
 
     def status(self, job: Job) -> int:  # FIXME unused?
-        futures = [
-            future
-            for cluster_id, future in self.futures_tuple
-            if cluster_id == job.cluster_id
-        ]
-        if len(futures) == 0:
+        local_job = self.local_jobs.get(job.cluster_id)  # type: ignore[arg-type]
+        if local_job is None:
             return 0
-        future = futures[0]
+        future = local_job.future
         if future.running():
             return 2
         else:
             if future.done():
-                if future.result().__dict__["returncode"] == 1:
+                if future.cancelled() or future.exception() is not None:
+                    return 4
+                if future.result().returncode == 1:
                     return 4
                 return 3
             return 1
 
     @property
     def futures(self):
-        return [future for _, future in self.futures_tuple]
+        return [local_job.future for local_job in self.local_jobs.values()]
 
     def _process_requirements(self, requirements: dict[str, Any]) -> None:
         logger = logging.getLogger("cluster_utils")
         self.cpus_per_job = requirements["request_cpus"]
-        self.max_cpus = requirements.get("max_cpus", cpu_count())
+        cpus = usable_cpus()
+        self.max_cpus = requirements.get("max_cpus", len(cpus))
         if self.max_cpus <= 0:
             raise ValueError(
                 "CPU limit must be positive. Not {}.".format(self.max_cpus)
             )
-        self.available_cpus = min(self.max_cpus, cpu_count())
-        self.concurrent_jobs = self.available_cpus // self.cpus_per_job
+        self.available_cpus = cpus[: self.max_cpus]
+        self.cpu_allocator = CpuAllocator(detect_cpu_groups(self.available_cpus))
+        self.concurrent_jobs = len(self.available_cpus) // self.cpus_per_job
         if self.concurrent_jobs == 0:
             logger.warning(
                 "Total number of CPUs is smaller than requested CPUs per job. Resorting"
                 " to 1 CPU per job"
             )
-            self.concurrent_jobs = self.available_cpus
+            self.cpus_per_job = 1
+            self.concurrent_jobs = len(self.available_cpus)
         assert self.concurrent_jobs > 0
@@ -0,0 +1,283 @@
+"""Decide which running jobs look bad enough to be stopped early.
+
+The decision is made by an :class:`EarlyStoppingScheduler` based on the values of the
+metric to optimize that jobs report while running (see
+:func:`~cluster_utils.announce_early_results`).  The n-th reported value of a job is
+considered as its value at step n.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+from abc import ABC, abstractmethod
+from typing import Any, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+class MetricRankIndex:
+    """Index of the metric trajectories of finished jobs for rank queries.
+
+    A trajectory consists of the metric values a job reported while running, followed
+    by its final value.  Only the longest trajectories are kept as reference (shorter
+    ones typically belong to jobs that were stopped early).
+
+    For every checkpoint (i.e. position in the trajectories), the values of the
+    reference jobs are kept sorted, so the rank of a running job at that checkpoint is
+    found by binary search in O(log n).  The index is updated once per finished job
+    instead of being rebuilt from all jobs for every check.
+    """
+
+    def __init__(self, minimize: bool) -> None:
+        self._sign = 1.0 if minimize else -1.0
+        #: Reference trajectories (values multiplied by the sign, so smaller is better).
+        self._trajectories: list[list[float]] = []
+        #: Values of the reference trajectories per checkpoint, sorted ascending.
+        self._sorted_values: list[list[float]] = []
+        self._rank_deviations: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        """Number of reference trajectories."""
+        return len(self._trajectories)
+
+    @property
+    def trajectory_length(self) -> int:
+        """Length of the reference trajectories (0 if there are none yet)."""
+        return len(self._sorted_values)
+
+    def add(self, trajectory: Sequence[float]) -> None:
+        """Add the trajectory of a finished job.
+
+        Trajectories that are shorter than the current reference ones are ignored, a
+        longer one replaces all reference trajectories.  Trajectories with NaN values
+        are ignored as they can not be ranked.
+        """
+        values = [self._sign * float(value) for value in trajectory]
+        if not values or any(math.isnan(value) for value in values):
+            return
+        if len(values) < self.trajectory_length:
+            return
+        if len(values) > self.trajectory_length:
+            self._trajectories = []
+            self._sorted_values = [[] for _ in values]
+
+        self._trajectories.append(values)
+        for sorted_values, value in zip(self._sorted_values, values):
+            bisect.insort(sorted_values, value)
+        self._rank_deviations = None
+
+    def rank(self, checkpoint: int, value: float) -> int:
+        """Rank a value among the reference values at the given checkpoint.
+
+        Returns:
+            The number of reference values that are better than the given value (i.e.
+            0 is the best rank).
+        """
+        return bisect.bisect_left(self._sorted_values[checkpoint], self._sign * value)
+
+    def rank_deviation(self, checkpoint: int) -> float:
+        """How much the rank at a checkpoint deviates from the final rank.
+
+        This is the root mean square difference between the ranks of the reference jobs
+        at the given checkpoint and their ranks at the end.  A large deviation means
+        that the ranking at this checkpoint does not tell much about the final ranking.
+        """
+        if self._rank_deviations is None:
+            # adding a trajectory shifts the ranks of the others, so the deviations are
+            # computed once after the reference trajectories changed
+            ranks = np.argsort(
+                np.argsort(np.array(self._trajectories), axis=0, kind="stable"),
+                axis=0,
+                kind="stable",
+            )
+            self._rank_deviations = np.sqrt(
+                np.mean((ranks - ranks[:, -1:]) ** 2, axis=0)
+            )
+        return float(self._rank_deviations[checkpoint])
+
+
+class EarlyStoppingScheduler(ABC):
+    """Base class for the schedulers that can be selected in ``early_killing_params``.
+
+    Metric values passed to the methods are the values of the metric to optimize as
+    reported by the job (i.e. not adjusted for minimization/maximization).
+    """
+
+    def __init__(self, minimize: bool) -> None:
+        self.minimize = minimize
+
+    @abstractmethod
+    def should_stop(self, job_id: int, reported_values: Sequence[float]) -> bool:
+        """Check if a running job should be stopped.
+
+        This is called regularly for all running jobs that reported values, so it
+        should be cheap if nothing changed since the last call for the job.
+
+        Args:
+            job_id: ID of the job.
+            reported_values: All values the job reported so far.
+        """
+
+    @abstractmethod
+    def job_finished(
+        self, job_id: int, reported_values: Sequence[float], final_value: float
+    ) -> None:
+        """Inform the scheduler that a job finished with the given results."""
+
+
+class RankScheduler(EarlyStoppingScheduler):
+    """Stop jobs whose rank among finished jobs is too bad (see :class:`MetricRankIndex`).
+
+    Only jobs in the first half of their runtime are stopped, where the runtime is
+    given by the number of values reported by finished jobs.
+
+    Args:
+        minimize: Whether the metric is minimized.
+        target_rank: Rank (0 being the best) that a job is expected to reach.
+        how_many_stds: A job is stopped if its rank is worse than ``target_rank`` by
+            more than this many times the rank deviation at the current step.
+    """
+
+    #: Minimum number of finished jobs before jobs are stopped.
+    MIN_FINISHED_JOBS = 5
+
+    def __init__(self, minimize: bool, target_rank: int, how_many_stds: float) -> None:
+        super().__init__(minimize)
+        self.target_rank = target_rank
+        self.how_many_stds = how_many_stds
+        self.rank_index = MetricRankIndex(minimize)
+
+    def should_stop(self, job_id: int, reported_values: Sequence[float]) -> bool:
+        if len(self.rank_index) < self.MIN_FINISHED_JOBS:
+            return False
+        if len(reported_values) > self.rank_index.trajectory_length // 2:
+            # If a job runs more than half of its runtime, don't kill it
+            return False
+        index = len(reported_values) - 1
+        rank = self.rank_index.rank(index, float(reported_values[-1]))
+        return (
+            rank - self.how_many_stds * self.rank_index.rank_deviation(index)
+            > self.target_rank
+        )
+
+    def job_finished(
+        self, job_id: int, reported_values: Sequence[float], final_value: float
+    ) -> None:
+        if reported_values:
+            self.rank_index.add([*reported_values, final_value])
+
+
+class ASHAScheduler(EarlyStoppingScheduler):
+    """Asynchronous successive halving (ASHA).
+
+    Steps ``min_steps * reduction_factor**k`` (k = 0, 1, ...) are rungs.  When a job
+    reaches a rung, its value is compared with the values that other jobs had when
+    they reached this rung.  The job is only continued (i.e. promoted to the next rung)
+    if it is within the best ``1 / reduction_factor`` of them, otherwise it is stopped.
+    Since jobs are compared with those that reached the rung before them, no job has to
+    wait for others.
+
+    See Li et al., "A System for Massively Parallel Hyperparameter Tuning" (MLSys 2020).
+
+    Args:
+        minimize: Whether the metric is minimized.
+        min_steps: Step of the first rung.  Jobs are never stopped before.
+        reduction_factor: Only the best ``1 / reduction_factor`` of jobs are continued
+            at each rung.
+        max_steps: Jobs that reached this step are not stopped anymore.  No limit if
+            None.
+    """
+
+    def __init__(
+        self,
+        minimize: bool,
+        min_steps: int = 1,
+        reduction_factor: float = 3,
+        max_steps: Optional[int] = None,
+    ) -> None:
+        if min_steps < 1:
+            raise ValueError("min_steps must be at least 1")
+        if reduction_factor <= 1:
+            raise ValueError("reduction_factor must be greater than 1")
+        super().__init__(minimize)
+        self._sign = 1.0 if minimize else -1.0
+        self.min_steps = min_steps
+        self.reduction_factor = reduction_factor
+        self.max_steps = max_steps
+        #: Values of the jobs that reached each rung (multiplied by the sign, sorted).
+        self.rungs: list[list[float]] = []
+        #: Index of the next rung for every job that did not finish yet.
+        self._next_rung: dict[int, int] = {}
+
+    def rung_step(self, rung: int) -> int:
+        """Step at which jobs reach the given rung."""
+        return int(round(self.min_steps * self.reduction_factor**rung))
+
+    def should_stop(self, job_id: int, reported_values: Sequence[float]) -> bool:
+        return not self._record(job_id, reported_values)
+
+    def job_finished(
+        self, job_id: int, reported_values: Sequence[float], final_value: float
+    ) -> None:
+        # values of rungs that were not checked while the job was running (e.g. because
+        # it reported several values at once) are still useful for other jobs
+        self._record(job_id, reported_values)
+        self._next_rung.pop(job_id, None)
+
+    def _record(self, job_id: int, reported_values: Sequence[float]) -> bool:
+        """Record values of rungs reached since the last call.
+
+        Returns:
+            Whether the job is promoted at all the newly reached rungs.
+        """
+        rung = self._next_rung.get(job_id, 0)
+        promoted = True
+        while len(reported_values) >= self.rung_step(rung):
+            step = self.rung_step(rung)
+            if self.max_steps is not None and step >= self.max_steps:
+                break
+            value = self._sign * float(reported_values[step - 1])
+            if math.isnan(value):
+                promoted = False
+                break
+            if len(self.rungs) <= rung:
+                self.rungs.append([])
+            values = self.rungs[rung]
+            bisect.insort(values, value)
+            n_promoted = math.ceil(len(values) / self.reduction_factor)
+            rung += 1
+            if bisect.bisect_left(values, value) >= n_promoted:
+                promoted = False
+                break
+        self._next_rung[job_id] = rung
+        return promoted
+
+
+#: Schedulers that can be selected with the "scheduler" entry of
+#: ``early_killing_params``.
+scheduler_dict: dict[str, type[EarlyStoppingScheduler]] = {
+    "rank": RankScheduler,
+    "asha": ASHAScheduler,
+}
+
+
+def create_scheduler(
+    minimize: bool, early_killing_params: Mapping[str, Any]
+) -> EarlyStoppingScheduler:
+    """Create the scheduler configured by the ``early_killing_params`` setting.
+
+    The scheduler is selected by the "scheduler" entry (default: "rank"), all other
+    entries are passed as keyword arguments to it.
+
+    Raises:
+        ValueError: if the scheduler is unknown.
+    """
+    params = dict(early_killing_params)
+    name = params.pop("scheduler", "rank")
+    if name not in scheduler_dict:
+        raise ValueError(
+            f"Invalid scheduler '{name}' in early_killing_params.  Valid options are"
+            f" {tuple(scheduler_dict)}."
+        )
+    return scheduler_dict[name](minimize=minimize, **params)
@@ -5,7 +5,7 @@ import os
 import pathlib
 import time
 from copy import deepcopy
-from typing import TYPE_CHECKING, Any, Dict, Optional, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Union
 
 import pandas as pd
 
@@ -31,7 +31,44 @@ class JobStatus:
     CONCLUDED_WITHOUT_RESULTS = 5
 
 
+#: Signature of the callback that is called when the status of a job changes.  It gets
+#: the job and its previous status as arguments.
+JobStatusListener = Callable[["Job", int], None]
+
+
 class Job:
+    # there may be many thousands of jobs (e.g. in a grid search), so attributes are
+    # stored in slots instead of a per-instance dict
+    __slots__ = (
+        "metric_to_watch",
+        "paths",
+        "id",
+        "settings",
+        "other_params",
+        "cluster_id",
+        "results_used_for_update",
+        "job_spec_file_path",
+        "run_script_path",
+        "hostname",
+        "waiting_for_resume",
+        "start_time",
+        "estimated_end",
+        "iteration",
+        "comm_server_info",
+        "status_listener",
+        "_status",
+        "metrics",
+        "error_info",
+        "result_row",
+        "_param_names",
+        "_metric_names",
+        "reported_metric_values",
+        "futures_object",
+        "opt_procedure_name",
+        "singularity_settings",
+        "final_settings",
+    )
+
     def __init__(
         self,
         *,
@@ -63,17 +100,48 @@ class Job:
             constants.ID: id,
             "ip": connection_info["ip"],
             "port": connection_info["port"],
+            "reliable": connection_info.get("reliable", False),
         }
-        self.status = JobStatus.INITIAL_STATUS
+        #: Called whenever :attr:`status` changes or results are set.  Used by the
+        #: cluster system interface to keep its job index up to date.
+        self.status_listener: Optional[JobStatusListener] = None
+        self._status = JobStatus.INITIAL_STATUS
         self.metrics = None
         self.error_info: Optional[str] = None
-        self.resulting_df = None
-        self.param_df = None
-        self.metric_df = None
+        #: Flattened parameters and metrics of the job (set by :meth:`set_results`).
+        self.result_row: Optional[dict[str, Any]] = None
+        self._param_names: tuple[str, ...] = ()
+        self._metric_names: tuple[str, ...] = ()
         self.reported_metric_values: list[Any] = []  # FIXME what is the expected type?
         self.futures_object: Optional[concurrent.futures.Future] = None
         self.opt_procedure_name = opt_procedure_name
         self.singularity_settings = singularity_settings
+        #: Settings passed to the job (set by :meth:`generate_execution_cmd`).
+        self.final_settings: Optional[dict[str, Any]] = None
+
+    @property
+    def status(self) -> int:
+        return self._status
+
+    @status.setter
+    def status(self, new_status: int) -> None:
+        old_status = self._status
+        self._status = new_status
+        if self.status_listener is not None and new_status != old_status:
+            self.status_listener(self, old_status)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the attributes of the job as dictionary (e.g. for string formatting).
+
+        Internal attributes (the status listener and private caches) are not included.
+        """
+        attributes = {
+            name: getattr(self, name)
+            for name in self.__slots__
+            if not name.startswith("_") and name != "status_listener"
+        }
+        attributes["status"] = self.status
+        return attributes
 
     def generate_final_setting(self, paths):
         current_setting = deepcopy(self.settings)
@@ -165,6 +233,8 @@ class Job:
             port=self.comm_server_info["port"],
             current_setting=current_setting,
         )
+        if self.comm_server_info["reliable"]:
+            arguments += " --reliable-communication"
 
         if is_python_script:
             run_script_as_module_main = paths.get("run_as_module", False)
@@ -257,9 +327,14 @@ class Job:
     def set_results(self):
         flattened_params = dict(flatten_nested_string_dict(self.final_settings))
         flattened_params[constants.ID] = self.id
-        self.param_df = pd.DataFrame([flattened_params])
-        self.metric_df = pd.DataFrame([self.metrics])
-        self.resulting_df = pd.concat([self.param_df, self.metric_df], axis=1)
+        self._param_names = tuple(sorted(flattened_params))
+        self._metric_names = tuple(sorted(self.metrics))
+        # a plain dict is much cheaper than DataFrames, results of many jobs are
+        # combined into tables by the caller
+        self.result_row = {**flattened_params, **self.metrics}
+        if self.status_listener is not None:
+            # whether results are available affects if the job counts as successful
+            self.status_listener(self, self._status)
 
     def try_load_results_from_filesystem(self, paths):
         logger = logging.getLogger("cluster_utils")
@@ -279,14 +354,31 @@ class Job:
             self.set_results()
             self.status = JobStatus.CONCLUDED
 
+    def has_results(self) -> bool:
+        """Check if results are available (cheaper than :meth:`get_results`)."""
+        return self.result_row is not None
+
+    def get_result_row(
+        self,
+    ) -> Optional[tuple[dict[str, Any], tuple[str, ...], tuple[str, ...]]]:
+        """Get results as a row with the flattened parameters and the metrics.
+
+        Returns:
+            Tuple of the row, the names of the parameters and the names of the metrics
+            (both sorted) or None if the job has no results.  The row must not be
+            modified.
+        """
+        if self.result_row is None:
+            return None
+        return self.result_row, self._param_names, self._metric_names
+
     def get_results(self):
-        if self.resulting_df is None or self.param_df is None or self.metric_df is None:
+        """Like :meth:`get_result_row` but with the row as DataFrame."""
+        result = self.get_result_row()
+        if result is None:
             return None
-        return (
-            self.resulting_df,
-            tuple(sorted(self.param_df.columns)),
-            tuple(sorted(self.metric_df.columns)),
-        )
+        row, param_names, metric_names = result
+        return pd.DataFrame([row]), param_names, metric_names
 
     def mark_failed(self, error_message: str) -> None:
         """Mark the job as failed.
@@ -299,8 +391,10 @@ class Job:
             "Mark job %d (cluster id: %s) as failed.", self.id, self.cluster_id
         )
 
-        self.status = JobStatus.FAILED
+        # the error is set first, as the main loop may react on the status change
+        # (in a different thread) right away
         self.error_info = error_message
+        self.status = JobStatus.FAILED
 
     @property
     def time_left(self):
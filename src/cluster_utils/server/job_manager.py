@@ -1,21 +1,22 @@
 from __future__ import annotations
 
 import datetime
+import itertools
 import logging
 import logging.handlers
+import math
 import os
 import shutil
 import sys
 import time
 from contextlib import ExitStack
-
-import numpy as np
-import pandas as pd
+from typing import Any, Callable
 
 from cluster_utils.base import constants
 
-from .cluster_system import get_cluster_type
+from .cluster_system import ClusterJobId, get_cluster_type
 from .communication_server import CommunicationServer
+from .early_stopping import EarlyStoppingScheduler, create_scheduler
 from .git_utils import ClusterSubmissionGitHook
 from .job import Job, JobStatus
 from .optimizers import NGOptimizer
@@ -25,6 +26,15 @@ from .progress_bars import (
     SubmittedJobsBar,
     redirect_stdout_to_tqdm,
 )
+from .result_files import ResultFormat, require_parquet_support
+from .result_store import ColumnarTable
+from .run_journal import (
+    JournaledJob,
+    RunJournal,
+    collect_jobs,
+    last_connection_info,
+    read_journal,
+)
 from .settings import GenerateReportSetting, optimizer_dict
 from .user_interaction import InteractiveMode, NonInteractiveMode
 from .utils import (
@@ -169,6 +179,10 @@ def pre_opt(
     run_local,
     report_hooks,
     optimizer_settings,
+    reliable_communication=False,
+    max_concurrent_submissions=None,
+    communication_port=0,
+    accept_legacy_messages=False,
 ):
     processed_other_params = process_other_params(other_params, None, optimized_params)
     ensure_empty_dir(base_paths_and_files["result_dir"], defensive=True)
@@ -205,6 +219,8 @@ def pre_opt(
         requirements=submission_requirements,
         remove_jobs_dir=remove_jobs_dir,
     )
+    if max_concurrent_submissions is not None:
+        cluster_interface.max_concurrent_submissions = max_concurrent_submissions
     if git_params is not None:
         cluster_interface.register_submission_hook(
             ClusterSubmissionGitHook(git_params, base_paths_and_files)
@@ -218,7 +234,12 @@ def pre_opt(
         print(make_red(f"Warning: {msg}"))
 
     cluster_interface.exec_pre_run_routines()
-    comm_server = CommunicationServer(cluster_interface)
+    comm_server = CommunicationServer(
+        cluster_interface,
+        reliable_communication=reliable_communication,
+        port=communication_port,
+        accept_legacy_messages=accept_legacy_messages,
+    )
 
     return hp_optimizer, cluster_interface, comm_server, processed_other_params
 
@@ -248,12 +269,8 @@ def post_iteration_opt(
 
     submission_hook_stats = cluster_interface.collect_stats_from_hooks()
 
-    jobs_to_tell = [
-        job
-        for job in cluster_interface.successful_jobs
-        if not job.results_used_for_update
-    ]
-    hp_optimizer.tell(jobs_to_tell)
+    hp_optimizer.tell(cluster_interface.pop_untold_jobs())
+    hp_optimizer.save_new_results(base_paths_and_files["result_dir"])
 
     print(hp_optimizer.minimal_df[:10])
 
@@ -270,7 +287,10 @@ def post_iteration_opt(
 
     hp_optimizer.iteration += 1
 
-    hp_optimizer.save_data_and_self(base_paths_and_files["result_dir"])
+    if hp_optimizer.journal is not None:
+        hp_optimizer.journal.record_iteration(hp_optimizer.iteration)
+    if hp_optimizer.snapshot_due():
+        hp_optimizer.save_snapshot(base_paths_and_files["result_dir"])
     save_report_data(
         base_paths_and_files["result_dir"], submission_hook_stats=submission_hook_stats
     )
@@ -286,11 +306,100 @@ def post_iteration_opt(
         )
 
     if remove_working_dirs:
-        finished_working_dirs = hp_optimizer.full_df["working_dir"]
+        finished_working_dirs = hp_optimizer.result_store.column("working_dir")
         for working_dir in finished_working_dirs:
             rm_dir_full(working_dir)
 
 
+def reattach_jobs(
+    cluster_interface,
+    journaled_jobs: dict[int, JournaledJob],
+    create_job: Callable[[int, Any, int], Job],
+    current_iteration: int,
+    can_receive_messages: bool,
+) -> None:
+    """Restore the jobs of an interrupted run from its run journal.
+
+    Results of jobs that finished in the meantime are loaded from their working
+    directories.  Jobs that are still queued or running on the cluster are tracked
+    again instead of being resubmitted, as long as they can still reach the server
+    (i.e. it listens on the same address as before).  Other unfinished jobs are
+    submitted again.
+
+    Finished jobs of the interrupted iteration are registered as well (their results
+    are already known to the optimizer), so counting the jobs of the iteration
+    continues where it stopped.
+    """
+    logger = logging.getLogger("cluster_utils")
+    if not journaled_jobs:
+        return
+    cluster_interface.reserve_job_ids(max(journaled_jobs))
+
+    finished_statuses = (JobStatus.FAILED, JobStatus.CONCLUDED_WITHOUT_RESULTS)
+    active_cluster_ids = cluster_interface.query_active_jobs(
+        [
+            journaled.cluster_id
+            for journaled in journaled_jobs.values()
+            if journaled.cluster_id is not None
+            and not journaled.has_results
+            and journaled.status not in finished_statuses
+        ]
+    )
+
+    n_reattached, n_resubmitted, n_loaded = 0, 0, 0
+    for journaled in journaled_jobs.values():
+        is_current = journaled.iteration == current_iteration
+        if journaled.status in finished_statuses and not journaled.has_results:
+            if is_current and journaled.status == JobStatus.FAILED:
+                job = create_job(
+                    journaled.job_id, journaled.settings, journaled.iteration
+                )
+                cluster_interface.add_jobs(job, enqueue=False)
+                job.mark_failed("Job failed before the run was interrupted.")
+            continue
+        if journaled.has_results and not is_current:
+            continue
+
+        job = create_job(journaled.job_id, journaled.settings, journaled.iteration)
+        job.try_load_results_from_filesystem(job.paths)
+        if journaled.has_results:
+            # results are already known to the optimizer
+            if job.has_results():
+                job.results_used_for_update = True
+                cluster_interface.add_jobs(job, enqueue=False)
+        elif job.has_results():
+            cluster_interface.add_jobs(job, enqueue=False)
+            n_loaded += 1
+        elif journaled.cluster_id in active_cluster_ids and can_receive_messages:
+            job.cluster_id = ClusterJobId(journaled.cluster_id)
+            job.run_script_path = journaled.run_script_path
+            job.start_time = time.time()
+            cluster_interface.add_jobs(job, enqueue=False)
+            job.status = (
+                journaled.status
+                if journaled.status in (JobStatus.RUNNING, JobStatus.SENT_RESULTS)
+                else JobStatus.SUBMITTED
+            )
+            n_reattached += 1
+        else:
+            if journaled.cluster_id in active_cluster_ids:
+                # the job would not be able to report back to this server
+                cluster_interface.stop_fn(journaled.cluster_id)
+            cluster_interface.add_jobs(job)
+            n_resubmitted += 1
+
+    log_and_print(
+        logger,
+        f"Continuing interrupted run: {n_reattached} jobs reattached, results of"
+        f" {n_loaded} jobs loaded, {n_resubmitted} jobs submitted again.",
+    )
+    if not can_receive_messages and active_cluster_ids:
+        logger.warning(
+            "The server does not listen on the same address as before, so jobs that"
+            " are still running can not report back.  They are submitted again."
+        )
+
+
 def hp_optimization(
     *,
     base_paths_and_files: dict[str, str],
@@ -315,12 +424,26 @@ def hp_optimization(
     optimizer_settings=None,
     n_completed_jobs_before_resubmit=1,
     no_user_interaction=False,
+    reliable_communication=False,
+    max_concurrent_submissions=None,
+    accept_legacy_messages=False,
+    result_format="csv",
     report_generation_mode: GenerateReportSetting = GenerateReportSetting.NEVER,
 ):
     if not (1 <= n_completed_jobs_before_resubmit <= n_jobs_per_iteration):
         raise ValueError(
             f"n_completed_jobs_before_resubmit must be in [1, {n_jobs_per_iteration}]"
         )
+    result_format = ResultFormat.parse(result_format)
+    if result_format == ResultFormat.PARQUET:
+        # fail before any job is submitted, not when the results are saved
+        require_parquet_support()
+    # decides which running jobs are stopped early
+    early_stopping_scheduler = (
+        create_scheduler(minimize, early_killing_params)
+        if kill_bad_jobs_early
+        else None
+    )
 
     optimizer_settings = optimizer_settings or {}
     logger = logging.getLogger("cluster_utils")
@@ -328,6 +451,14 @@ def hp_optimization(
         base_paths_and_files["result_dir"], "working_directories"
     )
 
+    # jobs of an interrupted run are restored from its journal (if the run is
+    # continued, see pre_opt)
+    journal_file = os.path.join(
+        base_paths_and_files["result_dir"], constants.RUN_JOURNAL_FILE
+    )
+    journal_records = read_journal(journal_file)
+    previous_connection_info = last_connection_info(journal_records)
+
     hp_optimizer, cluster_interface, comm_server, processed_other_params = pre_opt(
         base_paths_and_files,
         submission_requirements,
@@ -342,7 +473,56 @@ def hp_optimization(
         run_local,
         report_hooks,
         optimizer_settings,
+        reliable_communication=reliable_communication,
+        max_concurrent_submissions=max_concurrent_submissions,
+        communication_port=(
+            previous_connection_info["port"] if previous_connection_info else 0
+        ),
+        accept_legacy_messages=accept_legacy_messages,
     )
+    if not os.path.exists(journal_file):
+        # the results directory was cleared, nothing to continue
+        journal_records = []
+
+    def create_job(job_id, settings, iteration):
+        return Job(
+            id=job_id,
+            settings=settings,
+            other_params=processed_other_params,
+            paths=base_paths_and_files,
+            iteration=iteration,
+            connection_info=comm_server.connection_info,
+            metric_to_watch=metric_to_optimize,
+            opt_procedure_name=opt_procedure_name,
+            singularity_settings=singularity_settings,
+        )
+
+    # asks, submissions, status changes and results are recorded as they happen, the
+    # complete state of the optimizer is only saved from time to time
+    run_journal = RunJournal(journal_file)
+    hp_optimizer.journal = run_journal
+    hp_optimizer.result_format = result_format
+    cluster_interface.run_journal = run_journal
+    run_journal.record_server(comm_server.connection_info)
+
+    if journal_records:
+        journaled_jobs = collect_jobs(journal_records)
+        if isinstance(hp_optimizer, NGOptimizer) and journaled_jobs:
+            # candidates of jobs asked after the last snapshot are not known anymore
+            logger.warning("Jobs of the interrupted run are not continued.")
+            cluster_interface.reserve_job_ids(max(journaled_jobs))
+            journaled_jobs = {}
+        reattach_jobs(
+            cluster_interface,
+            journaled_jobs,
+            create_job,
+            current_iteration=hp_optimizer.iteration + 1,
+            can_receive_messages=(
+                previous_connection_info is not None
+                and previous_connection_info["ip"] == comm_server.ip_adress
+                and previous_connection_info["port"] == comm_server.port
+            ),
+        )
 
     signal_watcher = SignalWatcher()
 
@@ -357,9 +537,8 @@ def hp_optimization(
     interaction_mode = NonInteractiveMode if no_user_interaction else InteractiveMode
 
     with ExitStack() as stack:
-        check_for_keyboard_input = stack.enter_context(
-            interaction_mode(cluster_interface, comm_server)
-        )
+        interaction = interaction_mode(cluster_interface, comm_server)
+        check_for_keyboard_input = stack.enter_context(interaction)
         stack.enter_context(redirect_stdout_to_tqdm())
         submitted_bar = stack.enter_context(
             SubmittedJobsBar(total_jobs=number_of_samples)
@@ -370,18 +549,28 @@ def hp_optimization(
         )
         # END with statements
 
+        wait_timeout = 0.0
         while (
             cluster_interface.n_completed_jobs < number_of_samples
             and not signal_watcher.has_received_signal()
         ):
+            # sleep until something happens (job messages, keyboard input) or the
+            # cluster system needs to be polled again
+            cluster_interface.event_notifier.wait(
+                wait_timeout, other_files=interaction.input_files
+            )
             check_for_keyboard_input()
-            time.sleep(constants.JOB_MANAGER_LOOP_SLEEP_TIME_IN_SECS)
-
-            jobs_to_tell = [
-                job
-                for job in cluster_interface.successful_jobs
-                if not job.results_used_for_update
-            ]
+            made_progress = False
+
+            jobs_to_tell = cluster_interface.pop_untold_jobs()
+            if early_stopping_scheduler is not None:
+                for job in jobs_to_tell:
+                    if job.reported_metric_values:
+                        early_stopping_scheduler.job_finished(
+                            job.id,
+                            job.reported_metric_values,
+                            job.metrics.get(metric_to_optimize, math.nan),
+                        )
             hp_optimizer.tell(jobs_to_tell)
 
             current_iteration = hp_optimizer.iteration - start_iteration
@@ -389,8 +578,10 @@ def hp_optimization(
                 cluster_interface.n_completed_jobs
                 - n_jobs_per_iteration * current_iteration
             )
-            n_jobs_submitted_cur_iteration = (
-                cluster_interface.n_submitted_jobs
+            # count jobs that are created but not yet submitted as well, to not create
+            # too many jobs
+            n_jobs_created_cur_iteration = (
+                cluster_interface.n_total_jobs
                 - n_jobs_per_iteration * current_iteration
             )
             max_job_submissions = (
@@ -400,31 +591,35 @@ def hp_optimization(
                 cluster_interface.n_completed_jobs // n_jobs_per_iteration
                 > current_iteration
             )
-            if (
-                n_jobs_submitted_cur_iteration < max_job_submissions
-                and cluster_interface.n_submitted_jobs < number_of_samples
-                and not iteration_finished
-            ):
-                new_settings = hp_optimizer.ask()
-                new_job = Job(
-                    id=cluster_interface.inc_job_id,
-                    settings=new_settings,
-                    other_params=processed_other_params,
-                    paths=base_paths_and_files,
-                    iteration=hp_optimizer.iteration + 1,
-                    connection_info=comm_server.connection_info,
-                    metric_to_watch=metric_to_optimize,
-                    opt_procedure_name=opt_procedure_name,
-                    singularity_settings=singularity_settings,
+            n_new_jobs = (
+                0
+                if iteration_finished
+                else min(
+                    max_job_submissions - n_jobs_created_cur_iteration,
+                    number_of_samples - cluster_interface.n_total_jobs,
                 )
+            )
+            if n_new_jobs > 0:
+                new_jobs = [
+                    create_job(
+                        cluster_interface.inc_job_id,
+                        new_settings,
+                        hp_optimizer.iteration + 1,
+                    )
+                    for new_settings in hp_optimizer.ask_batch(n_new_jobs)
+                ]
                 if isinstance(hp_optimizer, NGOptimizer):
-                    hp_optimizer.add_candidate(new_job.id)
-                cluster_interface.add_jobs(new_job)
+                    hp_optimizer.add_candidates([job.id for job in new_jobs])
+                for job in new_jobs:
+                    run_journal.record_ask(job.id, job.settings, job.iteration)
+                cluster_interface.add_jobs(new_jobs)
+                made_progress = True
 
-            if cluster_interface.has_unsubmitted_jobs():
-                cluster_interface.submit_next()
+            if cluster_interface.dispatch_submissions() > 0:
+                made_progress = True
 
             if iteration_finished:
+                made_progress = True
                 post_iteration_opt(
                     cluster_interface,
                     hp_optimizer,
@@ -468,12 +663,7 @@ def hp_optimization(
             best_seen_metric = cluster_interface.get_best_seen_value_of_main_metric(
                 minimize=minimize
             )
-            if len(hp_optimizer.full_df) > 0:
-                best_value = hp_optimizer.full_df[hp_optimizer.metric_to_optimize].iloc[
-                    0
-                ]
-            else:
-                best_value = None
+            best_value = hp_optimizer.best_metric_value()
 
             estimates = [
                 item for item in [best_seen_metric, best_value] if item is not None
@@ -481,18 +671,25 @@ def hp_optimization(
             if estimates:
                 best_estimate = min(estimates) if minimize else max(estimates)
                 successful_jobs_bar.update_best_val(best_estimate)
-            if kill_bad_jobs_early:
+            if early_stopping_scheduler is not None:
                 kill_bad_looking_jobs(
-                    cluster_interface,
-                    metric_to_optimize,
-                    minimize,
-                    **early_killing_params,
+                    cluster_interface, early_stopping_scheduler, metric_to_optimize
+                )
+
+            # if something was done in this round, there may be more to do right away
+            if made_progress:
+                wait_timeout = 0.0
+            else:
+                wait_timeout = min(
+                    constants.JOB_MANAGER_LOOP_MAX_WAIT_TIME_IN_SECS,
+                    cluster_interface.seconds_until_next_check_for_failed_jobs(),
                 )
 
     print()  # empty line after progress bars
 
     if signal_watcher.has_received_signal():
         cluster_interface.close()
+        run_journal.close()
         logger.info("Exiting now")
         sys.exit(1)
 
@@ -512,55 +709,32 @@ def hp_optimization(
             ]
         ),
     )
+    hp_optimizer.save_data_and_self(base_paths_and_files["result_dir"])
     post_opt(cluster_interface)
+    run_journal.close()
 
     if remove_working_dirs:
         rm_dir_full(base_paths_and_files["current_result_dir"])
 
 
 def kill_bad_looking_jobs(
-    cluster_interface, metric_to_optimize, minimize, target_rank, how_many_stds
+    cluster_interface, scheduler: EarlyStoppingScheduler, metric_to_optimize
 ):
-    intermediate_results = [
-        job.reported_metric_values + [job.metrics[metric_to_optimize]]
-        for job in cluster_interface.successful_jobs
-        if job.reported_metric_values
-    ]
-    if not intermediate_results:
-        return
-    max_len = max([len(item) for item in intermediate_results])
-    intermediate_results = [
-        item for item in intermediate_results if len(item) == max_len
-    ]
-
-    if len(intermediate_results) < 5:
-        return
-
-    intermediate_results_np = np.array(intermediate_results)
-    sign = 1 if minimize else -1
-    intermediate_ranks = np.argsort(
-        np.argsort(intermediate_results_np * sign, axis=0), axis=0
-    )
-    rank_deviations = np.sqrt(
-        np.mean((intermediate_ranks - intermediate_ranks[:, -1:]) ** 2, axis=0)
-    )
+    """Stop running jobs that the given scheduler considers to be bad.
 
+    Stopped jobs are concluded with their last reported value as result.
+    """
+    logger = logging.getLogger("cluster_utils")
     for job in cluster_interface.running_jobs:
         if not job.reported_metric_values:
             continue
-        if len(job.reported_metric_values) > intermediate_results_np.shape[1] // 2:
-            # If a job runs more than half of its runtime, don't kill it
-            continue
-        index, value = (
-            len(job.reported_metric_values) - 1,
-            np.array(job.reported_metric_values[-1]),
-        )
-        all_values = np.concatenate(
-            [intermediate_results_np[:, index], value.reshape(1)]
-        )
-        rank_of_current_job = np.argsort(np.argsort(all_values * sign))[-1]
-        if rank_of_current_job - how_many_stds * rank_deviations[index] > target_rank:
-            job.metrics = {metric_to_optimize: float(value)}
+        if scheduler.should_stop(job.id, job.reported_metric_values):
+            value = float(job.reported_metric_values[-1])
+            logger.info(
+                f"Stopping job {job.id} early ({metric_to_optimize}={value} after"
+                f" {len(job.reported_metric_values)} reports)."
+            )
+            job.metrics = {metric_to_optimize: value}
             job.status = JobStatus.CONCLUDED
             job.set_results()
             cluster_interface.stop_fn(job.cluster_id)
@@ -583,6 +757,9 @@ def grid_search(
     report_hooks=None,
     load_existing_results=False,
     no_user_interaction=False,
+    reliable_communication=False,
+    max_concurrent_submissions=None,
+    accept_legacy_messages=False,
 ):
     base_paths_and_files["current_result_dir"] = os.path.join(
         base_paths_and_files["result_dir"], "working_directories"
@@ -601,6 +778,9 @@ def grid_search(
         run_local,
         report_hooks,
         dict(restarts=restarts),
+        reliable_communication=reliable_communication,
+        max_concurrent_submissions=max_concurrent_submissions,
+        accept_legacy_messages=accept_legacy_messages,
     )
 
     signal_watcher = SignalWatcher()
@@ -611,54 +791,86 @@ def grid_search(
     pre_iteration_opt(base_paths_and_files)
     logger = logging.getLogger("cluster_utils")
 
+    # Settings are generated lazily and jobs are only created for a bounded window of
+    # them.  Finished jobs are collapsed into rows of the results table and dropped.
+    # Job ids are the grid indices, so with load_existing_results a restarted grid
+    # search finds the results of the previous run in the working directories.
+    n_jobs = hp_optimizer.n_settings
     settings = hp_optimizer.ask_all()
-    jobs = [
-        Job(
-            id=cluster_interface.inc_job_id,
-            settings=setting,
-            other_params=processed_other_params,
-            paths=base_paths_and_files,
-            iteration=hp_optimizer.iteration,
-            connection_info=comm_server.connection_info,
-            opt_procedure_name=opt_procedure_name,
-            singularity_settings=singularity_settings,
-        )
-        for setting in settings
-    ]
-    cluster_interface.add_jobs(jobs)
+    results = ColumnarTable()
+    all_params, metrics = None, None
 
     if load_existing_results:
         logger.info("Trying to load existing results")
-        for job in jobs:
-            job.try_load_results_from_filesystem(base_paths_and_files)
+
+    def create_jobs(how_many):
+        jobs, loaded_jobs = [], []
+        for setting in itertools.islice(settings, how_many):
+            job = Job(
+                id=cluster_interface.inc_job_id,
+                settings=setting,
+                other_params=processed_other_params,
+                paths=base_paths_and_files,
+                iteration=hp_optimizer.iteration,
+                connection_info=comm_server.connection_info,
+                opt_procedure_name=opt_procedure_name,
+                singularity_settings=singularity_settings,
+            )
+            if load_existing_results:
+                job.try_load_results_from_filesystem(base_paths_and_files)
+            if job.has_results():
+                loaded_jobs.append(job)
+            else:
+                jobs.append(job)
+        cluster_interface.add_jobs(jobs)
+        cluster_interface.add_jobs(loaded_jobs, enqueue=False)
+        return len(jobs) + len(loaded_jobs)
+
+    def collect_results():
+        nonlocal all_params, metrics
+        for job in cluster_interface.retire_completed_jobs():
+            job_results = job.get_result_row()
+            if job_results is None:
+                continue
+            row, job_all_params, job_metrics = job_results
+            if all_params is None:
+                all_params, metrics = job_all_params, job_metrics
+            results.append(row)
+
+    has_more_settings = True
 
     interaction_mode = NonInteractiveMode if no_user_interaction else InteractiveMode
     with ExitStack() as stack:
-        check_for_keyboard_input = stack.enter_context(
-            interaction_mode(cluster_interface, comm_server)
-        )
+        interaction = interaction_mode(cluster_interface, comm_server)
+        check_for_keyboard_input = stack.enter_context(interaction)
         stack.enter_context(redirect_stdout_to_tqdm())
-        submitted_bar = stack.enter_context(SubmittedJobsBar(total_jobs=len(jobs)))
-        running_bar = stack.enter_context(RunningJobsBar(total_jobs=len(jobs)))
+        submitted_bar = stack.enter_context(SubmittedJobsBar(total_jobs=n_jobs))
+        running_bar = stack.enter_context(RunningJobsBar(total_jobs=n_jobs))
         successful_jobs_bar = stack.enter_context(
-            CompletedJobsBar(total_jobs=len(jobs), minimize=None)
+            CompletedJobsBar(total_jobs=n_jobs, minimize=None)
         )
         # END with statements
 
-        num_jobs_to_submit_per_iteration = 5
-        while (
-            not signal_watcher.has_received_signal()
-            and cluster_interface.n_completed_jobs != len(jobs)
-        ):
-            # submit next batch of jobs
-            i = 0
-            while (
-                not signal_watcher.has_received_signal()
-                and cluster_interface.has_unsubmitted_jobs()
-                and i < num_jobs_to_submit_per_iteration
+        # tolerance for failed jobs before the first jobs succeed
+        num_tolerated_failed_jobs = 5
+        while not signal_watcher.has_received_signal():
+            collect_results()
+            if has_more_settings:
+                n_missing = (
+                    constants.GRID_SEARCH_MAX_LIVE_JOBS
+                    - cluster_interface.job_registry.n_live
+                )
+                if n_missing > 0:
+                    has_more_settings = create_jobs(n_missing) == n_missing
+            if (
+                not has_more_settings
+                and cluster_interface.n_completed_jobs == cluster_interface.n_total_jobs
             ):
-                cluster_interface.submit_next()
-                i += 1
+                break
+
+            # submit the next batches of jobs in the background (cluster systems that
+            # support it submit several jobs with one call)
+            n_dispatched = cluster_interface.dispatch_submissions()
 
             if cluster_interface.is_ready_to_check_for_failed_jobs():
                 cluster_interface.check_for_failed_jobs()
@@ -676,7 +888,7 @@ def grid_search(
             max_failed_jobs = (
                 cluster_interface.n_successful_jobs
                 + cluster_interface.n_running_jobs
-                + num_jobs_to_submit_per_iteration
+                + num_tolerated_failed_jobs
             )
             if cluster_interface.n_failed_jobs > max_failed_jobs:
                 cluster_interface.close()
@@ -685,7 +897,20 @@ def grid_search(
                     " Ending procedure."
                 )
             check_for_keyboard_input()
-            time.sleep(constants.JOB_MANAGER_LOOP_SLEEP_TIME_IN_SECS)
+
+            # continue right away if submissions were dispatched, otherwise sleep until
+            # something happens (including a finished submission) or the cluster
+            # system needs to be polled again
+            if n_dispatched > 0:
+                wait_timeout = 0.0
+            else:
+                wait_timeout = min(
+                    constants.JOB_MANAGER_LOOP_MAX_WAIT_TIME_IN_SECS,
+                    cluster_interface.seconds_until_next_check_for_failed_jobs(),
+                )
+            cluster_interface.event_notifier.wait(
+                wait_timeout, other_files=interaction.input_files
+            )
 
     print()  # empty line after progress bars
 
@@ -694,18 +919,16 @@ def grid_search(
         logger.info("Exiting now")
         sys.exit(1)
 
+    collect_results()
     post_opt(cluster_interface)
 
-    df, all_params, metrics = None, None, None
-    for job in jobs:
-        results = job.get_results()
-        if results is None:
-            continue
-        job_df, job_all_params, job_metrics = results
-        if df is None:
-            df, all_params, metrics = job_df, job_all_params, job_metrics
-        else:
-            df = pd.concat((df, job_df), axis=0)
+    df = None
+    if len(results):
+        # results are collected in the (nondeterministic) order in which the jobs
+        # finished, the output follows the order of the grid
+        df = results.to_df(sort_columns=False).sort_values(
+            constants.ID, kind="stable", ignore_index=True
+        )
 
     if remove_working_dirs:
         rm_dir_full(base_paths_and_files["current_result_dir"])
@@ -1,25 +1,64 @@
 from __future__ import annotations
 
+import collections
 import logging
+import math
 import os
 import pickle
 import random
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Sequence
+from typing import TYPE_CHECKING, Optional, Sequence
 
+import numpy as np
 import pandas as pd
+import scipy.special
 
 from cluster_utils.base import constants
-from cluster_utils.base.utils import OptionalDependencyImport
+from cluster_utils.base.utils import (
+    OptionalDependencyImport,
+    flatten_nested_string_dict,
+)
 
-from . import data_analysis, distributions
-from .utils import get_sample_generator, nested_to_dict
+from . import data_analysis, distributions, result_files
+from .result_files import ResultFormat
+from .result_store import ResultStore
+from .run_journal import RunJournal, read_journal
+from .utils import distribution_list_sampler, get_sample_generator, nested_to_dict
 
 if TYPE_CHECKING:
     from . import latex_utils
 
 
+def load_optimizer(file: str) -> Optimizer:
+    """Load a snapshot of an optimizer and bring it up to date with the run journal.
+
+    Results that were recorded in the run journal (see :class:`.RunJournal`) after the
+    snapshot was taken are added to the loaded optimizer.
+    """
+    with open(file, "rb") as f:
+        optimizer = pickle.load(f)
+
+    journal_file = os.path.join(os.path.dirname(file), constants.RUN_JOURNAL_FILE)
+    if optimizer.journal_offset is not None:
+        optimizer.replay_journal(journal_file)
+    return optimizer
+
+
 class Optimizer(ABC):
+    #: If true, a snapshot is written after every iteration, as the state of the
+    #: optimizer can not be restored by replaying results from the run journal.
+    SNAPSHOT_EVERY_ITERATION = False
+    #: Minimal number of settings that are sampled at once.
+    MIN_SAMPLE_BATCH_SIZE = distributions.MIN_SAMPLE_BATCH_SIZE
+
+    #: Offset in the run journal up to which results are included in the last snapshot
+    #: (None if no snapshot was written while a journal was used).
+    journal_offset: Optional[int] = None
+    #: If set, results are recorded in this journal as they are added.
+    journal: Optional[RunJournal] = None
+    #: Format in which the results are saved (see :meth:`save_data_and_self`).
+    result_format: ResultFormat = ResultFormat.CSV
+
     def __init__(
         self,
         *,
@@ -39,23 +78,77 @@ class Optimizer(ABC):
 
         self.with_restarts = False
 
-        self.full_df = pd.DataFrame()
-        self.minimal_df = pd.DataFrame()
-        self.params = [param.param_name for param in self.optimized_params]
+        self.result_store = ResultStore(
+            metric_to_optimize,
+            [param.param_name for param in self.optimized_params],
+            minimize,
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the journal is an open file and is set up again when the run is continued
+        state.pop("journal", None)
+        return state
+
+    def __setstate__(self, state):
+        # optimizers pickled by older versions store the results as DataFrames
+        if "result_store" not in state:
+            state = dict(state)
+            full_df = state.pop("full_df", pd.DataFrame())
+            state.pop("minimal_df", None)
+            state["result_store"] = ResultStore.from_df(
+                full_df,
+                state["metric_to_optimize"],
+                state.pop("params"),
+                state["minimize"],
+            )
+        self.__dict__.update(state)
+
+    @property
+    def params(self) -> list[str]:
+        """Names of the optimized parameters."""
+        return self.result_store.params
+
+    @params.setter
+    def params(self, params: Sequence[str]) -> None:
+        self.result_store.set_params(params)
+
+    @property
+    def full_df(self) -> pd.DataFrame:
+        """Results of all jobs, sorted by :attr:`metric_to_optimize`."""
+        return self.result_store.full_df
+
+    @property
+    def minimal_df(self) -> pd.DataFrame:
+        """Results averaged over jobs with the same parameters."""
+        return self.result_store.minimal_df
+
+    def best_metric_value(self):
+        """Best value of :attr:`metric_to_optimize` so far (None if no results)."""
+        return self.result_store.best_value()
 
     @abstractmethod
     def ask(self):
         """Return parameters for next job."""
         pass
 
+    def ask_batch(self, howmany):
+        """Return parameters for the next ``howmany`` jobs."""
+        return [self.ask() for _ in range(howmany)]
+
     @abstractmethod
-    def tell(self, df, jobs):
-        """Add results of finished jobs."""
+    def tell(self, rows, jobs):
+        """Add results of finished jobs.
+
+        Args:
+            rows: Results of the jobs as returned by :meth:`.Job.get_result_row`.
+            jobs: The jobs, which are marked as used for the update.
+        """
         for job in jobs:
             job.results_used_for_update = True
-        df[constants.ITERATION] = self.iteration + 1
+        rows = [{**row, constants.ITERATION: self.iteration + 1} for row in rows]
 
-        if self.metric_to_optimize not in df:
+        if rows and not any(self.metric_to_optimize in row for row in rows):
             # raise a more understandable error
             raise KeyError(
                 "Trying to optimize metric '{}' but it is not provided by the job.".format(
@@ -63,17 +156,9 @@ class Optimizer(ABC):
                 )
             )
 
-        self.full_df = pd.concat([self.full_df, df], ignore_index=True, sort=True)
-        self.full_df = self.full_df.sort_values(
-            [self.metric_to_optimize], ascending=self.minimize
-        )
-
-        self.minimal_df = data_analysis.average_out(
-            self.full_df,
-            [self.metric_to_optimize],
-            self.params,
-            sort_ascending=self.minimize,
-        )
+        self.result_store.add_rows(rows)
+        if self.journal is not None:
+            self.journal.record_results(rows)
 
     @abstractmethod
     def try_load_from_pickle(
@@ -87,16 +172,98 @@ class Optimizer(ABC):
     ):
         pass
 
+    def replay_journal(self, journal_file: str) -> None:
+        """Add results and iterations recorded after :attr:`journal_offset`."""
+        logger = logging.getLogger("cluster_utils")
+        records = read_journal(journal_file, self.journal_offset)
+        n_results = 0
+        for record in records:
+            if record["event"] == RunJournal.RESULTS:
+                self.result_store.add_rows(record["rows"])
+                n_results += len(record["rows"])
+            elif record["event"] == RunJournal.ITERATION:
+                self.iteration = record["iteration"]
+        if n_results:
+            logger.info("Restored %d results from the run journal.", n_results)
+
+    def snapshot_due(self) -> bool:
+        """Check if a new snapshot should be written (see :meth:`save_snapshot`).
+
+        Snapshots are written when the journal grew by as much as it had at the time of
+        the last snapshot, so the total time spent on snapshots stays proportional to
+        the size of the journal.
+        """
+        if self.journal is None or self.journal_offset is None:
+            return True
+        if self.SNAPSHOT_EVERY_ITERATION:
+            return True
+        growth = self.journal.offset - self.journal_offset
+        return growth >= max(
+            self.journal_offset, constants.RUN_JOURNAL_MIN_BYTES_BETWEEN_SNAPSHOTS
+        )
+
+    def save_snapshot(self, directory: str) -> None:
+        """Pickle the optimizer to the status file in the given directory.
+
+        The file is replaced atomically, so an interrupted write does not destroy the
+        previous snapshot.
+        """
+        if self.journal is not None:
+            self.journal_offset = self.journal.offset
+        self_file = os.path.join(directory, constants.STATUS_PICKLE_FILE)
+        tmp_file = self_file + ".tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(self, f)
+        os.replace(tmp_file, self_file)
+
+    def save_new_results(self, directory: str) -> None:
+        """Append results that are not saved yet to the Parquet results in directory.
+
+        Only has an effect if results are saved in Parquet format.  The results of all
+        jobs are then saved incrementally (e.g. after every iteration), so saving does
+        not get slower as results accumulate.
+        """
+        if self.result_format != ResultFormat.PARQUET:
+            return
+        path = result_files.full_data_path(directory, self.result_format)
+        n_saved = result_files.n_parquet_rows(path)
+        if n_saved < len(self.result_store):
+            result_files.append_parquet_rows(
+                path, self.result_store.rows_df(n_saved), start=n_saved
+            )
+
+    def save_data_and_self(self, directory):
+        """Save results and write a snapshot of the optimizer."""
+        if self.result_format == ResultFormat.PARQUET:
+            self.save_new_results(directory)
+        else:
+            result_files.write_table(
+                self.full_df,
+                result_files.full_data_path(directory, self.result_format),
+            )
+        result_files.write_table(
+            self.minimal_df,
+            result_files.reduced_data_path(directory, self.result_format),
+        )
+        self.save_snapshot(directory)
+
     def best_jobs_working_dirs(self, how_many):
         logger = logging.getLogger("cluster_utils")
-        df_to_use = self.full_df
-        if how_many > df_to_use.shape[0]:
+        n_results = len(self.result_store)
+        if how_many > n_results:
             logger.warning(
                 "Requesting more best_jobs_working_dirs than data is available, "
-                f"reducing number to: {df_to_use.shape[0]}"
+                f"reducing number to: {n_results}"
             )
-            how_many = df_to_use.shape[0]
-        df_to_use = df_to_use[["working_dir", self.metric_to_optimize]]
+            how_many = n_results
+        df_to_use = pd.DataFrame(
+            {
+                "working_dir": self.result_store.column("working_dir"),
+                self.metric_to_optimize: self.result_store.column(
+                    self.metric_to_optimize
+                ),
+            }
+        )
         return data_analysis.best_jobs(
             df_to_use,
             metric=self.metric_to_optimize,
@@ -132,6 +299,13 @@ class Metaoptimizer(Optimizer):
         )  # Force a minimum of 5 jobs in an elite
         self.with_restarts = with_restarts
         self.best_param_values = {}
+        # settings that were sampled but not yet handed out by ask()
+        self._sample_buffer: collections.deque = collections.deque()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # sampled settings are only valid for the current state of the distributions
+        self._sample_buffer = collections.deque()
 
     @classmethod
     def try_load_from_pickle(
@@ -148,8 +322,7 @@ class Metaoptimizer(Optimizer):
 
         _, with_restarts = optimizer_settings
 
-        with open(file, "rb") as f:
-            metaopt = pickle.load(f)
+        metaopt = load_optimizer(file)
         if (metric_to_optimize, minimize) != (
             metaopt.metric_to_optimize,
             metaopt.minimize,
@@ -161,49 +334,56 @@ class Metaoptimizer(Optimizer):
                 distr.fit(current_best_params[distr.param_name])
 
         metaopt.optimized_params = optimized_params
+        metaopt._sample_buffer.clear()
         metaopt.with_restarts = with_restarts
         metaopt.params = [distr.param_name for distr in metaopt.optimized_params]
         metaopt.report_hooks = report_hooks or []
         return metaopt
 
     def ask(self):
-        if (
-            not self.with_restarts
-            or len(self.minimal_df) < self.num_jobs_in_elite
-            or random.random() < 0.8
-        ):
-            return_settings = self.distribution_list_sampler(num_samples=1)
-            return list(return_settings)[0]
-        else:
-            return self.random_setting_to_restart
+        return self.ask_batch(1)[0]
+
+    def ask_batch(self, howmany):
+        """Return parameters for the next ``howmany`` jobs.
+
+        New settings for all distributions are sampled in one vectorised pass and
+        handed out from a buffer that is invalidated when the distributions are
+        refitted.
+        """
+        can_restart = (
+            self.with_restarts and self.result_store.n_groups >= self.num_jobs_in_elite
+        )
+        is_restart = [can_restart and random.random() >= 0.8 for _ in range(howmany)]
+
+        n_new_settings = howmany - sum(is_restart)
+        n_missing = n_new_settings - len(self._sample_buffer)
+        if n_missing > 0:
+            self._sample_buffer.extend(
+                self.distribution_list_sampler(
+                    num_samples=max(n_missing, self.MIN_SAMPLE_BATCH_SIZE)
+                )
+            )
+
+        return [
+            self.random_setting_to_restart if restart else self._sample_buffer.popleft()
+            for restart in is_restart
+        ]
 
     def tell(self, jobs):
-        iteration_df = None
         if not isinstance(jobs, list):
             jobs = [jobs]
-        for job in jobs:
-            result = job.get_results()
-            if result is not None:
-                df, _, _ = result
-            if iteration_df is not None:
-                iteration_df = pd.concat((iteration_df, df), axis=0, sort=True)
-            else:
-                iteration_df = df
-        if iteration_df is None:
+        results = [job.get_result_row() for job in jobs]
+        rows = [result[0] for result in results if result is not None]
+        if not rows:
             return
-        super().tell(iteration_df, jobs)
+        super().tell(rows, jobs)
         current_best_params = self.get_best_params()
         for distr in self.optimized_params:
             distr.fit(current_best_params[distr.param_name])
+        self._sample_buffer.clear()
 
     def get_best_params(self):
-        return data_analysis.best_params(
-            self.minimal_df,
-            params=self.params,
-            metric=self.metric_to_optimize,
-            minimum=self.minimize,
-            how_many=self.num_jobs_in_elite,
-        )
+        return self.result_store.best_group_params(how_many=self.num_jobs_in_elite)
 
     @property
     def random_setting_to_restart(self):
@@ -223,24 +403,13 @@ class Metaoptimizer(Optimizer):
             return 1
 
     def distribution_list_sampler(self, num_samples):
-        for distr in self.optimized_params:
-            distr.prepare_samples(howmany=num_samples)
-        for _ in range(num_samples):
-            nested_items = [
-                (distr.param_name.split(constants.OBJECT_SEPARATOR), distr.sample())
-                for distr in self.optimized_params
-            ]
-            yield nested_to_dict(nested_items)
-
-    def save_data_and_self(self, directory):
-        self.full_df.to_csv(os.path.join(directory, constants.FULL_DF_FILE))
-        self.minimal_df.to_csv(os.path.join(directory, constants.REDUCED_DF_FILE))
-        self_file = os.path.join(directory, constants.STATUS_PICKLE_FILE)
-        with open(self_file, "wb") as f:
-            pickle.dump(self, f)
+        return distribution_list_sampler(self.optimized_params, num_samples)
 
 
 class NGOptimizer(Optimizer):
+    # the state of the nevergrad optimizer is only stored in the snapshots
+    SNAPSHOT_EVERY_ITERATION = True
+
     @staticmethod
     def get_optimizer_dict():
         # conditional import as it depends on optional dependencies
@@ -256,7 +425,7 @@ class NGOptimizer(Optimizer):
             "randomsearch": ng.optimizers.RandomSearch,
         }
 
-    def __init__(self, *, opt_alg, **kwargs):
+    def __init__(self, *, opt_alg, num_workers=1, **kwargs):
         # conditional import as it depends on optional dependencies
         with OptionalDependencyImport("nevergrad"):
             import nevergrad.parametrization.parameter as par
@@ -272,10 +441,20 @@ class NGOptimizer(Optimizer):
         }
         self.instrumentation = par.Instrumentation(**self.instrumentation)
         self.optimizer = ng_optimizer_dict[opt_alg](
-            parametrization=self.instrumentation
+            parametrization=self.instrumentation, num_workers=num_workers
         )
         self.with_restarts = False
+        #: Candidates of nevergrad by id of the job that evaluates them.
         self.candidates = {}
+        # candidates that were asked but not yet associated with a job
+        self._unassociated_candidates: collections.deque = collections.deque()
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        # optimizers pickled by older versions store an unassociated candidate as -1
+        self._unassociated_candidates = collections.deque()
+        if -1 in self.candidates:
+            self._unassociated_candidates.append(self.candidates.pop(-1))
 
     def get_ng_instrumentation(self, param):
         # conditional import as it depends on optional dependencies
@@ -299,38 +478,47 @@ class NGOptimizer(Optimizer):
         raise ValueError("Invalid Distribution")
 
     def ask(self):
-        candidate = self.optimizer.ask()
-        if -1 in self.candidates:
-            raise ValueError("There is already one unassociated candidate!")
-        self.candidates[-1] = candidate
-        nested_items = [
-            (param_name.split(constants.OBJECT_SEPARATOR), value)
-            for param_name, value in candidate.kwargs.items()
-        ]
-        return nested_to_dict(nested_items)
+        return self.ask_batch(1)[0]
 
-    def add_candidate(self, job_id):
-        if -1 not in self.candidates:
+    def ask_batch(self, howmany):
+        """Return parameters for the next ``howmany`` jobs.
+
+        The candidates have to be associated with the jobs that evaluate them with
+        :meth:`add_candidates` (in the same order) before results are told.
+        """
+        settings = []
+        for _ in range(howmany):
+            candidate = self.optimizer.ask()
+            self._unassociated_candidates.append(candidate)
+            nested_items = [
+                (param_name.split(constants.OBJECT_SEPARATOR), value)
+                for param_name, value in candidate.kwargs.items()
+            ]
+            settings.append(nested_to_dict(nested_items))
+        return settings
+
+    def add_candidates(self, job_ids):
+        """Associate the asked candidates with the given jobs (in order of asking)."""
+        if len(job_ids) > len(self._unassociated_candidates):
             raise ValueError("There is no unassociated candidate!")
-        self.candidates[job_id] = self.candidates[-1]
-        del self.candidates[-1]
+        for job_id in job_ids:
+            self.candidates[job_id] = self._unassociated_candidates.popleft()
+
+    def add_candidate(self, job_id):
+        self.add_candidates([job_id])
 
     def tell(self, jobs):
-        for job in jobs:
-            results = job.get_results()
-            if results is not None:
-                df, params, metrics = results
-            else:
-                return
-            super().tell(df, jobs)
-            if self.minimize:
-                self.optimizer.tell(
-                    self.candidates[job.id], df.iloc[0][self.metric_to_optimize]
-                )
-            else:
-                self.optimizer.tell(
-                    self.candidates[job.id], -df.iloc[0][self.metric_to_optimize]
-                )
+        results = [(job, job.get_result_row()) for job in jobs]
+        results = [(job, result[0]) for job, result in results if result is not None]
+        if not results:
+            return
+        super().tell([row for _, row in results], jobs)
+
+        sign = 1 if self.minimize else -1
+        for job, row in results:
+            # candidates are not needed anymore once their result is known
+            candidate = self.candidates.pop(job.id)
+            self.optimizer.tell(candidate, sign * row[self.metric_to_optimize])
 
     def provide_recommendation_settings(self, how_many=1):
         if self.iteration > 0:
@@ -352,8 +540,7 @@ class NGOptimizer(Optimizer):
         if not os.path.exists(file):
             return None
 
-        with open(file, "rb") as f:
-            ngopt = pickle.load(f)
+        ngopt = load_optimizer(file)
         if (metric_to_optimize, minimize) != (ngopt.metric_to_optimize, ngopt.minimize):
             raise ValueError("Attempted to continue but optimizes a different metric!")
 
@@ -370,12 +557,503 @@ class NGOptimizer(Optimizer):
     def min_fraction_to_finish(self):
         return 0.1
 
-    def save_data_and_self(self, directory):
-        self.full_df.to_csv(os.path.join(directory, constants.FULL_DF_FILE))
-        self.minimal_df.to_csv(os.path.join(directory, constants.REDUCED_DF_FILE))
-        self_file = os.path.join(directory, constants.STATUS_PICKLE_FILE)
-        with open(self_file, "wb") as f:
-            pickle.dump(self, f)
+
+class HyperbandOptimizer(Optimizer):
+    """Multi-fidelity optimization with asynchronous Hyperband.
+
+    Every setting is run with a budget (e.g. the number of epochs) that is passed to
+    the job as parameter :attr:`budget_param`.  Settings are sampled randomly from the
+    distributions of the optimized parameters and first run with a small budget.  Only
+    the best of them are run again with a larger budget (they are *promoted*), so most
+    of the compute is spent on promising settings.
+
+    Budgets grow by ``reduction_factor`` from rung to rung, up to ``max_budget``.  A
+    setting that finished at a rung is promoted to the next one if it is among the best
+    ``1 / reduction_factor`` of the settings that finished at this rung so far
+    (asynchronous successive halving, so no job has to wait for others).  Like in
+    Hyperband, settings are distributed over several brackets that start at different
+    budgets, from ``min_budget`` to ``max_budget``, to hedge against settings whose
+    results at small budgets are misleading.
+
+    See Li et al., "Hyperband: A Novel Bandit-Based Approach to Hyperparameter
+    Optimization" (JMLR 2018) and "A System for Massively Parallel Hyperparameter
+    Tuning" (MLSys 2020).
+    """
+
+    # the rungs are restored from the journal (see replay_journal), snapshots after
+    # every iteration keep the part of the journal that has to be replayed short
+    SNAPSHOT_EVERY_ITERATION = True
+
+    #: How often to sample before a setting is accepted that was already sampled.
+    MAX_SAMPLE_ATTEMPTS = 100
+
+    def __init__(
+        self,
+        *,
+        budget_param: str,
+        min_budget: float,
+        max_budget: float,
+        reduction_factor: float = 3,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        if budget_param in self.params:
+            raise ValueError(
+                f"Budget parameter '{budget_param}' must not be an optimized parameter."
+            )
+        if not 0 < min_budget <= max_budget:
+            raise ValueError("Budgets must fulfil 0 < min_budget <= max_budget.")
+        if reduction_factor <= 1:
+            raise ValueError("reduction_factor must be greater than 1.")
+
+        self.budget_param = budget_param
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self.reduction_factor = reduction_factor
+        # results with different budgets are not comparable, so they are not grouped
+        self.params = [*self.params, budget_param]
+
+        n_brackets = (
+            int(math.log(max_budget / min_budget) / math.log(reduction_factor) + 1e-9)
+            + 1
+        )
+        #: Budgets of the rungs of each bracket (bracket s starts s rungs below the
+        #: maximal budget).
+        self.bracket_budgets = [
+            [self._budget(rung - s) for rung in range(s + 1)] for s in range(n_brackets)
+        ]
+        # like in Hyperband, brackets starting at smaller budgets get more settings
+        self._bracket_schedule = [
+            s
+            for s in reversed(range(n_brackets))
+            for _ in range(math.ceil(n_brackets / (s + 1) * reduction_factor**s))
+        ]
+        self._n_sampled = 0
+        self._sample_buffer: collections.deque = collections.deque()
+
+        #: Bracket and parameter values of every sampled setting (by parameter values).
+        self._bracket_of: dict[tuple, int] = {}
+        #: Per bracket and rung, the metric values of the settings that finished at the
+        #: rung (multiplied by -1 if maximizing, so smaller is better).
+        self._rung_results: list[list[dict[tuple, float]]] = [
+            [{} for _ in budgets] for budgets in self.bracket_budgets
+        ]
+        #: Per bracket and rung, the settings that were promoted from the rung.
+        self._promoted: list[list[set[tuple]]] = [
+            [set() for _ in budgets] for budgets in self.bracket_budgets
+        ]
+
+    def _budget(self, exponent: int):
+        budget = self.max_budget * self.reduction_factor**exponent
+        if isinstance(self.min_budget, int) and isinstance(self.max_budget, int):
+            return max(int(round(budget)), 1)
+        return budget
+
+    def _settings(self, key: tuple, budget) -> dict:
+        nested_items = [
+            (param.param_name.split(constants.OBJECT_SEPARATOR), value)
+            for param, value in zip(self.optimized_params, key)
+        ]
+        nested_items.append(
+            (self.budget_param.split(constants.OBJECT_SEPARATOR), budget)
+        )
+        return nested_to_dict(nested_items)
+
+    def _next_promotion(self) -> Optional[dict]:
+        for bracket, results_per_rung in enumerate(self._rung_results):
+            # prefer promotions to high budgets, they are closest to a final result
+            for rung in reversed(range(len(results_per_rung) - 1)):
+                results = results_per_rung[rung]
+                n_promotable = int(len(results) / self.reduction_factor)
+                if n_promotable <= len(self._promoted[bracket][rung]):
+                    continue
+                best = sorted(results, key=results.__getitem__)[:n_promotable]
+                # settings without result are never promoted
+                best = [key for key in best if math.isfinite(results[key])]
+                for key in best:
+                    if key not in self._promoted[bracket][rung]:
+                        self._promoted[bracket][rung].add(key)
+                        return self._settings(
+                            key, self.bracket_budgets[bracket][rung + 1]
+                        )
+        return None
+
+    def ask(self):
+        settings = self._next_promotion()
+        if settings is not None:
+            return settings
+
+        # sampled values are rounded, so the same setting is sampled repeatedly.  It is
+        # not run again (unless no new setting is found)
+        for _ in range(self.MAX_SAMPLE_ATTEMPTS):
+            if not self._sample_buffer:
+                samples = [
+                    distr.sample_batch(self.MIN_SAMPLE_BATCH_SIZE)
+                    for distr in self.optimized_params
+                ]
+                self._sample_buffer.extend(zip(*samples))
+            key = self._sample_buffer.popleft()
+            if key not in self._bracket_of:
+                break
+        bracket = self._bracket_schedule[self._n_sampled % len(self._bracket_schedule)]
+        self._n_sampled += 1
+        self._bracket_of.setdefault(key, bracket)
+        return self._settings(key, self.bracket_budgets[self._bracket_of[key]][0])
+
+    def _key(self, row) -> tuple:
+        return tuple(row.get(param.param_name) for param in self.optimized_params)
+
+    def _register_asked(self, row) -> None:
+        """Register a setting that was asked for, given as flattened parameters.
+
+        This restores the effect of :meth:`ask` for settings that were asked for after
+        the last snapshot.
+        """
+        key = self._key(row)
+        budget = row.get(self.budget_param)
+        bracket = self._bracket_of.get(key)
+        if bracket is None:
+            # the brackets start at different budgets
+            first_budgets = [budgets[0] for budgets in self.bracket_budgets]
+            if budget not in first_budgets:
+                return
+            self._bracket_of[key] = first_budgets.index(budget)
+            self._n_sampled += 1
+            return
+        budgets = self.bracket_budgets[bracket]
+        if budget in budgets[1:]:
+            self._promoted[bracket][budgets.index(budget) - 1].add(key)
+
+    def _update_rungs(self, rows) -> None:
+        """Add the results of finished settings to the rungs."""
+        sign = 1.0 if self.minimize else -1.0
+        for row in rows:
+            key = self._key(row)
+            bracket = self._bracket_of.get(key)
+            if bracket is None:
+                continue
+            budgets = self.bracket_budgets[bracket]
+            budget = row.get(self.budget_param)
+            if budget not in budgets:
+                continue
+            value = row.get(self.metric_to_optimize, math.nan)
+            if value is None or math.isnan(value):
+                # never promote settings without result
+                value = math.inf
+            else:
+                value = sign * value
+            self._rung_results[bracket][budgets.index(budget)][key] = value
+
+    def tell(self, jobs):
+        results = [job.get_result_row() for job in jobs]
+        rows = [result[0] for result in results if result is not None]
+        if not rows:
+            return
+        super().tell(rows, jobs)
+        self._update_rungs(rows)
+
+    def replay_journal(self, journal_file: str) -> None:
+        super().replay_journal(journal_file)
+        # the rungs are not part of the result store, so settings that were asked for
+        # and results that were recorded after the last snapshot are added to them
+        for record in read_journal(journal_file, self.journal_offset):
+            if record["event"] == RunJournal.ASK:
+                self._register_asked(
+                    dict(flatten_nested_string_dict(record["settings"]))
+                )
+            elif record["event"] == RunJournal.RESULTS:
+                self._update_rungs(record["rows"])
+
+    def best_jobs_working_dirs(self, how_many):
+        columns = ("working_dir", self.metric_to_optimize, self.budget_param)
+        df = pd.DataFrame({name: self.result_store.column(name) for name in columns})
+        # results with smaller budgets are not comparable to those with the maximal one
+        df_to_use = df[df[self.budget_param] == df[self.budget_param].max()]
+        return data_analysis.best_jobs(
+            df_to_use,
+            metric=self.metric_to_optimize,
+            how_many=how_many,
+            minimum=self.minimize,
+        )["working_dir"]
+
+    def get_best(self, how_many=10):
+        if self.iteration == 0:
+            return ""
+        df = self.minimal_df
+        df_to_use = df[df[self.budget_param] == df[self.budget_param].max()]
+        return data_analysis.best_jobs(
+            df_to_use,
+            metric=self.metric_to_optimize,
+            how_many=how_many,
+            minimum=self.minimize,
+        )
+
+    @classmethod
+    def try_load_from_pickle(
+        cls,
+        file,
+        optimized_params,
+        metric_to_optimize,
+        minimize,
+        report_hooks,
+        **optimizer_settings,
+    ):
+        if not os.path.exists(file):
+            return None
+
+        hbopt = load_optimizer(file)
+        if (metric_to_optimize, minimize) != (hbopt.metric_to_optimize, hbopt.minimize):
+            raise ValueError("Attempted to continue but optimizes a different metric!")
+        budget_settings = ("budget_param", "min_budget", "max_budget")
+        if any(
+            optimizer_settings[name] != getattr(hbopt, name) for name in budget_settings
+        ):
+            raise ValueError("Attempted to continue but with different budgets!")
+        hbopt.report_hooks = report_hooks or []
+        return hbopt
+
+
+class TPEOptimizer(Optimizer):
+    """Tree-structured Parzen Estimator (TPE).
+
+    The results so far are split into the best ``gamma`` fraction ("good") and the
+    others ("bad").  For every parameter, densities ``l(x)`` and ``g(x)`` of the values
+    in both groups are estimated (Parzen estimators, i.e. mixtures of truncated normal
+    distributions around the observed values or smoothed frequencies for discrete
+    parameters).  New settings are chosen among ``n_ei_candidates`` candidates drawn
+    from ``l`` by maximizing ``l(x) / g(x)``, which maximizes the expected improvement.
+
+    The distributions of the optimized parameters define the search space: bounds,
+    whether it is searched in log space (log-normal distributions), rounding to
+    integers and the options of discrete parameters.  Until ``n_initial_samples``
+    results are available, settings are sampled from the distributions directly.
+
+    See Bergstra et al., "Algorithms for Hyper-Parameter Optimization" (NeurIPS 2011).
+    """
+
+    def __init__(
+        self,
+        *,
+        n_initial_samples: int = 10,
+        gamma: float = 0.15,
+        n_ei_candidates: int = 24,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        if not 0 < gamma < 1:
+            raise ValueError("gamma must be in (0, 1).")
+        for param in self.optimized_params:
+            if not isinstance(
+                param, (distributions.Discrete, distributions.NumericalDistribution)
+            ):
+                raise TypeError(
+                    f"Distribution {type(param).__name__} of {param.param_name} is"
+                    " not supported by TPE."
+                )
+        self.n_initial_samples = max(n_initial_samples, 2)
+        self.gamma = gamma
+        self.n_ei_candidates = n_ei_candidates
+        # initial settings that were sampled but not yet handed out (they stay valid,
+        # as the distributions are not fitted)
+        self._sample_buffer: collections.deque = collections.deque()
+
+    def ask(self):
+        return self.ask_batch(1)[0]
+
+    def ask_batch(self, howmany):
+        """Return parameters for the next ``howmany`` jobs.
+
+        The settings of a batch are chosen one after another.  Settings chosen before
+        are counted as bad results for the following ones (the "constant liar"
+        strategy), so the batch does not concentrate on a single region.
+        """
+        metric = np.asarray(
+            self.result_store.column(self.metric_to_optimize), dtype=float
+        )
+        has_result = np.isfinite(metric)
+        n_results = int(has_result.sum())
+        if n_results < self.n_initial_samples:
+            n_missing = howmany - len(self._sample_buffer)
+            if n_missing > 0:
+                self._sample_buffer.extend(
+                    distribution_list_sampler(
+                        self.optimized_params,
+                        max(n_missing, self.MIN_SAMPLE_BATCH_SIZE),
+                    )
+                )
+            return [self._sample_buffer.popleft() for _ in range(howmany)]
+
+        # split results into the good and the bad ones
+        sign = 1.0 if self.minimize else -1.0
+        order = np.argsort(np.where(has_result, sign * metric, np.inf), kind="stable")
+        is_good = np.zeros(len(metric), dtype=bool)
+        is_good[order[: max(1, math.ceil(self.gamma * n_results))]] = True
+        is_bad = has_result & ~is_good
+
+        points = [
+            # parameters that were added when continuing a run have no values yet
+            self._to_points(
+                param,
+                self.result_store.column(param.param_name) or [math.nan] * len(metric),
+            )
+            for param in self.optimized_params
+        ]
+        chosen: list[list[float]] = [[] for _ in self.optimized_params]
+        for _ in range(howmany):
+            score = np.zeros(self.n_ei_candidates)
+            candidates = []
+            for param, param_points, param_chosen in zip(
+                self.optimized_params, points, chosen
+            ):
+                good = param_points[is_good]
+                bad = np.concatenate([param_points[is_bad], param_chosen])
+                if isinstance(param, distributions.Discrete):
+                    samples, log_ratio = self._sample_discrete(
+                        len(param.option_list), good, bad, self.n_ei_candidates
+                    )
+                else:
+                    samples, log_ratio = self._sample_numerical(
+                        param, good, bad, self.n_ei_candidates
+                    )
+                score += log_ratio
+                candidates.append(samples)
+
+            best = int(np.argmax(score))
+            for samples, param_chosen in zip(candidates, chosen):
+                param_chosen.append(samples[best])
+
+        keys = [
+            param.param_name.split(constants.OBJECT_SEPARATOR)
+            for param in self.optimized_params
+        ]
+        values = [
+            self._to_param_values(param, np.array(param_chosen))
+            for param, param_chosen in zip(self.optimized_params, chosen)
+        ]
+        return [nested_to_dict(list(zip(keys, setting))) for setting in zip(*values)]
+
+    @staticmethod
+    def _to_points(param, values) -> np.ndarray:
+        """Convert parameter values to the space the densities are estimated in.
+
+        These are the indices of the options for discrete parameters and the (log)
+        values for numerical ones.  Unknown values are NaN.
+        """
+        if isinstance(param, distributions.Discrete):
+            index_of = {option: i for i, option in enumerate(param.option_list)}
+            return np.array([index_of.get(value, math.nan) for value in values])
+        points = np.asarray(values, dtype=float)
+        if isinstance(param, distributions.TruncatedLogNormal):
+            points = np.log(points)
+        return points
+
+    @staticmethod
+    def _to_param_values(param, samples):
+        if isinstance(param, distributions.Discrete):
+            return [param.option_list[int(i)] for i in samples]
+        if isinstance(param, distributions.TruncatedLogNormal):
+            samples = np.exp(samples)
+        samples = np.clip(samples, param.lower, param.upper)
+        if isinstance(param, distributions.DistributionOverIntegers):
+            samples = np.trunc(samples + 0.5).astype(int)
+        return samples.tolist()
+
+    @staticmethod
+    def _sample_discrete(n_options, good, bad, n):
+        def probabilities(points):
+            points = points[np.isfinite(points)].astype(int)
+            # plus one for every option as prior
+            counts = np.bincount(points, minlength=n_options) + 1.0
+            return counts / counts.sum()
+
+        p_good, p_bad = probabilities(good), probabilities(bad)
+        samples = np.random.choice(n_options, p=p_good, size=n)
+        return samples, np.log(p_good[samples]) - np.log(p_bad[samples])
+
+    @staticmethod
+    def _sample_numerical(param, good, bad, n):
+        if isinstance(param, distributions.TruncatedLogNormal):
+            low, high = param.log_lower, param.log_upper
+        else:
+            low, high = param.lower, param.upper
+        good = _ParzenEstimator(good[np.isfinite(good)], low, high)
+        bad = _ParzenEstimator(bad[np.isfinite(bad)], low, high)
+        samples = good.sample(n)
+        return samples, good.log_pdf(samples) - bad.log_pdf(samples)
+
+    def tell(self, jobs):
+        results = [job.get_result_row() for job in jobs]
+        rows = [result[0] for result in results if result is not None]
+        if not rows:
+            return
+        super().tell(rows, jobs)
+
+    @classmethod
+    def try_load_from_pickle(
+        cls,
+        file,
+        optimized_params,
+        metric_to_optimize,
+        minimize,
+        report_hooks,
+        **optimizer_settings,
+    ):
+        if not os.path.exists(file):
+            return None
+
+        tpeopt = load_optimizer(file)
+        if (metric_to_optimize, minimize) != (
+            tpeopt.metric_to_optimize,
+            tpeopt.minimize,
+        ):
+            raise ValueError("Attempted to continue but optimizes a different metric!")
+        tpeopt.optimized_params = optimized_params
+        tpeopt.params = [distr.param_name for distr in optimized_params]
+        tpeopt.report_hooks = report_hooks or []
+        return tpeopt
+
+
+class _ParzenEstimator:
+    """Mixture of normal distributions truncated to [low, high].
+
+    There is one component around each point plus a wide prior component in the
+    center, so the density is positive everywhere (also if there are no points).
+    """
+
+    def __init__(self, points: np.ndarray, low: float, high: float) -> None:
+        width = high - low
+        self.low, self.high = low, high
+        self.mus = np.sort(np.append(points, 0.5 * (low + high)))
+        # the bandwidth of each component is the distance to the farther of its
+        # neighbours (like in hyperopt), so it adapts to the density of the points.  The
+        # bounds do not count as neighbours, otherwise the outermost points would get
+        # wide components that favour the unexplored edges of the search space.
+        neighbours = np.concatenate([[self.mus[0]], self.mus, [self.mus[-1]]])
+        self.sigmas = np.maximum(self.mus - neighbours[:-2], neighbours[2:] - self.mus)
+        self.sigmas = np.clip(self.sigmas, width / min(100, len(self.mus)), width)
+        # the prior component is wide
+        self.sigmas[np.searchsorted(self.mus, 0.5 * (low + high))] = width
+        self.cdf_low = scipy.special.ndtr((low - self.mus) / self.sigmas)
+        self.cdf_high = scipy.special.ndtr((high - self.mus) / self.sigmas)
+        self.log_normalizers = np.log(self.cdf_high - self.cdf_low) + np.log(
+            len(self.mus)
+        )
+
+    def sample(self, shape) -> np.ndarray:
+        component = np.random.randint(len(self.mus), size=shape)
+        # inverse transform sampling from the truncated normal of the component
+        u = np.random.uniform(self.cdf_low[component], self.cdf_high[component])
+        samples = self.mus[component] + self.sigmas[component] * scipy.special.ndtri(u)
+        return np.clip(samples, self.low, self.high)
+
+    def log_pdf(self, x: np.ndarray) -> np.ndarray:
+        z = (x[..., np.newaxis] - self.mus) / self.sigmas
+        log_pdfs = (
+            -0.5 * z**2
+            - np.log(self.sigmas * math.sqrt(2 * math.pi))
+            - self.log_normalizers
+        )
+        return scipy.special.logsumexp(log_pdfs, axis=-1)
 
 
 class GridSearchOptimizer(Optimizer):
@@ -412,13 +1090,30 @@ class GridSearchOptimizer(Optimizer):
             return settings
         return settings
 
+    @property
+    def n_settings(self) -> int:
+        """Total number of settings that :meth:`ask_all` yields (including restarts)."""
+        if self.number_of_samples:
+            n_per_restart = self.number_of_samples
+        else:
+            n_per_restart = math.prod(
+                len(values) for values in self.parameter_dicts.values()
+            )
+        return n_per_restart * self.restarts
+
     def ask_all(self):
+        """Iterate over all settings.
+
+        Settings are generated lazily, so the grid is never held in memory as a whole.
+        The position of a setting in the iteration (its *grid index*) is the same for
+        every run with the same parameters (unless random samples are used).
+        """
         settings = self.ask()
         while settings is not None:
             yield settings
             settings = self.ask()
 
-    def tell(self, df):
+    def tell(self, rows, jobs=()):
         pass
 
     def get_best(self, how_many=1):
@@ -0,0 +1,196 @@
+"""Reading and writing of the result tables (``all_data`` and ``reduced_data``).
+
+Results can be saved as CSV (the default) or in the columnar Parquet format.  Parquet
+keeps the dtypes and allows to read only the needed columns, which makes a big
+difference for runs with many results and many (flattened) parameters.
+
+With Parquet, ``all_data`` is a directory with one file per batch of results (see
+:func:`append_parquet_rows`), so new results can be saved after every iteration without
+rewriting the results of the previous ones.
+"""
+
+from __future__ import annotations
+
+import enum
+import os
+import re
+import shutil
+from typing import Optional, Sequence, Union
+
+import pandas as pd
+
+from cluster_utils.base import constants
+from cluster_utils.base.utils import OptionalDependencyImport
+
+_PART_FILE_PATTERN = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+
+
+class ResultFormat(enum.Enum):
+    """The possible values for the "result_format" setting."""
+
+    #: Save results as CSV files.
+    CSV = "csv"
+    #: Save results as Parquet files (requires pyarrow).
+    PARQUET = "parquet"
+
+    @staticmethod
+    def parse(value: Union[str, ResultFormat]) -> ResultFormat:
+        """Get the format for the given value of the "result_format" setting.
+
+        Raises:
+            ValueError: if the value cannot be mapped to one of the formats.
+        """
+        if isinstance(value, ResultFormat):
+            return value
+        try:
+            return ResultFormat(value.lower())
+        except ValueError:
+            options = tuple(f.value for f in ResultFormat)
+            raise ValueError(
+                f"Invalid value '{value}' for setting result_format.  Valid options are"
+                f" {options}."
+            ) from None
+
+
+def require_parquet_support() -> None:
+    """Raise an OptionalDependencyNotFoundError if Parquet files can not be written."""
+    with OptionalDependencyImport("parquet"):
+        import pyarrow  # noqa: F401
+
+
+def full_data_path(directory: str, result_format: ResultFormat) -> str:
+    """Path of the table with the results of all jobs in the given directory."""
+    if result_format == ResultFormat.PARQUET:
+        return os.path.join(directory, constants.FULL_DF_PARQUET_DIR)
+    return os.path.join(directory, constants.FULL_DF_FILE)
+
+
+def reduced_data_path(directory: str, result_format: ResultFormat) -> str:
+    """Path of the table with the results averaged per setting."""
+    if result_format == ResultFormat.PARQUET:
+        return os.path.join(directory, constants.REDUCED_DF_PARQUET_FILE)
+    return os.path.join(directory, constants.REDUCED_DF_FILE)
+
+
+def find_full_data(directory: str) -> str:
+    """Get path of the full results in the given directory, whichever format is used.
+
+    Raises:
+        FileNotFoundError: if the directory does not contain results.
+    """
+    for result_format in (ResultFormat.PARQUET, ResultFormat.CSV):
+        path = full_data_path(directory, result_format)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No results found in {directory}")
+
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    """Write a DataFrame to a single file (the format is chosen by the extension).
+
+    Parquet files are replaced atomically, so readers never see a partially written
+    file.
+    """
+    if not path.endswith(".parquet"):
+        df.to_csv(path)
+        return
+
+    require_parquet_support()
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow")
+    os.replace(tmp_path, path)
+
+
+def n_parquet_rows(dataset_dir: str) -> int:
+    """Number of rows that were appended to the given Parquet directory."""
+    if not os.path.isdir(dataset_dir):
+        return 0
+    stops = [
+        int(match.group(2))
+        for match in map(_PART_FILE_PATTERN.match, os.listdir(dataset_dir))
+        if match
+    ]
+    return max(stops, default=0)
+
+
+def append_parquet_rows(dataset_dir: str, df: pd.DataFrame, start: int) -> None:
+    """Append rows to a Parquet directory.
+
+    The rows are written to a new file in the directory, named after the range of row
+    numbers it contains.  This way, :func:`n_parquet_rows` can tell which rows are
+    already saved (e.g. when a run is continued) without reading any of the files.
+
+    Args:
+        dataset_dir: The Parquet directory (created if it does not exist).
+        df: The rows to append.
+        start: Row number of the first row in ``df``.
+    """
+    if df.empty:
+        return
+    os.makedirs(dataset_dir, exist_ok=True)
+    stop = start + len(df)
+    write_table(df, os.path.join(dataset_dir, f"part-{start:010d}-{stop:010d}.parquet"))
+
+
+def write_full_data(
+    df: pd.DataFrame, directory: str, result_format: ResultFormat
+) -> None:
+    """Write the results of all jobs at once (replacing existing results)."""
+    path = full_data_path(directory, result_format)
+    if result_format == ResultFormat.PARQUET:
+        shutil.rmtree(path, ignore_errors=True)
+        append_parquet_rows(path, df.reset_index(drop=True), start=0)
+    else:
+        write_table(df, path)
+
+
+def read_table(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Read results written by this module.
+
+    Args:
+        path: Path of a CSV file, a Parquet file or a Parquet directory.
+        columns: If set, only these columns are read.  Columns that do not exist in
+            the file are ignored.
+
+    Returns:
+        The table.  For Parquet directories, rows are in the order in which they were
+        appended.
+    """
+    if os.path.isdir(path):
+        return _read_parquet_dir(path, columns)
+    if path.endswith(".parquet"):
+        return _read_parquet_file(path, columns)
+
+    if columns is None:
+        return pd.read_csv(path)
+    wanted = set(columns)
+    return pd.read_csv(path, usecols=lambda name: name in wanted)
+
+
+def _read_parquet_file(
+    path: str, columns: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    with OptionalDependencyImport("parquet"):
+        import pyarrow.parquet as pq
+
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [name for name in columns if name in available]
+    return pd.read_parquet(path, engine="pyarrow", columns=columns)
+
+
+def _read_parquet_dir(
+    dataset_dir: str, columns: Optional[Sequence[str]] = None
+) -> pd.DataFrame:
+    # parts may differ in their columns (e.g. metrics that were only reported by some
+    # jobs), so they are read one by one and missing values are filled by concat
+    part_files = sorted(
+        name for name in os.listdir(dataset_dir) if _PART_FILE_PATTERN.match(name)
+    )
+    parts = [
+        _read_parquet_file(os.path.join(dataset_dir, name), columns)
+        for name in part_files
+    ]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,268 @@
+"""Incremental storage of job results."""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Hashable, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from cluster_utils.base import constants
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class ColumnarTable:
+    """Append-only table that stores rows column-wise in plain lists.
+
+    Appending a row is O(number of columns).  Columns that are missing in a row are
+    filled with NaN, columns that are new are back-filled with NaN for previous rows.
+    """
+
+    def __init__(self) -> None:
+        self._columns: dict[str, list[Any]] = {}
+        self._n_rows = 0
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    @property
+    def column_names(self) -> list[str]:
+        return list(self._columns)
+
+    def append(self, row: Mapping[str, Any]) -> None:
+        for key, value in row.items():
+            column = self._columns.get(key)
+            if column is None:
+                column = [math.nan] * self._n_rows
+                self._columns[key] = column
+            column.append(value)
+
+        self._n_rows += 1
+        for column in self._columns.values():
+            if len(column) < self._n_rows:
+                column.append(math.nan)
+
+    def column(self, name: str) -> list[Any]:
+        """Get values of the given column (the returned list must not be modified)."""
+        return self._columns[name]
+
+    def to_df(
+        self, start: int = 0, stop: Optional[int] = None, sort_columns: bool = True
+    ) -> pd.DataFrame:
+        """Create a DataFrame with the content of the table.
+
+        Args:
+            start: First row to include.
+            stop: Row after the last one to include (None for all rows).
+            sort_columns: If true, columns are sorted by name, otherwise they are in the
+                order in which they were added.
+        """
+        stop = self._n_rows if stop is None else min(stop, self._n_rows)
+        names = sorted(self._columns) if sort_columns else list(self._columns)
+        return pd.DataFrame(
+            {name: self._columns[name][start:stop] for name in names},
+            index=pd.RangeIndex(start, stop),
+        )
+
+
+class _GroupStats:
+    """Running count, mean and variance of a metric (Welford's algorithm)."""
+
+    __slots__ = ("size", "count", "mean", "m2")
+
+    def __init__(self) -> None:
+        #: Number of results, including ones where the metric is NaN.
+        self.size = 0
+        #: Number of valid metric values.
+        self.count = 0
+        self.mean = math.nan
+        self.m2 = 0.0
+
+    def add(self, value: Any) -> None:
+        self.size += 1
+        if _is_missing(value):
+            return
+
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return
+
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        # sample standard deviation (like pandas)
+        if self.count < 2:
+            return math.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class ResultStore:
+    """Store results of an optimization and aggregate them per parameter setting.
+
+    Results are appended to a :class:`ColumnarTable`.  For each distinct setting of the
+    optimized parameters, mean, standard deviation and number of runs of the optimized
+    metric are updated incrementally.  The DataFrames :attr:`full_df` and
+    :attr:`minimal_df` are only created when accessed (and cached until new results are
+    added).
+    """
+
+    def __init__(self, metric: str, params: Sequence[str], minimize: bool) -> None:
+        self.metric = metric
+        self.minimize = minimize
+        self.params = list(params)
+        self._table = ColumnarTable()
+        self._groups: dict[tuple[Hashable, ...], _GroupStats] = {}
+        self._best_value: Optional[float] = None
+        self._full_df: Optional[pd.DataFrame] = None
+        self._minimal_df: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # do not pickle the cached DataFrames
+        state = self.__dict__.copy()
+        state["_full_df"] = None
+        state["_minimal_df"] = None
+        return state
+
+    @classmethod
+    def from_df(
+        cls, df: pd.DataFrame, metric: str, params: Sequence[str], minimize: bool
+    ) -> ResultStore:
+        """Create store from a DataFrame with results (e.g. an old ``full_df``)."""
+        store = cls(metric, params, minimize)
+        store.add_df(df.sort_index())
+        return store
+
+    @property
+    def n_groups(self) -> int:
+        """Number of distinct parameter settings."""
+        return len(self._groups)
+
+    def add_df(self, df: pd.DataFrame) -> None:
+        """Add all rows of the given DataFrame."""
+        self.add_rows(df.to_dict("records"))
+
+    def add_rows(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        for row in rows:
+            self._table.append(row)
+            self._update_aggregates(row)
+
+        self._full_df = None
+        self._minimal_df = None
+
+    def set_params(self, params: Sequence[str]) -> None:
+        """Change parameters by which results are grouped (recomputes aggregates)."""
+        params = list(params)
+        if params == self.params:
+            return
+
+        self.params = params
+        self._groups = {}
+        self._best_value = None
+        self._minimal_df = None
+        for i in range(len(self._table)):
+            self._update_aggregates(
+                {name: self._table.column(name)[i] for name in self._table.column_names}
+            )
+
+    def column(self, name: str) -> list[Any]:
+        """Get all values of a column in the order in which they were added."""
+        return self._table.column(name) if name in self._table.column_names else []
+
+    def rows_df(self, start: int = 0, stop: Optional[int] = None) -> pd.DataFrame:
+        """DataFrame with the results ``start:stop`` in the order they were added."""
+        return self._table.to_df(start, stop)
+
+    def best_value(self) -> Optional[float]:
+        """Best value of the metric over all results (None if there are none)."""
+        return self._best_value
+
+    def best_group_params(self, how_many: int) -> dict[str, list[Any]]:
+        """Get parameter values of the best settings (based on the mean metric).
+
+        Returns:
+            Dictionary mapping parameter names to lists of values, sorted from best to
+            worst setting.
+        """
+        keys = list(self._groups)
+        means = np.array([self._groups[key].mean for key in keys], dtype=float)
+        if not self.minimize:
+            means = -means
+
+        # only sort the required number of entries; NaN is sorted to the end
+        how_many = min(how_many, len(keys))
+        if how_many < len(keys):
+            candidates = np.argpartition(means, how_many - 1)[:how_many]
+        else:
+            candidates = np.arange(len(keys))
+        best = candidates[np.argsort(means[candidates], kind="stable")]
+
+        return {
+            param: [keys[i][j] for i in best] for j, param in enumerate(self.params)
+        }
+
+    @property
+    def full_df(self) -> pd.DataFrame:
+        """DataFrame with all results, sorted by the metric."""
+        if self._full_df is None:
+            if len(self._table) == 0:
+                self._full_df = pd.DataFrame()
+            else:
+                self._full_df = self._table.to_df().sort_values(
+                    [self.metric], ascending=self.minimize
+                )
+        return self._full_df
+
+    @property
+    def minimal_df(self) -> pd.DataFrame:
+        """DataFrame with mean and std of the metric per setting, sorted by the metric.
+
+        Corresponds to the output of :func:`~.data_analysis.average_out` applied to
+        :attr:`full_df`.
+        """
+        if self._minimal_df is None:
+            if not self._groups:
+                self._minimal_df = pd.DataFrame()
+            else:
+                keys = list(self._groups)
+                stats = [self._groups[key] for key in keys]
+                data: dict[str, list[Any]] = {
+                    param: [key[j] for key in keys]
+                    for j, param in enumerate(self.params)
+                }
+                data[self.metric] = [s.mean for s in stats]
+                data[constants.RESTART_PARAM_NAME] = [s.size for s in stats]
+                data[self.metric + constants.STD_ENDING] = [s.std for s in stats]
+                self._minimal_df = pd.DataFrame(data).sort_values(
+                    [self.metric], ascending=self.minimize
+                )
+        return self._minimal_df
+
+    def _update_aggregates(self, row: Mapping[str, Any]) -> None:
+        value = row.get(self.metric, math.nan)
+        if not _is_missing(value) and (
+            self._best_value is None
+            or (value < self._best_value if self.minimize else value > self._best_value)
+        ):
+            self._best_value = value
+
+        key = tuple(row.get(param, math.nan) for param in self.params)
+        # like pandas' groupby, ignore results where a parameter is missing
+        if any(_is_missing(v) for v in key):
+            return
+
+        stats = self._groups.get(key)
+        if stats is None:
+            stats = _GroupStats()
+            self._groups[key] = stats
+        stats.add(value)
@@ -0,0 +1,184 @@
+"""Append-only journal of the events of an optimization run."""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Iterable, Iterator, Mapping, NamedTuple, Optional
+
+from cluster_utils.base import constants
+
+
+class RunJournal:
+    """Append-only journal of an optimization run.
+
+    Records asks, submissions, status changes of jobs, results and finished iterations
+    as they happen.  Each record is a dictionary with an ``"event"`` key, which is
+    pickled and appended to the journal file.  The file is flushed after every record,
+    so persisting an event costs the same, independent of the length of the history.
+
+    Snapshots of the optimizer store the offset of the journal up to which they contain
+    the results (see :meth:`.Optimizer.save_snapshot`), so on resume only the records
+    after that offset have to be replayed.
+
+    Records may be added from several threads (e.g. status changes reported by the
+    communication server), so writing is protected by a lock.
+    """
+
+    SERVER = "server"
+    ASK = "ask"
+    SUBMITTED = "submitted"
+    STATUS = "status"
+    RESULTS = "results"
+    ITERATION = "iteration"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # an incomplete record at the end (e.g. if the process was killed while
+        # writing) is discarded, so that new records can be read again
+        valid_size = 0
+        for _, end in iter_journal(path):
+            valid_size = end
+        # the file stays open as long as the journal is used
+        self._file = open(path, "r+b" if os.path.exists(path) else "wb")  # noqa: SIM115
+        self._file.truncate(valid_size)
+        self._file.seek(valid_size)
+        self._lock = threading.Lock()
+
+    @property
+    def offset(self) -> int:
+        """Current size of the journal in bytes."""
+        with self._lock:
+            return self._file.tell()
+
+    def record(self, event: str, **data: Any) -> None:
+        """Append a record for the given event."""
+        record = {"event": event, "time": time.time(), **data}
+        payload = pickle.dumps(record)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(payload)
+            self._file.flush()
+
+    def record_server(self, connection_info: Mapping[str, Any]) -> None:
+        self.record(self.SERVER, connection_info=dict(connection_info))
+
+    def record_ask(
+        self, job_id: int, settings: Mapping[str, Any], iteration: int
+    ) -> None:
+        self.record(self.ASK, job_id=job_id, settings=settings, iteration=iteration)
+
+    def record_submitted(
+        self, job_id: int, cluster_id: str, run_script_path: Optional[str]
+    ) -> None:
+        self.record(
+            self.SUBMITTED,
+            job_id=job_id,
+            cluster_id=cluster_id,
+            run_script_path=run_script_path,
+        )
+
+    def record_status(self, job_id: int, status: int) -> None:
+        self.record(self.STATUS, job_id=job_id, status=status)
+
+    def record_results(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        self.record(self.RESULTS, rows=list(rows))
+
+    def record_iteration(self, iteration: int) -> None:
+        self.record(self.ITERATION, iteration=iteration)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def iter_journal(path: str, offset: int = 0) -> Iterator[tuple[dict[str, Any], int]]:
+    """Iterate over the records of a journal, starting at the given offset.
+
+    Yields:
+        Tuples of the record and the offset directly after it.  Reading stops at an
+        incomplete record at the end of the file.
+    """
+    logger = logging.getLogger("cluster_utils")
+    if not os.path.exists(path):
+        return
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            try:
+                record = pickle.load(f)
+            except EOFError:
+                return
+            except (pickle.UnpicklingError, ValueError) as e:
+                logger.warning(
+                    "Ignoring incomplete record at offset %d of %s: %s", offset, path, e
+                )
+                return
+            offset = f.tell()
+            yield record, offset
+
+
+def read_journal(path: str, offset: Optional[int] = 0) -> list[dict[str, Any]]:
+    """Read all (complete) records of a journal after the given offset."""
+    return [record for record, _ in iter_journal(path, offset or 0)]
+
+
+class JournaledJob(NamedTuple):
+    """Last known state of a job according to the run journal."""
+
+    job_id: int
+    settings: Mapping[str, Any]
+    iteration: int
+    #: Id of the last submission (None if the job was never submitted).
+    cluster_id: Optional[str]
+    #: Run script of the last submission (its output files are next to it).
+    run_script_path: Optional[str]
+    #: Last recorded status (None if no status change was recorded).
+    status: Optional[int]
+    #: Whether results of the job were recorded.
+    has_results: bool
+
+
+def collect_jobs(records: Iterable[Mapping[str, Any]]) -> dict[int, JournaledJob]:
+    """Get the last known state of all jobs that were asked for in the journal."""
+    jobs: dict[int, dict[str, Any]] = {}
+    for record in records:
+        event = record["event"]
+        if event == RunJournal.ASK:
+            jobs[record["job_id"]] = {
+                "job_id": record["job_id"],
+                "settings": record["settings"],
+                "iteration": record["iteration"],
+                "cluster_id": None,
+                "run_script_path": None,
+                "status": None,
+                "has_results": False,
+            }
+        elif event == RunJournal.SUBMITTED and record["job_id"] in jobs:
+            jobs[record["job_id"]]["cluster_id"] = record["cluster_id"]
+            jobs[record["job_id"]]["run_script_path"] = record["run_script_path"]
+        elif event == RunJournal.STATUS and record["job_id"] in jobs:
+            jobs[record["job_id"]]["status"] = record["status"]
+        elif event == RunJournal.RESULTS:
+            for row in record["rows"]:
+                job = jobs.get(row.get(constants.ID))
+                if job is not None:
+                    job["has_results"] = True
+
+    return {job_id: JournaledJob(**job) for job_id, job in jobs.items()}
+
+
+def last_connection_info(
+    records: Iterable[Mapping[str, Any]],
+) -> Optional[dict[str, Any]]:
+    """Get the connection info of the server that wrote the journal most recently."""
+    connection_info = None
+    for record in records:
+        if record["event"] == RunJournal.SERVER:
+            connection_info = record["connection_info"]
+    return connection_info
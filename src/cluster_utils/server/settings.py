@@ -11,7 +11,13 @@ import smart_settings
 
 from cluster_utils.base.settings import add_cmd_line_params, check_reserved_params
 
-from .optimizers import GridSearchOptimizer, Metaoptimizer, NGOptimizer
+from .optimizers import (
+    GridSearchOptimizer,
+    HyperbandOptimizer,
+    Metaoptimizer,
+    NGOptimizer,
+    TPEOptimizer,
+)
 from .utils import (
     check_import_in_fixed_params,
     rename_import_promise,
@@ -208,5 +214,7 @@ def read_main_script_params_with_smart_settings(
 optimizer_dict = {
     "cem_metaoptimizer": Metaoptimizer,
     "nevergrad": NGOptimizer,
+    "hyperband": HyperbandOptimizer,
+    "tpe": TPEOptimizer,
     "gridsearch": GridSearchOptimizer,
 }
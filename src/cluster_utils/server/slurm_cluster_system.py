@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
+import getpass
 import logging
 import pathlib
 import subprocess
 import time
 from collections import deque
 from subprocess import PIPE, run
-from typing import Any, NamedTuple, Optional, Sequence
+from typing import Any, Iterable, NamedTuple, Optional, Sequence
 
 from cluster_utils.base.constants import RETURN_CODE_FOR_RESUME
 from cluster_utils.base.settings import SettingsError
@@ -44,6 +45,27 @@ fi
     "RETURN_CODE_FOR_RESUME": RETURN_CODE_FOR_RESUME
 }
 
+# Array job that runs the regular run scripts of several jobs.  Output of each task is
+# redirected to the output files of the corresponding job, so that they look the same
+# as for jobs that are submitted individually.
+_SLURM_ARRAY_SCRIPT_TEMPLATE = """#!/bin/bash
+{sbatch_arg_lines}
+
+# Submission IDs {ids}
+
+case "${{SLURM_ARRAY_TASK_ID}}" in
+{cases}
+*)
+    echo "Unexpected array task id ${{SLURM_ARRAY_TASK_ID}}" >&2
+    exit 1
+    ;;
+esac
+"""
+
+_SLURM_ARRAY_SCRIPT_CASE_TEMPLATE = """{task_id})
+    exec bash "{run_script}" >> "{stdout_file}" 2>> "{stderr_file}"
+    ;;"""
+
 
 # Possible job State values (according to `man sacct`)
 #
@@ -96,6 +118,25 @@ SLURM_JOB_STATE_IS_GOOD = {
     "TIMEOUT": False,
 }
 
+# States in which a job is still in the queue (i.e. not finished yet).  Apart from the
+# ones listed above, squeue may also report some additional intermediate states.
+SLURM_ACTIVE_JOB_STATES = {
+    "CONFIGURING",
+    "COMPLETING",
+    "PENDING",
+    "REQUEUED",
+    "REQUEUE_FED",
+    "REQUEUE_HOLD",
+    "RESIZING",
+    "RESV_DEL_HOLD",
+    "RUNNING",
+    "SIGNALING",
+    "SPECIAL_EXIT",
+    "STAGE_OUT",
+    "STOPPED",
+    "SUSPENDED",
+}
+
 
 class SlurmJobRequirements(NamedTuple):
     # names here correspond to options of sbatch
@@ -185,6 +226,11 @@ class SlurmJobStatus(NamedTuple):
             and SLURM_JOB_STATE_IS_GOOD[self.state]
         )
 
+    def is_terminal(self) -> bool:
+        """Check if the job is finished (i.e. its state will not change anymore)."""
+        # sacct reports cancelled jobs as "CANCELLED by {uid}"
+        return self.state.split(" ", 1)[0] not in SLURM_ACTIVE_JOB_STATES
+
 
 class SBatchArgumentBuilder:
     """Construct an sbatch argument comment block.
@@ -240,6 +286,62 @@ def extract_job_id_from_sbatch_output(sbatch_output: str) -> ClusterJobId:
     )
 
 
+def array_task_cluster_id(array_job_id: ClusterJobId, task_id: int) -> ClusterJobId:
+    """Get the cluster id of a single task of an array job.
+
+    The returned id can be used like the id of a regular job with ``scancel`` and
+    ``sacct``.
+    """
+    return ClusterJobId(f"{array_job_id}_{task_id}")
+
+
+def expand_array_job_id(job_id: str) -> list[ClusterJobId]:
+    """Expand the id of an array job with a range of tasks to ids of the single tasks.
+
+    sacct and squeue report tasks of array jobs that did not start yet in a compact
+    form like ``1234_[0-3,7%2]`` (where ``%2`` is the limit of simultaneously running
+    tasks).  Ids without task range are returned unchanged.
+    """
+    base, sep, task_ranges = job_id.partition("_[")
+    if not sep:
+        return [ClusterJobId(job_id)]
+
+    task_ranges = task_ranges.rstrip("]").partition("%")[0]
+    ids = []
+    for task_range in task_ranges.split(","):
+        first, _, last = task_range.partition("-")
+        ids.extend(
+            array_task_cluster_id(ClusterJobId(base), i)
+            for i in range(int(first), int(last or first) + 1)
+        )
+    return ids
+
+
+def extract_job_status_from_squeue_output(
+    squeue_output: str,
+) -> dict[ClusterJobId, SlurmJobStatus]:
+    """Extract status of jobs from given squeue output.
+
+    This function expects that squeue was run with the following arguments:
+
+        --noheader --array --format=%i|%N|%T
+    """
+    result: dict[ClusterJobId, SlurmJobStatus] = {}
+
+    # Output looks like this: JobID|NodeList|State
+    #
+    #    239026|galvani-cn001|RUNNING
+    #    239030_5||PENDING
+    for line in squeue_output.splitlines():
+        job_id, node_list, state = line.split("|")
+        # exit code is not known while the job is in the queue
+        status = SlurmJobStatus(state=state, exit_code=0, node_list=node_list)
+        for task_id in expand_array_job_id(job_id):
+            result[task_id] = status
+
+    return result
+
+
 def extract_job_status_from_sacct_output(
     sacct_output: str,
 ) -> dict[ClusterJobId, SlurmJobStatus]:
@@ -274,21 +376,143 @@ def extract_job_status_from_sacct_output(
         exit_code = exit_code.partition(":")[0]
         assert exit_code.isdigit()
 
-        result[ClusterJobId(job_id)] = SlurmJobStatus(
+        status = SlurmJobStatus(
             state=state,
             exit_code=int(exit_code),
             node_list=node_list,
         )
+        for task_id in expand_array_job_id(job_id):
+            result[task_id] = status
 
     return result
 
 
+class SlurmStatusTracker:
+    """Keep track of the status of Slurm jobs.
+
+    Statuses of finished jobs are cached, so only jobs that are still in flight are
+    queried.  For those, a single ``squeue`` call is used to find out which are still
+    in the queue.  Only for jobs that left the queue, the accounting database is queried
+    with ``sacct`` (in chunks of at most :attr:`SACCT_MAX_JOBS_PER_CALL` jobs).
+    """
+
+    #: Maximum number of job ids that are passed to a single call of sacct.
+    SACCT_MAX_JOBS_PER_CALL = 500
+
+    def __init__(self) -> None:
+        self._finished: dict[ClusterJobId, SlurmJobStatus] = {}
+        #: Number of jobs that were not finished at the last update.
+        self.n_in_flight = 0
+
+    def update(
+        self, cluster_ids: Iterable[ClusterJobId]
+    ) -> dict[ClusterJobId, SlurmJobStatus]:
+        """Get the current status of the given jobs.
+
+        Jobs for which no status could be determined (e.g. because they are not yet
+        known to sacct) are not included in the result.
+        """
+        result = {}
+        unfinished = []
+        for cluster_id in cluster_ids:
+            if cluster_id in self._finished:
+                result[cluster_id] = self._finished[cluster_id]
+            else:
+                unfinished.append(cluster_id)
+
+        if unfinished:
+            in_queue = self._query_squeue()
+            not_in_queue = []
+            for cluster_id in unfinished:
+                if cluster_id in in_queue:
+                    result[cluster_id] = in_queue[cluster_id]
+                else:
+                    not_in_queue.append(cluster_id)
+
+            for i in range(0, len(not_in_queue), self.SACCT_MAX_JOBS_PER_CALL):
+                chunk = not_in_queue[i : i + self.SACCT_MAX_JOBS_PER_CALL]
+                statuses = self._query_sacct(chunk)
+                result.update(
+                    (cluster_id, statuses[cluster_id])
+                    for cluster_id in chunk
+                    if cluster_id in statuses
+                )
+
+        self.n_in_flight = 0
+        for cluster_id in unfinished:
+            status = result.get(cluster_id)
+            if status is not None and status.is_terminal():
+                self._finished[cluster_id] = status
+            else:
+                self.n_in_flight += 1
+
+        return result
+
+    def forget(self, cluster_id: ClusterJobId) -> None:
+        """Drop the cached status of a job that is not queried anymore."""
+        self._finished.pop(cluster_id, None)
+
+    def _query_squeue(self) -> dict[ClusterJobId, SlurmJobStatus]:
+        logger = logging.getLogger("cluster_utils")
+        # Query all jobs of the user instead of passing the job ids.  This keeps the
+        # command short and squeue does not fail for ids of jobs that already left the
+        # queue.
+        squeue_cmd = [
+            "squeue",
+            "--noheader",
+            "--array",
+            "--user",
+            getpass.getuser(),
+            "--format=%i|%N|%T",
+        ]
+        logger.debug("Execute command %s", squeue_cmd)
+        proc = run(squeue_cmd, stdout=PIPE, stderr=PIPE)
+        if proc.returncode != 0:
+            logger.warning(
+                "squeue failed, falling back to sacct for all jobs.  Error: %s",
+                proc.stderr.decode(),
+            )
+            return {}
+
+        output = proc.stdout.decode()
+        logger.debug("Output of squeue:\n%s", output)
+        return extract_job_status_from_squeue_output(output)
+
+    def _query_sacct(
+        self, cluster_ids: Sequence[ClusterJobId]
+    ) -> dict[ClusterJobId, SlurmJobStatus]:
+        logger = logging.getLogger("cluster_utils")
+        sacct_cmd = [
+            "sacct",
+            "--jobs",
+            ",".join(cluster_ids),
+            "-X",
+            "--parsable2",  # fields are separated by `|`
+            "--format=JobID,NodeList,State,ExitCode",
+            "--noheader",
+        ]
+
+        logger.debug("Execute command %s", sacct_cmd)
+        proc = run(sacct_cmd, check=True, stdout=PIPE)
+
+        output = proc.stdout.decode()
+        logger.debug("Output of sacct:\n%s", output)
+        return extract_job_status_from_sacct_output(output)
+
+
 class SlurmClusterSubmission(ClusterSubmission):
     """Interface to submit jobs on a Slurm cluster."""
 
-    #: Minimum duration between checks for failing jobs (to avoid polling the system too
-    #: much)
-    CHECK_FOR_FAILURES_INTERVAL_SEC = 60
+    #: Range of the duration between checks for failing jobs (to avoid polling the
+    #: system too much).  The actual interval grows with the number of jobs that are
+    #: in flight by :attr:`CHECK_FOR_FAILURES_INTERVAL_SEC_PER_JOB`.
+    MIN_CHECK_FOR_FAILURES_INTERVAL_SEC = 10
+    MAX_CHECK_FOR_FAILURES_INTERVAL_SEC = 120
+    CHECK_FOR_FAILURES_INTERVAL_SEC_PER_JOB = 0.1
+
+    #: Jobs are submitted together as one array job.  The default MaxArraySize of Slurm
+    #: is 1001, so stay below that.
+    MAX_SUBMISSION_BATCH_SIZE = 1000
 
     def __init__(
         self,
@@ -302,6 +526,7 @@ class SlurmClusterSubmission(ClusterSubmission):
 
         #: Time stamp of the last time checking for errors
         self._last_time_checking_for_failures = 0.0
+        self.status_tracker = SlurmStatusTracker()
 
     def _generate_run_script(self, job: Job):
         """Generate a sbatch run script for the given job and return the path to it.
@@ -319,8 +544,84 @@ class SlurmClusterSubmission(ClusterSubmission):
         stdout_file = run_script_file_path.with_suffix(".out")
         stderr_file = run_script_file_path.with_suffix(".err")
 
+        args = self._sbatch_arguments(
+            job_name=f"{job.opt_procedure_name}_{job.id}",
+            stdout_file=stdout_file,
+            stderr_file=stderr_file,
+        )
+
+        template_vars = {
+            "id": job.id,
+            "cmd": cmd,
+            "run_script_file_path": run_script_file_path,
+            "sbatch_arg_lines": args.construct_argument_comment_block(),
+        }
+
+        logger.debug("Write run script to %s", run_script_file_path)
+        run_script_file_path.write_text(
+            _SLURM_RUN_SCRIPT_TEMPLATE.format(**template_vars)
+        )
+        run_script_file_path.chmod(0o755)  # Make executable
+
+        job.run_script_path = str(run_script_file_path)
+
+    def _generate_array_script(self, jobs: Sequence[Job]) -> pathlib.Path:
+        """Generate a sbatch script that runs the given jobs as one array job.
+
+        Task ``i`` of the array executes the run script of ``jobs[i]``, so the run
+        scripts of all jobs need to exist already.
+
+        Returns:
+            Path to the generated script.
+        """
+        logger = logging.getLogger("cluster_utils")
+
+        first_job, last_job = jobs[0], jobs[-1]
+        script_name = "array_{}_{}_{}.sh".format(
+            first_job.iteration, first_job.id, last_job.id
+        )
+        script_path = pathlib.Path(self.submission_dir) / script_name
+
+        # output of the tasks themselves is redirected to the files of the jobs, so
+        # only errors of the dispatching logic would end up here
+        args = self._sbatch_arguments(
+            job_name=f"{first_job.opt_procedure_name}_{first_job.id}-{last_job.id}",
+            stdout_file=script_path.with_suffix(".%a.out"),
+            stderr_file=script_path.with_suffix(".%a.err"),
+        )
+        args.add("array", f"0-{len(jobs) - 1}")
+
+        cases = []
+        for task_id, job in enumerate(jobs):
+            assert job.run_script_path is not None
+            run_script = pathlib.Path(job.run_script_path)
+            cases.append(
+                _SLURM_ARRAY_SCRIPT_CASE_TEMPLATE.format(
+                    task_id=task_id,
+                    run_script=run_script,
+                    stdout_file=run_script.with_suffix(".out"),
+                    stderr_file=run_script.with_suffix(".err"),
+                )
+            )
+
+        logger.debug("Write array job script to %s", script_path)
+        script_path.write_text(
+            _SLURM_ARRAY_SCRIPT_TEMPLATE.format(
+                sbatch_arg_lines=args.construct_argument_comment_block(),
+                ids=", ".join(str(job.id) for job in jobs),
+                cases="\n".join(cases),
+            )
+        )
+        script_path.chmod(0o755)  # Make executable
+
+        return script_path
+
+    def _sbatch_arguments(
+        self, job_name: str, stdout_file: pathlib.Path, stderr_file: pathlib.Path
+    ) -> SBatchArgumentBuilder:
+        """Construct the sbatch arguments based on the job requirements."""
         args = SBatchArgumentBuilder()
-        args.add("job-name", f"{job.opt_procedure_name}_{job.id}")
+        args.add("job-name", job_name)
         args.add("output", stdout_file)
         args.add("error", stderr_file)
         args.add("partition", self.requirements.partition)
@@ -339,33 +640,49 @@ class SlurmClusterSubmission(ClusterSubmission):
 
         args.extend_raw(self.requirements.extra_submission_options)
 
-        template_vars = {
-            "id": job.id,
-            "cmd": cmd,
-            "run_script_file_path": run_script_file_path,
-            "sbatch_arg_lines": args.construct_argument_comment_block(),
-        }
-
-        logger.debug("Write run script to %s", run_script_file_path)
-        run_script_file_path.write_text(
-            _SLURM_RUN_SCRIPT_TEMPLATE.format(**template_vars)
-        )
-        run_script_file_path.chmod(0o755)  # Make executable
-
-        job.run_script_path = str(run_script_file_path)
+        return args
 
     def submit_fn(self, job: Job) -> ClusterJobId:
-        logger = logging.getLogger("cluster_utils")
-
         # only generate run script for jobs that are submitted the first time
         if not job.waiting_for_resume:
             self._generate_run_script(job)
 
         assert job.run_script_path is not None
 
+        return self._sbatch(job.run_script_path, f"id {job.id}")
+
+    def submit_many_fn(self, jobs: Sequence[Job]) -> list[ClusterJobId]:
+        if len(jobs) == 1:
+            return [self.submit_fn(jobs[0])]
+
+        for job in jobs:
+            # only generate run script for jobs that are submitted the first time
+            if not job.waiting_for_resume:
+                self._generate_run_script(job)
+
+        array_script_path = self._generate_array_script(jobs)
+        array_job_id = self._sbatch(
+            str(array_script_path),
+            "ids {}-{}".format(jobs[0].id, jobs[-1].id),
+        )
+
+        return [array_task_cluster_id(array_job_id, i) for i in range(len(jobs))]
+
+    def _sbatch(self, script_path: str, description: str) -> ClusterJobId:
+        """Submit the given script with sbatch and return the cluster job id.
+
+        Args:
+            script_path: Path to the sbatch script.
+            description: Description of the submitted job(s) for log messages.
+
+        Raises:
+            SubmissionError: if submission fails repeatedly or no job id is returned.
+        """
+        logger = logging.getLogger("cluster_utils")
+
         # use open-mode=append so that output of jobs that are restarted (via
         # exit_for_resume) does not overwrite the output of previous runs
-        sbatch_cmd = ["sbatch", "--open-mode=append", job.run_script_path]
+        sbatch_cmd = ["sbatch", "--open-mode=append", script_path]
         logger.debug("Execute command %s", sbatch_cmd)
 
         # TODO This timeout/retry-loop is copied from the Condor implementation.  Does
@@ -382,11 +699,11 @@ class SlurmClusterSubmission(ClusterSubmission):
                 sbatch_stdout = result.stdout.decode("utf-8")
                 break
             except subprocess.TimeoutExpired:
-                logger.warning("Job submission for id %d hangs. Retrying...", job.id)
+                logger.warning("Job submission for %s hangs. Retrying...", description)
             except subprocess.CalledProcessError as e:
                 logger.warning(
-                    "Job submission for id %d failed with exit code %d. Retrying...",
-                    job.id,
+                    "Job submission for %s failed with exit code %d. Retrying...",
+                    description,
                     e.returncode,
                 )
         else:  # executed if loop finishes without break
@@ -401,8 +718,8 @@ class SlurmClusterSubmission(ClusterSubmission):
 
         if not sbatch_stdout:
             msg = (
-                f"[Job #{job.id}] sbatch returned without error but did not print a"
-                " cluster job id."
+                f"[Job {description}] sbatch returned without error but did not print"
+                " a cluster job id."
             )
             logger.fatal(msg)
             self.close()
@@ -431,9 +748,40 @@ class SlurmClusterSubmission(ClusterSubmission):
         cmd = ["scancel", cluster_id]
         run(cmd, stderr=PIPE, stdout=PIPE)
 
+    def _on_job_retired(self, job: Job) -> None:
+        if job.cluster_id is not None:
+            self.status_tracker.forget(job.cluster_id)
+
+    def query_active_jobs(
+        self, cluster_ids: Sequence[ClusterJobId]
+    ) -> set[ClusterJobId]:
+        statuses = self.status_tracker.update(cluster_ids)
+        return {
+            cluster_id
+            for cluster_id in cluster_ids
+            if cluster_id in statuses and not statuses[cluster_id].is_terminal()
+        }
+
     def is_ready_to_check_for_failed_jobs(self) -> bool:
+        return self.seconds_until_next_check_for_failed_jobs() <= 0
+
+    def seconds_until_next_check_for_failed_jobs(self) -> float:
         time_since_last_check = time.time() - self._last_time_checking_for_failures
-        return time_since_last_check >= self.CHECK_FOR_FAILURES_INTERVAL_SEC
+        return self.check_for_failures_interval - time_since_last_check
+
+    @property
+    def check_for_failures_interval(self) -> float:
+        """Duration between checks for failing jobs.
+
+        Grows with the number of jobs that are in flight, as querying their status gets
+        more expensive and a few seconds of delay matter less.
+        """
+        return min(
+            self.MIN_CHECK_FOR_FAILURES_INTERVAL_SEC
+            + self.status_tracker.n_in_flight
+            * self.CHECK_FOR_FAILURES_INTERVAL_SEC_PER_JOB,
+            self.MAX_CHECK_FOR_FAILURES_INTERVAL_SEC,
+        )
 
     def mark_failed_jobs(self, jobs: Sequence[Job]) -> None:
         logger = logging.getLogger("cluster_utils")
@@ -444,27 +792,10 @@ class SlurmClusterSubmission(ClusterSubmission):
         # construct lookup table to map cluster id to job
         job_map = {job.cluster_id: job for job in jobs if job.cluster_id}
 
-        job_id_list = ",".join(job_map.keys())
-        sacct_cmd = [
-            "sacct",
-            "--jobs",
-            job_id_list,
-            "-X",
-            "--parsable2",  # fields are separated by `|`
-            "--format=JobID,NodeList,State,ExitCode",
-            "--noheader",
-        ]
-
-        logger.debug("Execute command %s", sacct_cmd)
-        proc = run(sacct_cmd, check=True, stdout=PIPE)
-
-        output = proc.stdout.decode()
-        logger.debug("Output of sacct:\n%s", output)
-
-        job_statuses = extract_job_status_from_sacct_output(output)
+        job_statuses = self.status_tracker.update(job_map.keys())
 
         for job_id, status in job_statuses.items():
-            if job_id in job_map and not status.is_okay():
+            if status.is_terminal() and not status.is_okay():
                 job = job_map[ClusterJobId(job_id)]
                 assert job.run_script_path is not None
 
@@ -9,6 +9,8 @@ from .utils import log_and_print, make_red
 
 class InteractiveMode:
     def __init__(self, cluster_interface, comm_server):
+        #: Files on which input is expected (can be used to wait for input).
+        self.input_files = [sys.stdin]
         self.cluster_interface = cluster_interface
         self.comm_server = comm_server
         self.input_to_fn_dict = {
@@ -50,7 +52,8 @@ class InteractiveMode:
             self.print("Enter ID")
             job_id = int(input())
             job = self.cluster_interface.get_job(job_id)
-            [self.print(attr, ": ", job.__dict__[attr]) for attr in job.__dict__]
+            for attr, value in job.as_dict().items():
+                self.print(attr, ": ", value)
         except Exception:
             self.print("Error encountered, maybe invalid ID?")
 
@@ -59,10 +62,11 @@ class InteractiveMode:
             self.print(
                 make_red("Are you sure you want to stop all remaining jobs? [y/N]")
             )
+            successful_ids = {job.id for job in self.cluster_interface.successful_jobs}
             jobs_to_cancel = [
                 job.id
                 for job in self.cluster_interface.jobs
-                if job not in self.cluster_interface.successful_jobs
+                if job.id not in successful_ids
             ]
             self.print(jobs_to_cancel)
             answer = input()
@@ -107,7 +111,7 @@ class InteractiveMode:
 
 class NonInteractiveMode:
     def __init__(self, *args, **kwargs):
-        pass
+        self.input_files = []
 
     def __enter__(self):
         return lambda: None
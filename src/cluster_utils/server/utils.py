@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import collections
+import contextlib
 import datetime
 import enum
 import itertools
@@ -11,12 +12,14 @@ import pathlib
 import pickle
 import random
 import re
+import select
 import shutil
 import signal
+import socket
 from collections import defaultdict
 from pathlib import Path
 from time import sleep
-from typing import Any
+from typing import Any, Sequence
 
 import colorama
 
@@ -76,6 +79,48 @@ class SignalWatcher:
         return self.signal in SignalWatcher.received_signals
 
 
+class EventNotifier:
+    """Wake up a thread that waits for events happening in other threads.
+
+    A socket pair is used as "self-pipe", so waiting for a notification can be combined
+    with waiting for input on other file objects (e.g. stdin) in a single ``select``
+    call.  Notifications are not lost if they are sent while nobody is waiting; the next
+    call of :meth:`wait` will return immediately in that case.
+    """
+
+    def __init__(self) -> None:
+        self._receiver, self._sender = socket.socketpair()
+        self._receiver.setblocking(False)
+        self._sender.setblocking(False)
+
+    def notify(self) -> None:
+        """Wake up the waiting thread.  Can be called from any thread."""
+        # if the buffer is full, there are enough pending notifications already
+        with contextlib.suppress(OSError):
+            self._sender.send(b"\0")
+
+    def wait(self, timeout: float, other_files: Sequence[Any] = ()) -> bool:
+        """Wait until notified, one of ``other_files`` is readable or timeout expired.
+
+        Args:
+            timeout: Maximum time to wait in seconds.
+            other_files: Additional file objects to wait for (anything accepted by
+                ``select.select``).
+
+        Returns:
+            True if a notification was received.  Pending notifications are cleared.
+        """
+        readable, _, _ = select.select(
+            [self._receiver, *other_files], [], [], max(timeout, 0.0)
+        )
+        notified = self._receiver in readable
+        if notified:
+            with contextlib.suppress(BlockingIOError):
+                while self._receiver.recv(4096):
+                    pass
+        return notified
+
+
 def shorten_string(string, max_len):
     if len(string) > max_len - 3:
         return "..." + string[-max_len + 3 :]
@@ -257,14 +302,14 @@ def nested_to_dict(nested_items):
 
 
 def distribution_list_sampler(distribution_list, num_samples):
-    for distr in distribution_list:
-        distr.prepare_samples(howmany=num_samples)
-    for _ in range(num_samples):
-        nested_items = [
-            (distr.param_name.split(constants.OBJECT_SEPARATOR), distr.sample())
-            for distr in distribution_list
-        ]
-        yield nested_to_dict(nested_items)
+    # draw the samples of each distribution in one batch
+    keys = [
+        distr.param_name.split(constants.OBJECT_SEPARATOR)
+        for distr in distribution_list
+    ]
+    samples = [distr.sample_batch(num_samples) for distr in distribution_list]
+    for values in zip(*samples):
+        yield nested_to_dict(list(zip(keys, values)))
 
 
 home = str(Path.home())
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture()
+def paths(tmp_path):
+    return {
+        "main_path": str(tmp_path / "main_path"),
+        "script_to_run": "foobar.py",
+        "jobs_dir": str(tmp_path / "jobs_dir"),
+        "result_dir": str(tmp_path / "result_dir"),
+        "current_result_dir": str(tmp_path / "current_result_dir"),
+    }
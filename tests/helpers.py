@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import cluster_utils.server.cluster_system as cs
+from cluster_utils.server.job import Job
+
+
+class FakeClusterSubmission(cs.ClusterSubmission):
+    """Minimal ClusterSubmission that does not actually run anything."""
+
+    def __init__(self, paths):
+        super().__init__(paths, remove_jobs_dir=False)
+        self.next_cluster_id = 0
+
+    def submit_fn(self, job):
+        self.next_cluster_id += 1
+        return cs.ClusterJobId(str(self.next_cluster_id))
+
+    def stop_fn(self, cluster_id):
+        pass
+
+    def is_ready_to_check_for_failed_jobs(self):
+        return True
+
+    def mark_failed_jobs(self, jobs):
+        pass
+
+
+def make_job(job_id: int, paths) -> Job:
+    return Job(
+        id=job_id,
+        settings={"x": job_id},
+        other_params={},
+        paths=paths,
+        iteration=0,
+        connection_info={"ip": "127.0.0.1", "port": 12345},
+        opt_procedure_name="unittest",
+        singularity_settings=None,
+    )
+
+
+class FakeJob:
+    """Finished job with the given result row, as needed by ``Optimizer.tell()``.
+
+    Args:
+        row: Flattened parameters and metrics of the job (see
+            :meth:`.Job.get_result_row`).  None if the job has no results.
+        job_id: ID of the job.
+    """
+
+    def __init__(self, row: Optional[dict[str, Any]], job_id: Optional[int] = None):
+        self.id = job_id
+        self.row = row
+        self.results_used_for_update = False
+
+    def get_result_row(self):
+        return None if self.row is None else (self.row, None, None)
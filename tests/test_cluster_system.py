@@ -1,4 +1,50 @@
+from __future__ import annotations
+
+import concurrent.futures
+import threading
+
+import pytest
+
 import cluster_utils.server.cluster_system as cs
+from cluster_utils.server.job import Job, JobStatus
+
+from .helpers import FakeClusterSubmission, make_job
+
+
+def set_results(job: Job, paths) -> None:
+    job.final_settings = job.generate_final_setting(paths)
+    job.metrics = {"result": float(job.id)}
+    job.set_results()
+
+
+def test_job_result_row(paths):
+    job = make_job(3, paths)
+    assert job.get_result_row() is None
+    assert job.get_results() is None
+
+    set_results(job, paths)
+    row, params, metrics = job.get_result_row()
+    assert row["x"] == 3
+    assert row["_id"] == 3
+    assert row["result"] == 3.0
+    assert "x" in params
+    assert metrics == ("result",)
+
+    df, _, _ = job.get_results()
+    assert df.to_dict("records") == [row]
+
+
+def test_job_as_dict(paths):
+    job = make_job(3, paths)
+    assert not hasattr(job, "__dict__")
+
+    attributes = job.as_dict()
+    assert attributes["id"] == 3
+    assert attributes["opt_procedure_name"] == "unittest"
+    assert attributes["final_settings"] is None
+    assert attributes["status"] == JobStatus.INITIAL_STATUS
+    assert "_status" not in attributes
+    assert "status_listener" not in attributes
 
 
 def test_is_command_available():
@@ -6,3 +52,212 @@ def test_is_command_available():
     assert cs.is_command_available("ls")
 
     assert not cs.is_command_available("obscure_command_that_does_not_exist")
+
+
+def test_job_registry_tracks_status_changes(paths):
+    cluster = FakeClusterSubmission(paths)
+    jobs = [make_job(i, paths) for i in range(6)]
+    cluster.add_jobs(jobs)
+
+    assert cluster.n_total_jobs == 6
+    assert cluster.n_idle_jobs == 6
+    assert cluster.get_job(3) is jobs[3]
+    assert cluster.get_job(42) is None
+
+    for _ in range(4):
+        cluster.submit_next()
+    assert cluster.n_submitted_jobs == 4
+    assert cluster.n_idle_jobs == 6
+
+    jobs[0].status = JobStatus.RUNNING
+    jobs[1].status = JobStatus.RUNNING
+    assert cluster.n_running_jobs == 2
+    assert cluster.running_jobs == [jobs[0], jobs[1]]
+    assert cluster.n_idle_jobs == 4
+
+    # successful job: results are set before it is concluded
+    set_results(jobs[0], paths)
+    jobs[0].status = JobStatus.CONCLUDED
+    # job that concluded without results
+    jobs[1].status = JobStatus.CONCLUDED
+    jobs[2].mark_failed("error")
+
+    assert cluster.n_running_jobs == 0
+    assert cluster.n_completed_jobs == 3
+    assert cluster.successful_jobs == [jobs[0]]
+    assert cluster.n_successful_jobs == 1
+    assert set(cluster.failed_jobs) == {jobs[1], jobs[2]}
+    assert cluster.n_failed_jobs == 2
+
+    # results arriving after the job was concluded make it successful
+    set_results(jobs[1], paths)
+    assert cluster.n_successful_jobs == 2
+    assert cluster.n_failed_jobs == 1
+
+
+def test_pop_untold_jobs(paths):
+    cluster = FakeClusterSubmission(paths)
+    jobs = [make_job(i, paths) for i in range(4)]
+    cluster.add_jobs(jobs)
+    assert cluster.pop_untold_jobs() == []
+
+    set_results(jobs[0], paths)
+    jobs[0].status = JobStatus.CONCLUDED
+    jobs[1].status = JobStatus.CONCLUDED
+    jobs[2].mark_failed("error")
+    assert cluster.pop_untold_jobs() == [jobs[0]]
+    # jobs are only returned once
+    assert cluster.pop_untold_jobs() == []
+
+    # results arriving after the job was concluded
+    set_results(jobs[1], paths)
+    # results that were already used (e.g. before a run was continued)
+    jobs[3].results_used_for_update = True
+    set_results(jobs[3], paths)
+    jobs[3].status = JobStatus.CONCLUDED
+    assert cluster.pop_untold_jobs() == [jobs[1]]
+
+
+def test_job_registry_rejects_duplicate_ids(paths):
+    cluster = FakeClusterSubmission(paths)
+    job = make_job(1, paths)
+    cluster.add_jobs(job)
+    # adding the same job again is a no-op
+    cluster.add_jobs(job, enqueue=False)
+    assert cluster.n_total_jobs == 1
+
+    with pytest.raises(ValueError, match="already registered"):
+        cluster.add_jobs(make_job(1, paths))
+
+
+def test_retire_completed_jobs(paths):
+    cluster = FakeClusterSubmission(paths)
+    jobs = [make_job(i, paths) for i in range(4)]
+    cluster.add_jobs(jobs)
+    for _ in range(4):
+        cluster.submit_next()
+
+    set_results(jobs[0], paths)
+    jobs[0].status = JobStatus.CONCLUDED
+    jobs[1].mark_failed("error")
+    jobs[2].status = JobStatus.RUNNING
+
+    assert cluster.retire_completed_jobs() == [jobs[0], jobs[1]]
+    assert cluster.job_registry.n_live == 2
+    assert cluster.jobs == [jobs[2], jobs[3]]
+    assert cluster.get_job(0) is None
+    # retired jobs are still counted
+    assert cluster.n_total_jobs == 4
+    assert cluster.n_submitted_jobs == 4
+    assert cluster.n_completed_jobs == 2
+    assert cluster.n_successful_jobs == 1
+    assert cluster.n_failed_jobs == 1
+    assert cluster.successful_jobs == []
+
+    # status changes of retired jobs are not tracked anymore
+    jobs[1].status = JobStatus.CONCLUDED
+    assert cluster.n_completed_jobs == 2
+    assert cluster.retire_completed_jobs() == []
+
+    jobs[2].mark_failed("error")
+    assert cluster.retire_completed_jobs() == [jobs[2]]
+    assert cluster.n_failed_jobs == 2
+    assert cluster.n_running_jobs == 0
+
+
+def test_submit_next_batch(paths):
+    cluster = FakeClusterSubmission(paths)
+    cluster.MAX_SUBMISSION_BATCH_SIZE = 3
+    jobs = [make_job(i, paths) for i in range(5)]
+    cluster.add_jobs(jobs)
+
+    assert cluster.submit_next_batch() == 3
+    assert cluster.n_submitted_jobs == 3
+    assert [job.cluster_id for job in jobs[:3]] == ["1", "2", "3"]
+    assert all(job.status == JobStatus.SUBMITTED for job in jobs[:3])
+
+    # limited by max_jobs
+    assert cluster.submit_next_batch(max_jobs=1) == 1
+    assert jobs[3].cluster_id == "4"
+
+    # limited by the number of jobs in the queue
+    assert cluster.submit_next_batch() == 1
+    assert not cluster.has_unsubmitted_jobs()
+    assert cluster.submit_next_batch() == 0
+    assert cluster.n_submitted_jobs == 5
+
+
+def test_submit_many_checks_number_of_cluster_ids(paths):
+    class BrokenClusterSubmission(FakeClusterSubmission):
+        def submit_many_fn(self, jobs):
+            return [cs.ClusterJobId("1")]
+
+    cluster = BrokenClusterSubmission(paths)
+    jobs = [make_job(i, paths) for i in range(2)]
+    cluster.add_jobs(jobs, enqueue=False)
+
+    with pytest.raises(cs.SubmissionError):
+        cluster.submit_many(jobs)
+    assert cluster.n_submitted_jobs == 0
+
+
+class BlockingClusterSubmission(FakeClusterSubmission):
+    """Submissions block until :attr:`release` is set."""
+
+    def __init__(self, paths):
+        super().__init__(paths)
+        self.release = threading.Event()
+        self._id_lock = threading.Lock()
+
+    def submit_fn(self, job):
+        assert self.release.wait(timeout=10)
+        with self._id_lock:
+            return super().submit_fn(job)
+
+
+def wait_for_submissions(cluster):
+    done, _ = concurrent.futures.wait(cluster._pending_submissions, timeout=10)
+    assert len(done) == cluster.n_pending_submissions
+
+
+def test_dispatch_submissions_limits_concurrency(paths):
+    cluster = BlockingClusterSubmission(paths)
+    cluster.max_concurrent_submissions = 2
+    jobs = [make_job(i, paths) for i in range(3)]
+    cluster.add_jobs(jobs)
+
+    # does not block, only two submissions are started
+    assert cluster.dispatch_submissions() == 2
+    assert cluster.n_pending_submissions == 2
+    assert len(cluster.submission_queue) == 1
+    assert cluster.dispatch_submissions() == 0
+
+    # a job that reports back before its submission finished keeps its status
+    jobs[0].status = JobStatus.RUNNING
+
+    cluster.release.set()
+    wait_for_submissions(cluster)
+    assert cluster.dispatch_submissions() == 1
+    wait_for_submissions(cluster)
+    assert cluster.dispatch_submissions() == 0
+    assert cluster.n_pending_submissions == 0
+
+    assert sorted(job.cluster_id for job in jobs) == ["1", "2", "3"]
+    assert jobs[0].status == JobStatus.RUNNING
+    assert [job.status for job in jobs[1:]] == [JobStatus.SUBMITTED] * 2
+    assert cluster.submission_latency.n_jobs == 3
+    cluster.close()
+
+
+def test_dispatch_submissions_reraises_errors(paths):
+    class FailingClusterSubmission(FakeClusterSubmission):
+        def submit_fn(self, job):
+            raise cs.SubmissionError("sbatch failed")
+
+    cluster = FailingClusterSubmission(paths)
+    cluster.add_jobs(make_job(0, paths))
+    assert cluster.dispatch_submissions() == 1
+    wait_for_submissions(cluster)
+
+    with pytest.raises(cs.SubmissionError, match="sbatch failed"):
+        cluster.dispatch_submissions()
@@ -0,0 +1,343 @@
+import pickle
+import socket
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+from cluster_utils.base import communication, constants
+from cluster_utils.base.communication import (
+    MessageDecodeError,
+    MessageTypes,
+    decode_message,
+    encode_message,
+)
+from cluster_utils.client import server_communication, submission_state
+from cluster_utils.server.communication_server import (
+    CommunicationServer,
+    DuplicateMessageFilter,
+)
+
+
+def test_encode_decode_roundtrip():
+    metrics = {"loss": 0.5, "accuracy": 0.9, "name": "foo", "steps": 13}
+    data = encode_message(MessageTypes.JOB_SENT_RESULTS, 42, [metrics])
+
+    message = decode_message(data)
+    assert message.message_type == MessageTypes.JOB_SENT_RESULTS
+    assert message.job_id == 42
+    assert message.payload == [metrics]
+    assert message.flags == 0
+    assert message.arguments == (42, metrics)
+
+
+def test_encode_decode_flags_and_sequence_number():
+    data = encode_message(
+        MessageTypes.JOB_CONCLUDED,
+        7,
+        [],
+        flags=communication.FLAG_ACK_REQUESTED,
+        seq=2**32 - 1,
+    )
+    message = decode_message(data)
+    assert message.flags == communication.FLAG_ACK_REQUESTED
+    assert message.seq == 2**32 - 1
+
+
+def test_encode_decode_no_payload():
+    data = encode_message(MessageTypes.JOB_CONCLUDED, 7, [])
+    message = decode_message(data)
+    assert message.message_type == MessageTypes.JOB_CONCLUDED
+    assert message.arguments == (7,)
+
+
+def test_encode_numpy_values():
+    data = encode_message(
+        MessageTypes.METRIC_EARLY_REPORT,
+        1,
+        [{"a": np.float32(0.5), "b": np.int64(3), "c": np.array([1.0, 2.0])}],
+    )
+    message = decode_message(data)
+    assert message.payload == [{"a": 0.5, "b": 3, "c": [1.0, 2.0]}]
+
+
+def test_encode_non_finite_values():
+    data = encode_message(MessageTypes.METRIC_EARLY_REPORT, 1, [{"a": float("nan")}])
+    message = decode_message(data)
+    assert np.isnan(message.payload[0]["a"])
+
+
+def test_encode_unsupported_type():
+    with pytest.raises(TypeError):
+        encode_message(MessageTypes.JOB_SENT_RESULTS, 1, [{"a": object()}])
+
+
+def test_decode_invalid_data():
+    valid = encode_message(MessageTypes.JOB_STARTED, 3, ["hostname"])
+
+    # too short
+    with pytest.raises(MessageDecodeError):
+        decode_message(valid[:4])
+
+    # wrong magic
+    with pytest.raises(MessageDecodeError):
+        decode_message(b"XX" + valid[2:])
+
+    # unsupported version
+    version_offset = len(communication.MESSAGE_MAGIC)
+    with pytest.raises(MessageDecodeError, match="version"):
+        decode_message(
+            valid[:version_offset]
+            + struct.pack("!B", communication.MESSAGE_FORMAT_VERSION + 1)
+            + valid[version_offset + 1 :]
+        )
+
+    # unknown message type
+    with pytest.raises(MessageDecodeError, match="message type"):
+        decode_message(
+            valid[: version_offset + 1]
+            + struct.pack("!B", 255)
+            + valid[version_offset + 2 :]
+        )
+
+    # broken payload
+    with pytest.raises(MessageDecodeError):
+        decode_message(valid[:-2])
+
+
+def test_is_legacy_message():
+    legacy = pickle.dumps((MessageTypes.JOB_CONCLUDED, (3,)))
+    assert communication.is_legacy_message(legacy)
+    assert not communication.is_legacy_message(
+        encode_message(MessageTypes.JOB_CONCLUDED, 3, [])
+    )
+
+
+class RecordingClusterSystem:
+    def __init__(self):
+        self.notified = 0
+        self.event_notifier = self
+
+    def notify(self):
+        self.notified += 1
+
+
+@pytest.fixture()
+def make_comm_server(monkeypatch):
+    # do not actually listen on a port
+    monkeypatch.setattr(CommunicationServer, "start_listening", lambda self, port: None)
+
+    def make(**kwargs):
+        server = CommunicationServer(RecordingClusterSystem(), **kwargs)
+        server.handled = []
+        server.handlers = {MessageTypes.JOB_CONCLUDED: server.handled.append}
+        return server
+
+    return make
+
+
+class Exploit:
+    def __reduce__(self):
+        return (exec, ("raise AssertionError('pickled payload was executed')",))
+
+
+def test_legacy_messages_are_rejected_by_default(make_comm_server):
+    server = make_comm_server()
+    server.handle_message(pickle.dumps(Exploit()))
+    server.handle_message(pickle.dumps((MessageTypes.JOB_CONCLUDED, (3,))))
+    assert server.handled == []
+    assert server.cluster_system.notified == 0
+
+
+def test_legacy_messages_accepted_if_enabled(make_comm_server):
+    server = make_comm_server(accept_legacy_messages=True)
+    server.handle_message(pickle.dumps((MessageTypes.JOB_CONCLUDED, (3,))))
+    assert server.handled == [(3,)]
+
+
+def test_duplicate_message_filter():
+    dup_filter = DuplicateMessageFilter(window_size=2)
+
+    assert not dup_filter.seen(1, 10)
+    dup_filter.mark(1, 10)
+    assert dup_filter.seen(1, 10)
+    # sequence numbers are tracked per job
+    assert not dup_filter.seen(2, 10)
+
+    # only the last messages are remembered
+    dup_filter.mark(1, 11)
+    dup_filter.mark(1, 12)
+    assert not dup_filter.seen(1, 10)
+    assert dup_filter.seen(1, 12)
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, addr):
+        self.sent.append(decode_message(data))
+
+
+def test_retransmission_processed_if_handler_failed(make_comm_server):
+    server = make_comm_server()
+    server.transport = RecordingTransport()
+    n_calls = 0
+
+    def flaky_handler(message):
+        nonlocal n_calls
+        n_calls += 1
+        if n_calls == 1:
+            raise RuntimeError("handler failed")
+        server.handled.append(message)
+
+    server.handlers[MessageTypes.JOB_CONCLUDED] = flaky_handler
+    data = encode_message(
+        MessageTypes.JOB_CONCLUDED, 3, [], flags=communication.FLAG_ACK_REQUESTED, seq=5
+    )
+    addr = ("127.0.0.1", 4242)
+
+    with pytest.raises(RuntimeError):
+        server.handle_message(data, addr)
+    assert server.transport.sent == []
+
+    # the job retransmits the message, as it was not acknowledged
+    server.handle_message(data, addr)
+    assert server.handled == [(3,)]
+    assert [ack.seq for ack in server.transport.sent] == [5]
+
+    # a further retransmission (e.g. if the acknowledgement got lost) is ignored
+    server.handle_message(data, addr)
+    assert server.handled == [(3,)]
+    assert [ack.seq for ack in server.transport.sent] == [5, 5]
+
+
+@pytest.fixture()
+def fake_server(monkeypatch):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+
+    monkeypatch.setattr(submission_state, "communication_server_ip", "127.0.0.1")
+    monkeypatch.setattr(
+        submission_state, "communication_server_port", sock.getsockname()[1]
+    )
+    monkeypatch.setattr(submission_state, "job_id", 5)
+    monkeypatch.setattr(submission_state, "reliable_communication", True)
+    monkeypatch.setattr(constants, "RELIABLE_MESSAGE_INITIAL_TIMEOUT_IN_SECS", 0.05)
+
+    yield sock
+    sock.close()
+
+
+def test_send_message_reliable_retransmit(fake_server):
+    received = []
+
+    def serve():
+        # drop the first message, acknowledge the second one
+        for _ in range(2):
+            data, addr = fake_server.recvfrom(65536)
+            received.append(decode_message(data))
+        msg = received[-1]
+        fake_server.sendto(
+            encode_message(MessageTypes.ACK, msg.job_id, [], seq=msg.seq), addr
+        )
+
+    server_thread = threading.Thread(target=serve)
+    server_thread.start()
+    server_communication.send_message(MessageTypes.JOB_CONCLUDED, (5,))
+    server_thread.join()
+
+    assert len(received) == 2
+    assert received[0] == received[1]
+    assert received[0].message_type == MessageTypes.JOB_CONCLUDED
+    assert received[0].flags & communication.FLAG_ACK_REQUESTED
+
+
+def test_send_message_unreliable_types(fake_server):
+    # progress reports are not important enough to wait for an acknowledgement
+    server_communication.send_message(MessageTypes.JOB_PROGRESS_PERCENTAGE, (5, 0.5))
+
+    data, _ = fake_server.recvfrom(65536)
+    message = decode_message(data)
+    assert message.message_type == MessageTypes.JOB_PROGRESS_PERCENTAGE
+    assert message.flags == 0
+    assert message.arguments == (5, 0.5)
+
+
+def test_compact_metric_history():
+    history = server_communication.compact_metric_history(
+        [{"a": 1, "b": 2}, {"a": 3}, {"b": 4, "c": 5}]
+    )
+    assert history == {"a": [1, 3, None], "b": [2, None, 4], "c": [None, None, 5]}
+
+
+@pytest.fixture()
+def sent_messages(monkeypatch):
+    messages = []
+    monkeypatch.setattr(
+        server_communication,
+        "send_message",
+        lambda message_type, message: messages.append((message_type, message)),
+    )
+    monkeypatch.setattr(submission_state, "job_id", 5)
+    return messages
+
+
+def test_progress_reporter_coalesces_reports(sent_messages):
+    reporter = server_communication.ProgressReporter(interval=60)
+
+    # the first report is sent immediately
+    reporter.report_fraction_finished(0.1)
+    assert sent_messages == [(MessageTypes.JOB_PROGRESS_PERCENTAGE, (5, 0.1))]
+
+    # further reports within the interval are collected
+    reporter.report_fraction_finished(0.2)
+    reporter.report_early_results({"loss": 3})
+    reporter.report_fraction_finished(0.3)
+    reporter.report_early_results({"loss": 2})
+    assert len(sent_messages) == 1
+
+    reporter.flush()
+    assert sent_messages[1:] == [
+        (MessageTypes.METRIC_EARLY_REPORT_BATCH, (5, {"loss": [3, 2]})),
+        (MessageTypes.JOB_PROGRESS_PERCENTAGE, (5, 0.3)),
+    ]
+
+    # nothing pending, so nothing is sent
+    reporter.flush()
+    assert len(sent_messages) == 3
+
+
+def test_progress_reporter_sends_after_interval(sent_messages):
+    reporter = server_communication.ProgressReporter(interval=0.05)
+
+    reporter.report_early_results({"loss": 3})
+    reporter.report_early_results({"loss": 2})
+    timer = reporter._timer
+    assert timer is not None
+
+    # pending report is sent by a timer once the interval has passed
+    timer.join(timeout=5)
+    assert sent_messages == [
+        (MessageTypes.METRIC_EARLY_REPORT_BATCH, (5, {"loss": [3]})),
+        (MessageTypes.METRIC_EARLY_REPORT_BATCH, (5, {"loss": [2]})),
+    ]
+
+
+def test_progress_reporter_max_batch_size(sent_messages, monkeypatch):
+    monkeypatch.setattr(constants, "EARLY_REPORT_MAX_BATCH_SIZE", 3)
+    reporter = server_communication.ProgressReporter(interval=60)
+
+    for i in range(7):
+        reporter.report_early_results({"step": i})
+
+    # first one is sent immediately, then batches of three
+    assert [message[1][1]["step"] for message in sent_messages] == [
+        [0],
+        [1, 2, 3],
+        [4, 5, 6],
+    ]
+    reporter.flush()
+    assert len(sent_messages) == 3
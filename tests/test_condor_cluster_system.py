@@ -0,0 +1,230 @@
+import pathlib
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from cluster_utils.server import condor_cluster_system
+from cluster_utils.server.condor_cluster_system import (
+    CondorClusterSubmission,
+    CondorLogFollower,
+)
+from cluster_utils.server.job import Job, JobStatus
+
+LOG_SUBMITTED = """000 (4242.000.000) 2024-09-02 10:00:00 Job submitted from host: <172.22.1.1:9618>
+...
+"""
+LOG_EXECUTING = """001 (4242.000.000) 2024-09-02 10:00:05 Job executing on host: <172.22.2.45:9618?addrs=172.22.2.45-9618>
+...
+"""
+LOG_TERMINATED = """005 (4242.000.000) 2024-09-02 10:05:00 Job terminated.
+	(1) Normal termination (return value {rc})
+		Usr 0 00:00:00, Sys 0 00:00:00  -  Run Remote Usage
+...
+"""
+
+
+@pytest.fixture()
+def condor(tmp_path: pathlib.Path, monkeypatch) -> SimpleNamespace:
+    jobs_dir = tmp_path / "jobs_dir"
+    jobs_dir.mkdir()
+    paths = {
+        "main_path": str(tmp_path / "main_path"),
+        "script_to_run": "foobar.py",
+        "jobs_dir": str(jobs_dir),
+        "current_result_dir": str(tmp_path / "current_result_dir"),
+    }
+    requirements = {
+        "request_cpus": 1,
+        "request_gpus": 0,
+        "memory_in_mb": 1000,
+        "bid": 10,
+    }
+    job = Job(
+        id=13,
+        settings={},
+        other_params={},
+        paths=paths,
+        iteration=2,
+        connection_info={"ip": "127.0.0.1", "port": 12345},
+        opt_procedure_name="unittest",
+        singularity_settings=None,
+    )
+    job.cluster_id = "4242"
+    job.run_script_path = str(jobs_dir / "job_2_13.sh")
+
+    # by default, the job is not in the queue anymore
+    queue: dict = {}
+    monkeypatch.setattr(condor_cluster_system, "query_condor_queue", lambda: queue)
+
+    return SimpleNamespace(
+        submission=CondorClusterSubmission(requirements, paths),
+        job=job,
+        queue=queue,
+        log_file=pathlib.Path(f"{job.run_script_path}.log"),
+        err_file=pathlib.Path(f"{job.run_script_path}.err"),
+    )
+
+
+def test_log_follower_reads_incrementally(tmp_path):
+    log_file = tmp_path / "job.log"
+    follower = CondorLogFollower(str(log_file))
+
+    # file does not exist yet
+    assert follower.read_new_events() == []
+
+    terminated = LOG_TERMINATED.format(rc=0)
+    # incomplete event is not returned until it is complete
+    log_file.write_text(LOG_SUBMITTED + terminated[:30])
+    events = follower.read_new_events()
+    assert [event.code for event in events] == [0]
+    assert events[0].job_id == "4242.0"
+
+    with open(log_file, "a") as f:
+        f.write(terminated[30:])
+    events = follower.read_new_events()
+    assert [event.code for event in events] == [5]
+    assert events[0].return_value == 0
+    assert events[0].text.startswith("Job terminated.")
+
+    assert follower.read_new_events() == []
+
+
+def test_mark_failed_jobs(condor):
+    condor.err_file.write_text("Traceback...\nValueError: foo\n")
+    condor.log_file.write_text(LOG_SUBMITTED + LOG_EXECUTING)
+
+    condor.submission.mark_failed_jobs([condor.job])
+    assert condor.job.status != JobStatus.FAILED
+
+    with open(condor.log_file, "a") as f:
+        f.write(LOG_TERMINATED.format(rc=1))
+    condor.submission.mark_failed_jobs([condor.job])
+    assert condor.job.status == JobStatus.FAILED
+    assert condor.job.error_info == "Traceback...\nValueError: foo\n"
+    assert condor.job.hostname == "?045"
+
+
+def test_mark_failed_jobs_successful_job(condor):
+    condor.log_file.write_text(
+        LOG_SUBMITTED + LOG_EXECUTING + LOG_TERMINATED.format(rc=0)
+    )
+    condor.submission.mark_failed_jobs([condor.job])
+    assert condor.job.status != JobStatus.FAILED
+
+
+def test_mark_failed_jobs_skips_queued_jobs(condor, monkeypatch):
+    condor.queue["4242.0"] = 2  # running
+    condor.log_file.write_text(
+        LOG_SUBMITTED + LOG_EXECUTING + LOG_TERMINATED.format(rc=1)
+    )
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Log should not be read.")
+
+    monkeypatch.setattr(CondorLogFollower, "read_new_events", fail)
+    condor.submission.mark_failed_jobs([condor.job])
+    assert condor.job.status != JobStatus.FAILED
+
+
+def test_check_for_failed_jobs_is_throttled(condor):
+    assert condor.submission.is_ready_to_check_for_failed_jobs()
+    condor.submission.mark_failed_jobs([condor.job])
+    assert not condor.submission.is_ready_to_check_for_failed_jobs()
+    assert condor.submission.seconds_until_next_check_for_failed_jobs() > 0
+
+
+def test_query_condor_queue(monkeypatch):
+    output = b'[\n{"ClusterId": 4242, "ProcId": 0, "JobStatus": 2},\n'
+    output += b'{"ClusterId": 4243, "ProcId": 1, "JobStatus": 1}\n]\n'
+    monkeypatch.setattr(
+        condor_cluster_system,
+        "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, output, b""),
+    )
+    assert condor_cluster_system.query_condor_queue() == {"4242.0": 2, "4243.1": 1}
+
+    # no jobs
+    monkeypatch.setattr(
+        condor_cluster_system,
+        "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, b"", b""),
+    )
+    assert condor_cluster_system.query_condor_queue() == {}
+
+    # condor_q failed
+    monkeypatch.setattr(
+        condor_cluster_system,
+        "run",
+        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, b"", b"error"),
+    )
+    assert condor_cluster_system.query_condor_queue() is None
+
+
+def test_extract_cluster_from_submit_output():
+    output = "Submitting job(s)...\n3 job(s) submitted to cluster 4242.\n"
+    assert condor_cluster_system.extract_cluster_from_submit_output(output) == (
+        3,
+        "4242",
+    )
+
+    with pytest.raises(ValueError):
+        condor_cluster_system.extract_cluster_from_submit_output("ERROR: foo")
+
+
+def test_submit_many_single_submit_description(condor, monkeypatch):
+    paths = condor.submission.paths
+    jobs = [
+        Job(
+            id=i,
+            settings={},
+            other_params={},
+            paths=paths,
+            iteration=0,
+            connection_info={"ip": "127.0.0.1", "port": 12345},
+            opt_procedure_name="unittest",
+            singularity_settings=None,
+        )
+        for i in range(3)
+    ]
+
+    submit_calls = []
+
+    def fake_run(cmd, **kwargs):
+        submit_calls.append(cmd)
+        return subprocess.CompletedProcess(
+            cmd, 0, stdout=b"Submitting job(s)...\n3 job(s) submitted to cluster 77.\n"
+        )
+
+    monkeypatch.setattr(condor_cluster_system, "run", fake_run)
+
+    condor.submission.add_jobs(jobs)
+    assert condor.submission.submit_next_batch() == 3
+
+    # all jobs are submitted with a single call
+    jobs_dir = pathlib.Path(paths["jobs_dir"])
+    spec_file = jobs_dir / "jobs_0_0_2.sub"
+    assert submit_calls == [[f"condor_submit_bid 10 {spec_file}\n"]]
+    assert [job.cluster_id for job in jobs] == ["77.0", "77.1", "77.2"]
+
+    spec = spec_file.read_text()
+    assert "executable = $(run_script)\n" in spec
+    assert "log = $(run_script).log\n" in spec
+    run_scripts = [str(jobs_dir / f"job_0_{i}.sh") for i in range(3)]
+    assert "queue run_script from (\n{}\n)\n".format("\n".join(run_scripts)) in spec
+    for job, run_script in zip(jobs, run_scripts):
+        assert job.run_script_path == run_script
+        assert pathlib.Path(run_script).exists()
+
+    # single processes of the cluster can be stopped
+    submit_calls.clear()
+    condor.submission.stop(jobs[1])
+    assert submit_calls == [["condor_rm 77.1"]]
+
+    # failure detection works per process
+    condor.queue["77.0"] = 2
+    pathlib.Path(f"{run_scripts[1]}.log").write_text(
+        LOG_TERMINATED.replace("4242.000", "77.001").format(rc=1)
+    )
+    condor.submission.mark_failed_jobs(jobs)
+    assert [job.status == JobStatus.FAILED for job in jobs] == [False, True, False]
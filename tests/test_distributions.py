@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from cluster_utils.server import distributions
+from cluster_utils.server.distributions import (
+    Discrete,
+    IntLogNormal,
+    IntNormal,
+    TruncatedLogNormal,
+    TruncatedNormal,
+)
+from cluster_utils.server.optimizers import Metaoptimizer
+
+from .helpers import FakeJob
+
+
+@pytest.fixture(autouse=True)
+def _seed():
+    np.random.seed(0)
+
+
+@pytest.mark.parametrize(
+    ("distribution_class", "bounds"),
+    [
+        (TruncatedNormal, (-1.0, 3.0)),
+        (TruncatedLogNormal, (1e-4, 1e-1)),
+        (IntNormal, (-5, 5)),
+        (IntLogNormal, (1, 1000)),
+    ],
+)
+def test_sample_batch_within_bounds(distribution_class, bounds):
+    distr = distribution_class(param="x", bounds=bounds)
+    samples = distr.sample_batch(500)
+
+    assert len(samples) == 500
+    assert all(bounds[0] <= s <= bounds[1] for s in samples)
+    expected_type = int if isinstance(bounds[0], int) else float
+    assert all(type(s) is expected_type for s in samples)
+
+
+@pytest.mark.parametrize("howmany", [1, 2])
+def test_small_sample_batch_not_collapsed_to_bounds(howmany):
+    distr = TruncatedNormal(param="x", bounds=(0.9, 0.999))
+    samples = [s for _ in range(50) for s in distr.sample_batch(howmany)]
+
+    assert len(samples) == 50 * howmany
+    # a single sample would be rounded to one significant digit and then clipped
+    assert sum(s in (0.9, 0.999) for s in samples) < len(samples) / 2
+
+
+def test_round_significant_digits_matches_scalar_version():
+    values = np.concatenate([np.random.normal(size=100) * 10.0**e for e in (-3, 0, 4)])
+    values = np.append(values, 0.0)
+    for digits in [1, 2, 3, 5]:
+        expected = [float(distributions.significant_digits(v, digits)) for v in values]
+        np.testing.assert_allclose(
+            distributions.round_significant_digits(values, digits), expected
+        )
+
+
+def test_smart_round_batch_matches_scalar_version():
+    values = np.random.normal(size=50) * 3 + 10
+    np.testing.assert_allclose(
+        distributions.smart_round_batch(values),
+        list(distributions.smart_round(values)),
+    )
+
+
+def test_discrete_sample_batch():
+    distr = Discrete(param="x", options=["a", [1, 2], 3])
+    distr.probs = [0.0, 0.5, 0.5]
+    samples = distr.sample_batch(100)
+
+    assert len(samples) == 100
+    assert set(samples) == {(1, 2), 3}
+
+
+def make_metaoptimizer():
+    return Metaoptimizer(
+        metric_to_optimize="loss",
+        minimize=True,
+        report_hooks=None,
+        number_of_samples=100,
+        optimized_params=[
+            TruncatedNormal(param="a.b", bounds=(0.0, 1.0)),
+            Discrete(param="c", options=["x", "y"]),
+        ],
+        num_jobs_in_elite=5,
+        with_restarts=False,
+    )
+
+
+def test_metaoptimizer_ask_batch():
+    optimizer = make_metaoptimizer()
+    settings = optimizer.ask_batch(25)
+
+    assert len(settings) == 25
+    for setting in settings:
+        assert set(setting) == {"a", "c"}
+        assert 0.0 <= setting["a"]["b"] <= 1.0
+        assert setting["c"] in ("x", "y")
+
+
+def test_metaoptimizer_sample_buffer():
+    optimizer = make_metaoptimizer()
+
+    # a minimal number of settings is sampled at once, the rest is kept for later
+    optimizer.ask()
+    assert len(optimizer._sample_buffer) == Metaoptimizer.MIN_SAMPLE_BATCH_SIZE - 1
+    buffered = list(optimizer._sample_buffer)
+    assert optimizer.ask_batch(3) == buffered[:3]
+
+    # after the distributions are refitted, old samples must not be used anymore
+    optimizer.tell(
+        [
+            FakeJob({"a.b": a, "c": "x", "loss": loss})
+            for loss, a in enumerate(np.linspace(0, 1, 10))
+        ]
+    )
+    assert not optimizer._sample_buffer
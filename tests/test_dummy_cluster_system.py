@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import signal
+import time
+
+import pytest
+
+from cluster_utils.base import constants
+from cluster_utils.server import dummy_cluster_system
+from cluster_utils.server.dummy_cluster_system import (
+    CpuAllocator,
+    DummyClusterSubmission,
+    parse_cpu_list,
+)
+
+from .helpers import make_job
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("5") == [5]
+    assert parse_cpu_list("") == []
+
+
+def test_detect_cpu_groups_without_topology(monkeypatch):
+    monkeypatch.setattr(dummy_cluster_system, "_read_numa_nodes", lambda: [])
+    monkeypatch.setattr(dummy_cluster_system, "_read_sockets", lambda cpus: [])
+    assert dummy_cluster_system.detect_cpu_groups([3, 1, 2]) == [[1, 2, 3]]
+
+
+def test_detect_cpu_groups_restricted_to_usable_cpus(monkeypatch):
+    monkeypatch.setattr(
+        dummy_cluster_system, "_read_numa_nodes", lambda: [[0, 1, 2, 3], [4, 5, 6, 7]]
+    )
+    assert dummy_cluster_system.detect_cpu_groups([2, 3, 4, 8]) == [[2, 3], [4], [8]]
+
+
+def test_cpu_allocator_prefers_single_group():
+    allocator = CpuAllocator([[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    first = allocator.allocate(2)
+    assert first == [0, 1]
+    # best fit: the partially used group is filled up before the free one is used
+    assert allocator.allocate(2) == [2, 3]
+    assert allocator.allocate(3) == [4, 5, 6]
+    assert allocator.n_free == 1
+
+    # not enough free CPUs
+    assert allocator.allocate(2) is None
+
+    allocator.release(first)
+    assert allocator.n_free == 3
+    assert allocator.allocate(3) == [0, 1, 7]
+
+
+def test_cpu_allocator_uses_whole_groups_first():
+    allocator = CpuAllocator([[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]])
+    allocator.allocate(1)
+
+    cpus = allocator.allocate(6)
+    assert cpus is not None
+    assert len(set(cpus)) == 6
+    # one of the completely free groups is used entirely
+    assert {4, 5, 6, 7} <= set(cpus) or {8, 9, 10, 11} <= set(cpus)
+    assert 0 not in cpus
+
+
+def test_local_jobs_wait_for_free_cpus(paths, monkeypatch):
+    os.makedirs(paths["jobs_dir"])
+    cluster = DummyClusterSubmission(
+        {"request_cpus": 1, "max_cpus": 1}, paths, remove_jobs_dir=False
+    )
+
+    def generate_job_spec_file(job):
+        job.run_script_path = os.path.join(cluster.submission_dir, f"{job.id}.sh")
+        with open(job.run_script_path, "w") as f:
+            f.write(
+                f"exec >> {job.run_script_path}.out\n"
+                "sleep 0.2\n"
+                f"echo job {job.id} on $(taskset -cp $$)\n"
+            )
+
+    monkeypatch.setattr(cluster, "generate_job_spec_file", generate_job_spec_file)
+
+    jobs = [make_job(i, paths) for i in range(2)]
+    cluster.add_jobs(jobs)
+    cluster.submit_next_batch(max_jobs=2)
+    cluster.submit_next_batch(max_jobs=2)
+
+    # only one CPU, so the second job has to wait for the first one
+    assert jobs[0].futures_object.running()
+    assert not jobs[1].futures_object.running()
+    assert len(cluster.pending_jobs) == 1
+
+    done, _ = concurrent.futures.wait([job.futures_object for job in jobs], timeout=10)
+    assert len(done) == 2
+    assert cluster.cpu_allocator.n_free == 1
+
+    for job in jobs:
+        assert job.futures_object.result().returncode == 0
+        with open(f"{job.run_script_path}.out") as f:
+            assert f.read().startswith(f"job {job.id} on")
+
+    cluster.mark_failed_jobs(jobs)
+    assert not any(job.error_info for job in jobs)
+
+
+def test_stop_pending_job(paths, monkeypatch):
+    os.makedirs(paths["jobs_dir"])
+    cluster = DummyClusterSubmission(
+        {"request_cpus": 1, "max_cpus": 1}, paths, remove_jobs_dir=False
+    )
+    # no free CPUs, so jobs are not started
+    assert cluster.cpu_allocator.allocate(1) is not None
+    monkeypatch.setattr(
+        cluster,
+        "generate_job_spec_file",
+        lambda job: setattr(job, "run_script_path", "/nonexistent.sh"),
+    )
+
+    job = make_job(0, paths)
+    cluster.add_jobs(job)
+    cluster.submit_next()
+    assert len(cluster.pending_jobs) == 1
+
+    cluster.stop_fn(job.cluster_id)
+    assert not cluster.pending_jobs
+    assert job.futures_object.cancelled()
+
+
+@pytest.mark.parametrize("requested", [1, 1000])
+def test_cpus_per_job_limited_by_available_cpus(paths, requested):
+    cluster = DummyClusterSubmission(
+        {"request_cpus": requested, "max_cpus": 1}, paths, remove_jobs_dir=False
+    )
+    assert cluster.cpus_per_job == 1
+    assert cluster.concurrent_jobs == 1
+
+
+def make_cluster_with_script(paths, monkeypatch, script):
+    os.makedirs(paths["jobs_dir"], exist_ok=True)
+    cluster = DummyClusterSubmission(
+        {"request_cpus": 1, "max_cpus": 1}, paths, remove_jobs_dir=False
+    )
+
+    def generate_job_spec_file(job):
+        job.run_script_path = os.path.join(cluster.submission_dir, f"{job.id}.sh")
+        with open(job.run_script_path, "w") as f:
+            f.write(script.format(run_script_path=job.run_script_path))
+
+    monkeypatch.setattr(cluster, "generate_job_spec_file", generate_job_spec_file)
+    return cluster
+
+
+def wait_for_file(path, timeout=10):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        assert time.time() < deadline, f"{path} was not created"
+        time.sleep(0.01)
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_stop_running_job(paths, monkeypatch):
+    # the job starts a child process, which has to be stopped as well
+    cluster = make_cluster_with_script(
+        paths,
+        monkeypatch,
+        "sleep 30 &\necho $! > {run_script_path}.child\nwait\n",
+    )
+    jobs = [make_job(i, paths) for i in range(2)]
+    cluster.add_jobs(jobs)
+    cluster.submit_next_batch(max_jobs=2)
+    cluster.submit_next_batch(max_jobs=2)
+    wait_for_file(f"{jobs[0].run_script_path}.child")
+    with open(f"{jobs[0].run_script_path}.child") as f:
+        child_pid = int(f.read())
+
+    start = time.time()
+    cluster.stop_fn(jobs[0].cluster_id)
+    # does not block and the CPU is immediately used by the next job
+    assert time.time() - start < 1
+    assert jobs[1].futures_object.running()
+
+    result = jobs[0].futures_object.result(timeout=5)
+    assert result.returncode == -signal.SIGTERM
+    deadline = time.time() + 5
+    while is_process_alive(child_pid):
+        assert time.time() < deadline, "child process of the job is still running"
+        time.sleep(0.01)
+
+    cluster.stop_fn(jobs[1].cluster_id)
+    jobs[1].futures_object.result(timeout=5)
+
+
+def test_stop_job_ignoring_sigterm(paths, monkeypatch):
+    monkeypatch.setattr(constants, "LOCAL_JOB_TERMINATION_TIMEOUT_IN_SECS", 0.2)
+    cluster = make_cluster_with_script(
+        paths,
+        monkeypatch,
+        "trap '' TERM\ntouch {run_script_path}.started\nwhile true; do sleep 0.05; done\n",
+    )
+    job = make_job(0, paths)
+    cluster.add_jobs(job)
+    cluster.submit_next()
+    wait_for_file(f"{job.run_script_path}.started")
+
+    cluster.stop_fn(job.cluster_id)
+    assert cluster.cpu_allocator.n_free == 1
+
+    result = job.futures_object.result(timeout=5)
+    assert result.returncode == -signal.SIGKILL
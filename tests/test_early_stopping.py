@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from cluster_utils.server.early_stopping import (
+    ASHAScheduler,
+    MetricRankIndex,
+    RankScheduler,
+    create_scheduler,
+)
+from cluster_utils.server.job import JobStatus
+from cluster_utils.server.job_manager import kill_bad_looking_jobs
+
+from .helpers import FakeClusterSubmission, make_job
+
+
+@pytest.mark.parametrize("minimize", [True, False])
+def test_rank_index_matches_full_ranking(minimize):
+    rng = np.random.default_rng(42)
+    trajectories = rng.normal(size=(20, 6))
+    index = MetricRankIndex(minimize)
+    for trajectory in trajectories:
+        index.add(list(trajectory))
+
+    assert len(index) == 20
+    assert index.trajectory_length == 6
+
+    # compare with ranking all values at once
+    sign = 1 if minimize else -1
+    ranks = np.argsort(np.argsort(trajectories * sign, axis=0), axis=0)
+    deviations = np.sqrt(np.mean((ranks - ranks[:, -1:]) ** 2, axis=0))
+    for checkpoint in range(6):
+        assert index.rank_deviation(checkpoint) == pytest.approx(deviations[checkpoint])
+        value = rng.normal()
+        all_values = np.append(trajectories[:, checkpoint], value)
+        expected_rank = np.argsort(np.argsort(all_values * sign))[-1]
+        assert index.rank(checkpoint, value) == expected_rank
+
+
+def test_rank_index_keeps_longest_trajectories():
+    index = MetricRankIndex(minimize=True)
+    index.add([1.0, 2.0])
+    index.add([3.0, 4.0])
+    # shorter trajectories (e.g. of jobs that were stopped early) are ignored
+    index.add([0.0])
+    index.add([0.0, float("nan")])
+    assert len(index) == 2
+    assert index.rank(1, 3.0) == 1
+    assert index.rank_deviation(1) == 0.0
+
+    index.add([5.0, 6.0, 7.0])
+    assert len(index) == 1
+    assert index.trajectory_length == 3
+    assert index.rank(0, 4.0) == 0
+
+
+def test_rank_scheduler():
+    scheduler = RankScheduler(minimize=True, target_rank=3, how_many_stds=1.0)
+    for i in range(4):
+        scheduler.job_finished(i, [float(i)] * 9, float(i))
+    # not enough finished jobs yet
+    assert not scheduler.should_stop(10, [100.0])
+
+    scheduler.job_finished(4, [4.0] * 9, 4.0)
+    assert scheduler.should_stop(10, [100.0])
+    assert not scheduler.should_stop(11, [0.5])
+    # more than half of the runtime done
+    assert not scheduler.should_stop(12, [100.0] * 6)
+
+
+def test_asha_scheduler():
+    scheduler = ASHAScheduler(minimize=False, min_steps=2, reduction_factor=2)
+    assert [scheduler.rung_step(rung) for rung in range(4)] == [2, 4, 8, 16]
+
+    # first job reaching a rung is always promoted
+    assert not scheduler.should_stop(0, [0.0, 5.0])
+    assert not scheduler.should_stop(0, [0.0, 5.0, 0.0])
+    # worse than the best half at the first rung
+    assert scheduler.should_stop(1, [0.0, 1.0])
+    assert not scheduler.should_stop(2, [0.0, 6.0])
+    assert scheduler.rungs[0] == [-6.0, -5.0, -1.0]
+
+    # rungs that were not checked while running are recorded when the job finished
+    scheduler.job_finished(0, [0.0, 5.0, 0.0, 4.0, 0.0], 4.0)
+    assert scheduler.rungs[1] == [-4.0]
+    # a job reporting several steps at once is compared at all rungs it passed
+    assert scheduler.should_stop(3, [10.0] * 3 + [-1.0])
+    assert scheduler.rungs[0][0] == -10.0
+    assert scheduler.rungs[1] == [-4.0, 1.0]
+
+
+def test_asha_scheduler_max_steps():
+    scheduler = ASHAScheduler(minimize=True, min_steps=1, max_steps=3)
+    assert not scheduler.should_stop(0, [1.0, 1.0, 1.0])
+    # rung at step 3 is not used
+    assert not scheduler.should_stop(1, [1.0, 1.0, 2.0])
+    assert len(scheduler.rungs) == 1
+
+
+def test_create_scheduler():
+    scheduler = create_scheduler(True, {"target_rank": 3, "how_many_stds": 2.0})
+    assert isinstance(scheduler, RankScheduler)
+    assert scheduler.target_rank == 3
+
+    scheduler = create_scheduler(False, {"scheduler": "asha", "min_steps": 5})
+    assert isinstance(scheduler, ASHAScheduler)
+    assert not scheduler.minimize
+    assert scheduler.min_steps == 5
+
+    with pytest.raises(ValueError, match="scheduler"):
+        create_scheduler(True, {"scheduler": "hyperband"})
+
+
+def test_kill_bad_looking_jobs(paths):
+    scheduler = RankScheduler(minimize=True, target_rank=5, how_many_stds=1.0)
+    for i in range(10):
+        scheduler.job_finished(i, [float(i)] * 9, float(i))
+
+    cluster = FakeClusterSubmission(paths)
+    jobs = [make_job(i, paths) for i in range(4)]
+    cluster.add_jobs(jobs)
+    for job in jobs:
+        job.status = JobStatus.RUNNING
+        job.final_settings = job.generate_final_setting(paths)
+    jobs[0].reported_metric_values = [0.5]
+    jobs[1].reported_metric_values = [100.0]
+    # more than half of the runtime done
+    jobs[2].reported_metric_values = [100.0] * 6
+
+    kill_bad_looking_jobs(cluster, scheduler, "loss")
+
+    assert [job.status for job in jobs] == [
+        JobStatus.RUNNING,
+        JobStatus.CONCLUDED,
+        JobStatus.RUNNING,
+        JobStatus.RUNNING,
+    ]
+    assert jobs[1].metrics == {"loss": 100.0}
+    assert jobs[1].has_results()
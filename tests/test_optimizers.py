@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import collections
+
+import numpy as np
+import pytest
+
+from cluster_utils.base import constants
+from cluster_utils.server.distributions import (
+    Discrete,
+    IntLogNormal,
+    IntNormal,
+    TruncatedLogNormal,
+    TruncatedNormal,
+)
+from cluster_utils.server.optimizers import (
+    GridSearchOptimizer,
+    HyperbandOptimizer,
+    NGOptimizer,
+    Optimizer,
+    TPEOptimizer,
+    _ParzenEstimator,
+    load_optimizer,
+)
+from cluster_utils.server.run_journal import RunJournal
+
+from .helpers import FakeJob
+
+
+class GridParam:
+    def __init__(self, param, values):
+        self.param_name = param
+        self.values = values
+
+
+def make_grid_search_optimizer(optimized_params, restarts=1, samples=None):
+    return GridSearchOptimizer(
+        metric_to_optimize=None,
+        minimize=False,
+        report_hooks=None,
+        number_of_samples=samples,
+        optimized_params=optimized_params,
+        restarts=restarts,
+    )
+
+
+@pytest.mark.parametrize(
+    ("restarts", "samples", "expected"), [(1, None, 6), (2, None, 12), (3, 5, 15)]
+)
+def test_grid_search_n_settings(restarts, samples, expected):
+    if samples is None:
+        # values of several parameters can be given together
+        b = GridParam(("b.x", "b.y"), [(0, 1), (1, 0)])
+    else:
+        b = GridParam("b", [0, 1])
+    optimizer = make_grid_search_optimizer(
+        [GridParam("a", [1, 2, 3]), b], restarts=restarts, samples=samples
+    )
+    assert optimizer.n_settings == expected
+
+    settings = list(optimizer.ask_all())
+    assert len(settings) == expected
+    if samples is None:
+        assert settings[:2] == [
+            {"a": 1, "b": {"x": 0, "y": 1}},
+            {"a": 1, "b": {"x": 1, "y": 0}},
+        ]
+
+
+def test_grid_search_settings_are_lazy():
+    optimizer = make_grid_search_optimizer(
+        [GridParam(f"p{i}", list(range(10))) for i in range(9)]
+    )
+    assert optimizer.n_settings == 10**9
+    settings = optimizer.ask_all()
+    assert next(settings) == {f"p{i}": 0 for i in range(9)}
+    assert next(settings) == {**{f"p{i}": 0 for i in range(8)}, "p8": 1}
+
+
+def hyperband_job(settings, loss):
+    return FakeJob(
+        {"x": settings["x"], "fit.epochs": settings["fit"]["epochs"], "loss": loss}
+    )
+
+
+def make_hyperband_optimizer(minimize=True, **kwargs):
+    return HyperbandOptimizer(
+        metric_to_optimize="loss",
+        minimize=minimize,
+        report_hooks=None,
+        number_of_samples=100,
+        optimized_params=[TruncatedNormal(param="x", bounds=(0.0, 1.0))],
+        budget_param="fit.epochs",
+        **kwargs,
+    )
+
+
+def test_hyperband_brackets():
+    optimizer = make_hyperband_optimizer(min_budget=1, max_budget=27)
+    assert optimizer.bracket_budgets == [[27], [9, 27], [3, 9, 27], [1, 3, 9, 27]]
+    # the most settings start at the smallest budget
+    assert optimizer._bracket_schedule[:27] == [3] * 27
+    assert len(optimizer._bracket_schedule) == 27 + 12 + 6 + 4
+
+    optimizer = make_hyperband_optimizer(
+        min_budget=0.5, max_budget=2.0, reduction_factor=2
+    )
+    assert optimizer.bracket_budgets == [[2.0], [1.0, 2.0], [0.5, 1.0, 2.0]]
+
+
+@pytest.mark.parametrize("minimize", [True, False])
+def test_hyperband_promotes_best_settings(minimize):
+    optimizer = make_hyperband_optimizer(minimize, min_budget=1, max_budget=9)
+    settings = optimizer.ask_batch(6)
+    assert [s["fit"]["epochs"] for s in settings] == [1] * 6
+    # settings are not repeated although sampled values are rounded
+    assert len({s["x"] for s in settings}) == 6
+
+    jobs = [hyperband_job(s, s["x"] if minimize else -s["x"]) for s in settings]
+    # a job that did not report the metric is never promoted
+    jobs[0].row.pop("loss")
+    optimizer.tell(jobs)
+    assert all(job.results_used_for_update for job in jobs)
+
+    # the best third of the finished settings is promoted to the next budget
+    best = sorted(s["x"] for s in settings[1:])[:2]
+    promoted = optimizer.ask_batch(3)
+    assert [s["fit"]["epochs"] for s in promoted] == [3, 3, 1]
+    assert sorted(s["x"] for s in promoted[:2]) == best
+
+    promoted_jobs = [hyperband_job(s, 1.0) for s in promoted[:2]]
+    promoted_jobs[0].row["working_dir"] = "/best"
+    promoted_jobs[1].row["working_dir"] = "/other"
+    promoted_jobs[1].row["loss"] = 2.0 if minimize else 0.0
+    optimizer.tell(promoted_jobs)
+    assert list(optimizer.best_jobs_working_dirs(1)) == ["/best"]
+    # only one of two settings is promoted per rung and budget 9 is the maximum
+    assert optimizer.ask()["fit"]["epochs"] == 1
+
+    best_df = optimizer.get_best()
+    assert best_df == ""
+    optimizer.iteration = 1
+    assert set(optimizer.get_best()["fit.epochs"]) == {3}
+
+
+def test_hyperband_does_not_promote_settings_without_result():
+    optimizer = make_hyperband_optimizer(min_budget=1, max_budget=3)
+    settings = optimizer.ask_batch(3)
+    assert [s["fit"]["epochs"] for s in settings] == [1] * 3
+    optimizer.tell([hyperband_job(s, float("nan")) for s in settings])
+
+    # a new setting is sampled instead
+    new_setting = optimizer.ask()
+    assert new_setting["x"] not in {s["x"] for s in settings}
+
+
+def test_hyperband_restores_rungs_from_journal(tmp_path):
+    optimizer = make_hyperband_optimizer(min_budget=1, max_budget=9)
+    optimizer.journal = RunJournal(str(tmp_path / constants.RUN_JOURNAL_FILE))
+    optimizer.save_snapshot(str(tmp_path))
+
+    # settings and results after the snapshot are only in the journal
+    settings = optimizer.ask_batch(6)
+    for job_id, setting in enumerate(settings):
+        optimizer.journal.record_ask(job_id, setting, iteration=1)
+    optimizer.tell([hyperband_job(s, s["x"]) for s in settings])
+    promoted = optimizer.ask_batch(2)
+    optimizer.journal.record_ask(6, promoted[0], iteration=1)
+    optimizer.journal.close()
+
+    loaded = load_optimizer(str(tmp_path / constants.STATUS_PICKLE_FILE))
+    # the setting that was already promoted before is not promoted again
+    settings = loaded.ask_batch(2)
+    assert settings[0] == promoted[1]
+    assert settings[1]["fit"]["epochs"] == 1
+
+
+def test_hyperband_invalid_settings():
+    with pytest.raises(ValueError, match="min_budget"):
+        make_hyperband_optimizer(min_budget=10, max_budget=1)
+    with pytest.raises(ValueError, match="reduction_factor"):
+        make_hyperband_optimizer(min_budget=1, max_budget=10, reduction_factor=1)
+    with pytest.raises(ValueError, match="Budget parameter"):
+        HyperbandOptimizer(
+            metric_to_optimize="loss",
+            minimize=True,
+            report_hooks=None,
+            number_of_samples=10,
+            optimized_params=[TruncatedNormal(param="x", bounds=(0.0, 1.0))],
+            budget_param="x",
+            min_budget=1,
+            max_budget=10,
+        )
+
+
+class FakeCandidate:
+    def __init__(self, x):
+        self.kwargs = {"a.x": x}
+
+
+class FakeNevergradOptimizer:
+    def __init__(self):
+        self.n_asked = 0
+        self.told = []
+
+    def ask(self):
+        self.n_asked += 1
+        return FakeCandidate(float(self.n_asked))
+
+    def tell(self, candidate, value):
+        self.told.append((candidate.kwargs["a.x"], value))
+
+
+def ng_job(job_id, x, loss):
+    return FakeJob(None if loss is None else {"a.x": x, "loss": loss}, job_id)
+
+
+def make_ng_optimizer(minimize):
+    # nevergrad is an optional dependency, so its optimizer is replaced by a fake
+    optimizer = NGOptimizer.__new__(NGOptimizer)
+    Optimizer.__init__(
+        optimizer,
+        metric_to_optimize="loss",
+        minimize=minimize,
+        report_hooks=None,
+        number_of_samples=10,
+        optimized_params=[TruncatedNormal(param="a.x", bounds=(0.0, 10.0))],
+    )
+    optimizer.optimizer = FakeNevergradOptimizer()
+    optimizer.candidates = {}
+    optimizer._unassociated_candidates = collections.deque()
+    return optimizer
+
+
+@pytest.mark.parametrize("minimize", [True, False])
+def test_ng_optimizer_batches(minimize):
+    optimizer = make_ng_optimizer(minimize)
+    assert optimizer.ask_batch(3) == [{"a": {"x": float(i)}} for i in (1, 2, 3)]
+    optimizer.add_candidates([10, 11])
+    optimizer.add_candidate(12)
+    with pytest.raises(ValueError, match="no unassociated candidate"):
+        optimizer.add_candidate(13)
+
+    jobs = [ng_job(10, 1.0, 0.5), ng_job(11, 2.0, None), ng_job(12, 3.0, 2.0)]
+    optimizer.tell(jobs)
+
+    sign = 1 if minimize else -1
+    assert optimizer.optimizer.told == [(1.0, sign * 0.5), (3.0, sign * 2.0)]
+    assert all(job.results_used_for_update for job in jobs)
+    assert len(optimizer.result_store) == 2
+    # the candidate of the job without results is kept
+    assert list(optimizer.candidates) == [11]
+
+
+def test_ng_optimizer_unpickle_old_candidate():
+    optimizer = make_ng_optimizer(True)
+    state = optimizer.__dict__.copy()
+    state["candidates"] = {-1: FakeCandidate(5.0)}
+    optimizer.__setstate__(state)
+    optimizer.add_candidate(3)
+    assert optimizer.candidates[3].kwargs == {"a.x": 5.0}
+
+
+def make_tpe_optimizer(optimized_params, **kwargs):
+    return TPEOptimizer(
+        metric_to_optimize="loss",
+        minimize=True,
+        report_hooks=None,
+        number_of_samples=100,
+        optimized_params=optimized_params,
+        **kwargs,
+    )
+
+
+def test_parzen_estimator_is_normalized():
+    estimator = _ParzenEstimator(np.array([0.1, 0.15, 0.9]), 0.0, 1.0)
+    x = np.linspace(0.0, 1.0, 10001)
+    assert np.trapz(np.exp(estimator.log_pdf(x)), x) == pytest.approx(1.0, abs=1e-3)
+
+    samples = estimator.sample((2, 1000))
+    assert samples.shape == (2, 1000)
+    assert np.all((samples >= 0.0) & (samples <= 1.0))
+
+
+def test_tpe_concentrates_on_good_region():
+    np.random.seed(0)
+    optimizer = make_tpe_optimizer(
+        [TruncatedNormal(param="fn.x", bounds=(0.0, 10.0), smart_rounding=False)]
+    )
+
+    # settings of the first jobs are sampled from the distributions
+    settings = optimizer.ask_batch(20)
+    xs = [s["fn"]["x"] for s in settings]
+    optimizer.result_store.add_rows(
+        {"fn.x": x, "loss": (x - 2.0) ** 2, constants.ID: i} for i, x in enumerate(xs)
+    )
+
+    new_xs = np.array([s["fn"]["x"] for s in optimizer.ask_batch(50)])
+    assert np.all((new_xs >= 0.0) & (new_xs <= 10.0))
+    # most new settings are close to the optimum, unlike the initial ones
+    assert np.median(np.abs(new_xs - 2.0)) < 0.5 * np.median(np.abs(np.array(xs) - 2))
+
+
+def test_tpe_initial_samples_are_buffered():
+    np.random.seed(0)
+    optimizer = make_tpe_optimizer([TruncatedNormal(param="x", bounds=(0.9, 0.999))])
+
+    xs = [optimizer.ask_batch(1)[0]["x"] for _ in range(25)]
+    # the settings are rounded together, so they do not collapse to the bounds
+    assert sum(x in (0.9, 0.999) for x in xs) < len(xs) / 2
+    assert len(optimizer._sample_buffer) == 5
+
+
+def test_tpe_parameter_types():
+    np.random.seed(1)
+    optimizer = make_tpe_optimizer(
+        [
+            Discrete(param="opt", options=["adam", "sgd", [1, 2]]),
+            IntLogNormal(param="batch", bounds=(8, 512)),
+            TruncatedLogNormal(param="lr", bounds=(1e-5, 1.0)),
+            IntNormal(param="layers", bounds=(1, 5)),
+        ],
+        n_initial_samples=5,
+    )
+    rows = [
+        {"opt": "adam", "batch": 32, "lr": 1e-3, "layers": 2, "loss": 0.1},
+        {"opt": "sgd", "batch": 256, "lr": 0.5, "layers": 5, "loss": 0.9},
+        {"opt": (1, 2), "batch": 8, "lr": 1e-5, "layers": 1, "loss": 0.8},
+        {"opt": "sgd", "batch": 64, "lr": 0.1, "layers": 4, "loss": 0.7},
+        {"opt": "adam", "batch": 512, "lr": 0.01, "layers": 3, "loss": float("nan")},
+        {"opt": "adam", "batch": 16, "lr": 3e-4, "layers": 2, "loss": 0.2},
+    ]
+    optimizer.result_store.add_rows(
+        {**row, constants.ID: i} for i, row in enumerate(rows)
+    )
+
+    settings = optimizer.ask_batch(30)
+    assert len(settings) == 30
+    for setting in settings:
+        assert setting["opt"] in ("adam", "sgd", (1, 2))
+        assert isinstance(setting["batch"], int)
+        assert 8 <= setting["batch"] <= 512
+        assert 1e-5 <= setting["lr"] <= 1.0
+        assert setting["layers"] in range(1, 6)
+    # the option of the best results is preferred
+    assert sum(setting["opt"] == "adam" for setting in settings) > 15
+
+
+def test_tpe_invalid_settings():
+    with pytest.raises(ValueError, match="gamma"):
+        make_tpe_optimizer([TruncatedNormal(param="x", bounds=(0, 1))], gamma=1.0)
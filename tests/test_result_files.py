@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cluster_utils.base import constants
+from cluster_utils.server import result_files
+from cluster_utils.server.distributions import Discrete
+from cluster_utils.server.optimizers import Metaoptimizer
+from cluster_utils.server.result_files import ResultFormat
+
+
+def make_optimizer(result_format):
+    optimizer = Metaoptimizer(
+        metric_to_optimize="loss",
+        minimize=True,
+        report_hooks=None,
+        number_of_samples=100,
+        optimized_params=[Discrete(param="a", options=[1, 2, 3])],
+        num_jobs_in_elite=5,
+        with_restarts=False,
+    )
+    optimizer.result_format = result_format
+    return optimizer
+
+
+def add_results(optimizer, start, stop):
+    optimizer.result_store.add_rows(
+        {constants.ID: i, "a": i % 3 + 1, "loss": float(i), "working_dir": f"/{i}"}
+        for i in range(start, stop)
+    )
+
+
+def test_parse_result_format():
+    assert ResultFormat.parse("CSV") == ResultFormat.CSV
+    assert ResultFormat.parse("parquet") == ResultFormat.PARQUET
+    assert ResultFormat.parse(ResultFormat.PARQUET) == ResultFormat.PARQUET
+    with pytest.raises(ValueError, match="result_format"):
+        ResultFormat.parse("hdf5")
+
+
+def test_read_csv_columns(tmp_path):
+    optimizer = make_optimizer(ResultFormat.CSV)
+    add_results(optimizer, 0, 4)
+    optimizer.save_data_and_self(str(tmp_path))
+
+    path = result_files.find_full_data(str(tmp_path))
+    assert path == str(tmp_path / constants.FULL_DF_FILE)
+    df = result_files.read_table(path, columns=["loss", "a", "not_a_column"])
+    assert sorted(df.columns) == ["a", "loss"]
+    assert sorted(df["loss"]) == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_parquet_results_are_appended(tmp_path):
+    pytest.importorskip("pyarrow")
+    directory = str(tmp_path)
+    optimizer = make_optimizer(ResultFormat.PARQUET)
+
+    add_results(optimizer, 0, 3)
+    optimizer.save_new_results(directory)
+    # nothing new, nothing written
+    optimizer.save_new_results(directory)
+    add_results(optimizer, 3, 5)
+    optimizer.result_store.add_rows([{constants.ID: 5, "a": 1, "loss": 5.0, "x": 1}])
+    optimizer.save_data_and_self(directory)
+
+    dataset_dir = tmp_path / constants.FULL_DF_PARQUET_DIR
+    assert sorted(os.listdir(dataset_dir)) == [
+        "part-0000000000-0000000003.parquet",
+        "part-0000000003-0000000006.parquet",
+    ]
+    assert result_files.n_parquet_rows(str(dataset_dir)) == 6
+
+    path = result_files.find_full_data(directory)
+    df = result_files.read_table(path)
+    assert list(df[constants.ID]) == list(range(6))
+    assert df["a"].dtype == "int64"
+    # column that only exists in the second part
+    assert df["x"].isna().sum() == 5
+
+    df = result_files.read_table(path, columns=["loss", "working_dir"])
+    assert list(df.columns) == ["loss", "working_dir"]
+    assert list(df["working_dir"][:5]) == [f"/{i}" for i in range(5)]
+
+    reduced = result_files.read_table(str(tmp_path / constants.REDUCED_DF_PARQUET_FILE))
+    pd.testing.assert_frame_equal(reduced, optimizer.minimal_df)
+
+
+def test_parquet_write_full_data_replaces_results(tmp_path):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"a": [1, 2, 3], "loss": [0.5, 0.25, 0.125]}, index=[2, 0, 1])
+
+    result_files.write_full_data(df, str(tmp_path), ResultFormat.PARQUET)
+    result_files.write_full_data(df[:2], str(tmp_path), ResultFormat.PARQUET)
+
+    path = result_files.find_full_data(str(tmp_path))
+    assert result_files.read_table(path)["loss"].tolist() == [0.5, 0.25]
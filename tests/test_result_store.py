@@ -0,0 +1,149 @@
+import math
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster_utils.base import constants
+from cluster_utils.server import data_analysis
+from cluster_utils.server.distributions import Discrete
+from cluster_utils.server.optimizers import Metaoptimizer
+from cluster_utils.server.result_store import ColumnarTable, ResultStore
+
+
+@pytest.fixture()
+def results_df() -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    n = 50
+    df = pd.DataFrame(
+        {
+            "a": rng.integers(0, 4, n),
+            "b.c": rng.choice(["x", "y"], n),
+            "loss": rng.normal(size=n),
+            "working_dir": [f"/tmp/{i}" for i in range(n)],
+        }
+    )
+    df.loc[3, "loss"] = np.nan
+    return df
+
+
+def test_columnar_table():
+    table = ColumnarTable()
+    table.append({"b": 1, "a": "x"})
+    table.append({"a": "y", "c": 2.5})
+
+    assert len(table) == 2
+    assert table.column("a") == ["x", "y"]
+    assert table.column("b")[0] == 1
+    assert math.isnan(table.column("b")[1])
+    assert math.isnan(table.column("c")[0])
+
+    df = table.to_df()
+    assert list(df.columns) == ["a", "b", "c"]
+    assert df["c"].iloc[1] == 2.5
+
+
+@pytest.mark.parametrize("minimize", [True, False])
+def test_result_store_matches_pandas(results_df, minimize):
+    store = ResultStore("loss", ["a", "b.c"], minimize)
+    # add in several chunks, like the optimizer does
+    for start in range(0, len(results_df), 10):
+        store.add_df(results_df.iloc[start : start + 10])
+
+    assert len(store) == len(results_df)
+
+    expected_full = results_df.sort_values(["loss"], ascending=minimize)
+    pd.testing.assert_frame_equal(
+        store.full_df, expected_full[sorted(results_df.columns)]
+    )
+
+    expected_minimal = data_analysis.average_out(
+        results_df, ["loss"], ["a", "b.c"], sort_ascending=minimize
+    )
+    minimal = store.minimal_df
+    assert list(minimal.columns) == list(expected_minimal.columns)
+    pd.testing.assert_frame_equal(
+        minimal.reset_index(drop=True),
+        expected_minimal.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+    expected_best = expected_full["loss"].iloc[0]
+    assert store.best_value() == expected_best
+
+    expected_params = data_analysis.best_params(
+        expected_minimal, ["a", "b.c"], "loss", how_many=3, minimum=minimize
+    )
+    assert store.best_group_params(how_many=3) == expected_params
+
+
+def test_result_store_empty():
+    store = ResultStore("loss", ["a"], minimize=True)
+    assert store.full_df.empty
+    assert store.minimal_df.empty
+    assert store.best_value() is None
+    assert store.best_group_params(how_many=5) == {"a": []}
+    assert store.column("working_dir") == []
+
+
+def test_result_store_set_params(results_df):
+    store = ResultStore("loss", ["a", "b.c"], minimize=True)
+    store.add_df(results_df)
+    store.set_params(["a"])
+
+    expected_minimal = data_analysis.average_out(
+        results_df, ["loss"], ["a"], sort_ascending=True
+    )
+    pd.testing.assert_frame_equal(
+        store.minimal_df.reset_index(drop=True),
+        expected_minimal.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_result_store_pickle(results_df):
+    store = ResultStore("loss", ["a", "b.c"], minimize=True)
+    store.add_df(results_df)
+    # create cached DataFrames
+    store.full_df  # noqa: B018
+    store.minimal_df  # noqa: B018
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert restored._full_df is None
+    pd.testing.assert_frame_equal(restored.full_df, store.full_df)
+    pd.testing.assert_frame_equal(restored.minimal_df, store.minimal_df)
+
+
+def test_optimizer_unpickle_old_format(results_df):
+    optimizer = Metaoptimizer(
+        metric_to_optimize="loss",
+        minimize=True,
+        report_hooks=None,
+        number_of_samples=10,
+        optimized_params=[Discrete(param="a", options=[0, 1, 2, 3])],
+        num_jobs_in_elite=5,
+        with_restarts=False,
+    )
+    # simulate state of an optimizer pickled by an older version
+    state = optimizer.__dict__.copy()
+    del state["result_store"]
+    state["params"] = ["a"]
+    state["full_df"] = results_df.sort_values(["loss"])
+    state["minimal_df"] = data_analysis.average_out(
+        results_df, ["loss"], ["a"], sort_ascending=True
+    )
+
+    old_optimizer = Metaoptimizer.__new__(Metaoptimizer)
+    old_optimizer.__setstate__(state)
+
+    assert old_optimizer.params == ["a"]
+    assert len(old_optimizer.full_df) == len(results_df)
+    pd.testing.assert_frame_equal(
+        old_optimizer.minimal_df.reset_index(drop=True),
+        state["minimal_df"].reset_index(drop=True),
+        check_dtype=False,
+    )
+    assert old_optimizer.minimal_df[constants.RESTART_PARAM_NAME].sum() == len(
+        results_df
+    )
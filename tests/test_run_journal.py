@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+
+from cluster_utils.base import constants
+from cluster_utils.server.distributions import TruncatedNormal
+from cluster_utils.server.job import JobStatus
+from cluster_utils.server.job_manager import reattach_jobs
+from cluster_utils.server.optimizers import Metaoptimizer, load_optimizer
+from cluster_utils.server.run_journal import (
+    RunJournal,
+    collect_jobs,
+    last_connection_info,
+    read_journal,
+)
+
+from .helpers import FakeClusterSubmission, FakeJob, make_job
+
+
+def make_optimizer(tmp_path):
+    optimizer = Metaoptimizer(
+        metric_to_optimize="loss",
+        minimize=True,
+        report_hooks=None,
+        number_of_samples=100,
+        optimized_params=[TruncatedNormal(param="x", bounds=(0.0, 1.0))],
+        num_jobs_in_elite=5,
+        with_restarts=False,
+    )
+    optimizer.journal = RunJournal(str(tmp_path / constants.RUN_JOURNAL_FILE))
+    return optimizer
+
+
+def test_journal_records(tmp_path):
+    path = str(tmp_path / "journal.pickle")
+    journal = RunJournal(path)
+    journal.record_ask(0, {"x": 0.5}, iteration=1)
+    journal.record_submitted(0, "1234", "/jobs/job_1_0.sh")
+    offset = journal.offset
+    journal.record_status(0, 2)
+    journal.close()
+
+    records = read_journal(path)
+    assert [r["event"] for r in records] == ["ask", "submitted", "status"]
+    assert records[0]["settings"] == {"x": 0.5}
+    assert records[1]["cluster_id"] == "1234"
+    assert [r["event"] for r in read_journal(path, offset)] == ["status"]
+
+
+def test_journal_discards_incomplete_record(tmp_path):
+    path = str(tmp_path / "journal.pickle")
+    journal = RunJournal(path)
+    journal.record_iteration(1)
+    journal.record_iteration(2)
+    journal.close()
+
+    # simulate a crash while the last record was written
+    os.truncate(path, os.path.getsize(path) - 3)
+    assert [r["iteration"] for r in read_journal(path)] == [1]
+
+    journal = RunJournal(path)
+    journal.record_iteration(3)
+    journal.close()
+    assert [r["iteration"] for r in read_journal(path)] == [1, 3]
+
+
+def test_load_optimizer_replays_journal(tmp_path):
+    optimizer = make_optimizer(tmp_path)
+    optimizer.tell([FakeJob({"x": 0.1, "loss": 1.0}), FakeJob({"x": 0.2, "loss": 0.5})])
+    assert optimizer.snapshot_due()
+    optimizer.save_snapshot(str(tmp_path))
+
+    # results after the snapshot are only in the journal
+    optimizer.tell([FakeJob({"x": 0.3, "loss": 0.25})])
+    optimizer.iteration = 1
+    optimizer.journal.record_iteration(1)
+    assert not optimizer.snapshot_due()
+    optimizer.journal.close()
+
+    loaded = load_optimizer(str(tmp_path / constants.STATUS_PICKLE_FILE))
+    assert loaded.journal is None
+    assert loaded.iteration == 1
+    assert len(loaded.result_store) == 3
+    assert loaded.best_metric_value() == 0.25
+
+
+def test_collect_jobs(tmp_path):
+    path = str(tmp_path / "journal.pickle")
+    journal = RunJournal(path)
+    journal.record_server({"ip": "10.0.0.1", "port": 4242})
+    for job_id in range(3):
+        journal.record_ask(job_id, {"x": job_id}, iteration=1)
+    journal.record_submitted(0, "100", "/jobs/job_1_0.sh")
+    journal.record_submitted(1, "101", "/jobs/job_1_1.sh")
+    journal.record_status(0, JobStatus.RUNNING)
+    journal.record_results([{constants.ID: 0, "x": 0, "loss": 1.0}])
+    journal.close()
+
+    records = read_journal(path)
+    assert last_connection_info(records) == {"ip": "10.0.0.1", "port": 4242}
+    jobs = collect_jobs(records)
+    assert sorted(jobs) == [0, 1, 2]
+    assert jobs[0].has_results
+    assert jobs[0].status == JobStatus.RUNNING
+    assert jobs[1].cluster_id == "101"
+    assert jobs[1].run_script_path == "/jobs/job_1_1.sh"
+    assert not jobs[1].has_results
+    assert jobs[2].cluster_id is None
+
+
+class ReattachClusterSubmission(FakeClusterSubmission):
+    def __init__(self, paths, active_cluster_ids):
+        super().__init__(paths)
+        self.active_cluster_ids = active_cluster_ids
+        self.stopped = []
+
+    def query_active_jobs(self, cluster_ids):
+        return self.active_cluster_ids & set(cluster_ids)
+
+    def stop_fn(self, cluster_id):
+        self.stopped.append(cluster_id)
+
+
+def write_metrics(paths, job_id, loss):
+    working_dir = os.path.join(paths["current_result_dir"], str(job_id))
+    os.makedirs(working_dir)
+    pd.DataFrame({"loss": [loss]}).to_csv(
+        os.path.join(working_dir, constants.CLUSTER_METRIC_FILE), index=False
+    )
+
+
+def journal_of_interrupted_run(paths, tmp_path):
+    path = str(tmp_path / "journal.pickle")
+    journal = RunJournal(path)
+    for job_id in range(5):
+        journal.record_ask(job_id, {"x": job_id}, iteration=1)
+        journal.record_submitted(job_id, str(100 + job_id), f"/jobs/{job_id}.sh")
+    # job 0 finished and its results were used
+    journal.record_results([{constants.ID: 0, "x": 0, "loss": 1.0}])
+    write_metrics(paths, 0, 1.0)
+    # job 1 finished while the server was down
+    write_metrics(paths, 1, 0.5)
+    # job 2 is still running, job 3 got lost and job 4 is still queued
+    journal.record_status(2, JobStatus.RUNNING)
+    journal.record_status(3, JobStatus.RUNNING)
+    journal.close()
+    return collect_jobs(read_journal(path))
+
+
+def test_reattach_jobs(paths, tmp_path):
+    journaled_jobs = journal_of_interrupted_run(paths, tmp_path)
+    cluster = ReattachClusterSubmission(paths, {"102", "104"})
+
+    reattach_jobs(
+        cluster,
+        journaled_jobs,
+        lambda job_id, settings, iteration: make_job(job_id, paths),
+        current_iteration=1,
+        can_receive_messages=True,
+    )
+
+    jobs = {job.id: job for job in cluster.jobs}
+    # results of job 0 are only registered to count it for the iteration
+    assert jobs[0].results_used_for_update
+    assert not jobs[1].results_used_for_update
+    assert cluster.n_successful_jobs == 2
+    assert jobs[2].cluster_id == "102"
+    assert jobs[2].status == JobStatus.RUNNING
+    assert jobs[4].status == JobStatus.SUBMITTED
+    assert jobs[4].run_script_path == "/jobs/4.sh"
+    assert list(cluster.submission_queue) == [jobs[3]]
+    assert jobs[3].cluster_id is None
+    assert not cluster.stopped
+    # new jobs do not reuse ids
+    assert cluster.inc_job_id == 5
+
+
+def test_reattach_jobs_on_different_port(paths, tmp_path):
+    journaled_jobs = journal_of_interrupted_run(paths, tmp_path)
+    cluster = ReattachClusterSubmission(paths, {"102", "104"})
+
+    reattach_jobs(
+        cluster,
+        journaled_jobs,
+        lambda job_id, settings, iteration: make_job(job_id, paths),
+        current_iteration=1,
+        can_receive_messages=False,
+    )
+
+    # running jobs can not report back, so they are stopped and submitted again
+    assert sorted(cluster.stopped) == ["102", "104"]
+    assert sorted(job.id for job in cluster.submission_queue) == [2, 3, 4]
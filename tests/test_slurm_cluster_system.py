@@ -1,14 +1,19 @@
 import pathlib
+import subprocess
 from types import SimpleNamespace
 
 import pytest
 
+from cluster_utils.server import slurm_cluster_system
 from cluster_utils.server.job import Job
 from cluster_utils.server.slurm_cluster_system import (
     SBatchArgumentBuilder,
     SlurmClusterSubmission,
     SlurmJobStatus,
+    SlurmStatusTracker,
+    expand_array_job_id,
     extract_job_status_from_sacct_output,
+    extract_job_status_from_squeue_output,
 )
 
 
@@ -226,3 +231,195 @@ def test_extract_job_status_from_sacct_output__including_intermediate_steps():
         match="Unexpected line in sacct output: 4597753.batch|cpu-short|FAILED|1:0",
     ):
         extract_job_status_from_sacct_output(sacct_output)
+
+
+def test_submit_many_as_array_job(job_data, monkeypatch):
+    jobs = [
+        Job(
+            id=i,
+            settings={},
+            other_params={},
+            paths=job_data.paths,
+            iteration=0,
+            connection_info={"ip": "127.0.0.1", "port": 12345},
+            opt_procedure_name="unittest",
+            singularity_settings=None,
+        )
+        for i in range(3)
+    ]
+
+    sbatch_calls = []
+
+    def fake_run(cmd, **kwargs):
+        sbatch_calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"Submitted batch job 4242\n")
+
+    monkeypatch.setattr(slurm_cluster_system, "run", fake_run)
+
+    slurm_sub = SlurmClusterSubmission(job_data.requirements, job_data.paths)
+    slurm_sub.add_jobs(jobs)
+    assert slurm_sub.submit_next_batch() == 3
+
+    # all jobs are submitted with a single call of sbatch
+    array_script_path = job_data.jobs_dir / "array_0_0_2.sh"
+    assert sbatch_calls == [["sbatch", "--open-mode=append", str(array_script_path)]]
+    assert [job.cluster_id for job in jobs] == ["4242_0", "4242_1", "4242_2"]
+
+    array_script = array_script_path.read_text()
+    assert "#SBATCH --array=0-2" in array_script
+    assert "#SBATCH --partition=part-foo" in array_script
+    for i, job in enumerate(jobs):
+        # run scripts of the individual jobs are still generated and are called by
+        # the corresponding array task
+        assert job.run_script_path == str(job_data.jobs_dir / f"job_0_{i}.sh")
+        assert pathlib.Path(job.run_script_path).exists()
+        assert (
+            f'{i})\n    exec bash "{job.run_script_path}"'
+            f' >> "{job_data.jobs_dir}/job_0_{i}.out"'
+            f' 2>> "{job_data.jobs_dir}/job_0_{i}.err"'
+        ) in array_script
+
+
+def test_submit_many_single_job(job_data, monkeypatch):
+    sbatch_calls = []
+
+    def fake_run(cmd, **kwargs):
+        sbatch_calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=b"Submitted batch job 4242\n")
+
+    monkeypatch.setattr(slurm_cluster_system, "run", fake_run)
+
+    # a single job is submitted as regular job, not as array
+    slurm_sub = SlurmClusterSubmission(job_data.requirements, job_data.paths)
+    slurm_sub.add_jobs(job_data.job)
+    assert slurm_sub.submit_next_batch() == 1
+    assert sbatch_calls == [
+        ["sbatch", "--open-mode=append", str(job_data.jobs_dir / "job_2_13.sh")]
+    ]
+    assert job_data.job.cluster_id == "4242"
+
+
+def test_expand_array_job_id():
+    assert expand_array_job_id("1234") == ["1234"]
+    assert expand_array_job_id("1234_5") == ["1234_5"]
+    assert expand_array_job_id("1234_[0-2,7]") == [
+        "1234_0",
+        "1234_1",
+        "1234_2",
+        "1234_7",
+    ]
+    assert expand_array_job_id("1234_[3-4%2]") == ["1234_3", "1234_4"]
+
+
+def test_extract_job_status_from_squeue_output():
+    squeue_output = "239026|galvani-cn001|RUNNING\n239030_[5-6]||PENDING\n"
+    actual = extract_job_status_from_squeue_output(squeue_output)
+    assert actual == {
+        "239026": SlurmJobStatus("RUNNING", 0, "galvani-cn001"),
+        "239030_5": SlurmJobStatus("PENDING", 0, ""),
+        "239030_6": SlurmJobStatus("PENDING", 0, ""),
+    }
+    assert not actual["239026"].is_terminal()
+
+
+def test_slurm_job_status_is_terminal():
+    assert SlurmJobStatus("COMPLETED", 0, "").is_terminal()
+    assert SlurmJobStatus("CANCELLED by 1234", 0, "").is_terminal()
+    assert not SlurmJobStatus("PENDING", 0, "").is_terminal()
+    assert not SlurmJobStatus("COMPLETING", 0, "").is_terminal()
+
+
+class FakeSlurm:
+    """Replacement for subprocess.run that answers squeue and sacct calls."""
+
+    def __init__(self):
+        self.squeue_output = ""
+        self.sacct_lines = {}
+        self.calls = []
+
+    def __call__(self, cmd, **kwargs):
+        self.calls.append(cmd)
+        if cmd[0] == "squeue":
+            output = self.squeue_output
+        else:
+            assert cmd[0] == "sacct"
+            job_ids = cmd[cmd.index("--jobs") + 1].split(",")
+            output = "".join(
+                self.sacct_lines[job_id] + "\n"
+                for job_id in job_ids
+                if job_id in self.sacct_lines
+            )
+        return subprocess.CompletedProcess(cmd, 0, stdout=output.encode(), stderr=b"")
+
+    def calls_of(self, command):
+        return [cmd for cmd in self.calls if cmd[0] == command]
+
+
+def test_status_tracker(monkeypatch):
+    fake_slurm = FakeSlurm()
+    monkeypatch.setattr(slurm_cluster_system, "run", fake_slurm)
+    monkeypatch.setattr(SlurmStatusTracker, "SACCT_MAX_JOBS_PER_CALL", 2)
+
+    fake_slurm.squeue_output = (
+        "10|node1|RUNNING\n11_[0-1]||PENDING\n999|node2|RUNNING\n"
+    )
+    fake_slurm.sacct_lines = {
+        "12": "12|node1|COMPLETED|0:0",
+        "13": "13|node2|FAILED|1:0",
+        "14": "14|node2|CANCELLED by 42|0:0",
+    }
+    ids = ["10", "11_0", "11_1", "12", "13", "14", "15"]
+
+    tracker = SlurmStatusTracker()
+    statuses = tracker.update(ids)
+
+    assert statuses["10"].state == "RUNNING"
+    assert statuses["11_1"].state == "PENDING"
+    assert statuses["13"] == SlurmJobStatus("FAILED", 1, "node2")
+    # job 15 is neither in the queue nor known to sacct (yet)
+    assert "15" not in statuses
+    assert "999" not in statuses
+    # only jobs that are not in the queue are passed to sacct, in chunks
+    assert [cmd[cmd.index("--jobs") + 1] for cmd in fake_slurm.calls_of("sacct")] == [
+        "12,13",
+        "14,15",
+    ]
+    assert tracker.n_in_flight == 4
+
+    # finished jobs are not queried again
+    fake_slurm.calls.clear()
+    fake_slurm.squeue_output = "11_[0-1]||PENDING\n"
+    fake_slurm.sacct_lines["10"] = "10|node1|COMPLETED|0:0"
+    statuses = tracker.update(ids)
+    assert statuses["12"].state == "COMPLETED"
+    assert statuses["10"].state == "COMPLETED"
+    assert [cmd[cmd.index("--jobs") + 1] for cmd in fake_slurm.calls_of("sacct")] == [
+        "10,15"
+    ]
+    assert tracker.n_in_flight == 3
+
+
+def test_mark_failed_jobs(job_data, monkeypatch):
+    fake_slurm = FakeSlurm()
+    monkeypatch.setattr(slurm_cluster_system, "run", fake_slurm)
+
+    job = job_data.job
+    job.cluster_id = "4242_3"
+    job.run_script_path = str(job_data.jobs_dir / "job_2_13.sh")
+    (job_data.jobs_dir / "job_2_13.err").write_text("something went wrong\n")
+
+    slurm_sub = SlurmClusterSubmission(job_data.requirements, job_data.paths)
+
+    # still in the queue
+    fake_slurm.squeue_output = "4242_3|node1|COMPLETING\n"
+    slurm_sub.mark_failed_jobs([job])
+    assert job.error_info is None
+    assert slurm_sub.check_for_failures_interval == pytest.approx(10.1)
+
+    fake_slurm.squeue_output = ""
+    fake_slurm.sacct_lines["4242_3"] = "4242_3|node1|OUT_OF_MEMORY|0:125"
+    slurm_sub.mark_failed_jobs([job])
+    assert job.hostname == "node1"
+    assert "OUT_OF_MEMORY" in job.error_info
+    assert "something went wrong" in job.error_info
+    assert slurm_sub.check_for_failures_interval == 10
@@ -1,3 +1,5 @@
+import threading
+
 import pytest
 
 from cluster_utils.server import utils
@@ -37,3 +39,22 @@ def test_check_valid_param_name():
     utils.check_valid_param_name("foo-bar")
     utils.check_valid_param_name("foo:bar")
     utils.check_valid_param_name("f00b4r")
+
+
+def test_event_notifier():
+    notifier = utils.EventNotifier()
+
+    # nothing happened, so waiting should time out
+    assert not notifier.wait(0.01)
+
+    # several notifications before waiting are collapsed into one wake up
+    notifier.notify()
+    notifier.notify()
+    assert notifier.wait(1.0)
+    assert not notifier.wait(0.01)
+
+    # notification from another thread wakes up the waiting thread
+    timer = threading.Timer(0.05, notifier.notify)
+    timer.start()
+    assert notifier.wait(5.0)
+    timer.join()